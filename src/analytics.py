@@ -0,0 +1,335 @@
+import csv
+import json
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .batch import BatchResult
+from .calculations import STATUS_OK
+
+# Margins are histogrammed in 0.1 percentage-point bins per group; percentiles are read
+# back at bin midpoints, clamped to the group's exact minimum and maximum.
+MARGIN_BIN_WIDTH = 0.1
+DEFAULT_PERCENTILES = (10.0, 50.0, 90.0)
+# Margins are compared with a target after rounding noise from the solve.
+TARGET_TOLERANCE = 1e-9
+_BIN_LIMIT = 1 << 30
+_FNV_OFFSET = np.uint64(0xCBF29CE484222325)
+_FNV_PRIME = np.uint64(0x100000001B3)
+
+
+def _factorize_column(column: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # Hash-based: strings are hashed from their UCS-4 code units and grouped by the
+    # int64 hash, which sorts far faster than the strings themselves. A collision is
+    # caught by comparing every value with its group's representative.
+    if column.dtype.kind == "U" and column.size:
+        words = np.ascontiguousarray(column).view(np.uint32).reshape(len(column), -1)
+        # Strings are zero-padded on the right, so only a prefix of code units is used.
+        used = np.flatnonzero(words.any(axis=0))
+        hashes = np.full(len(column), _FNV_OFFSET, dtype=np.uint64)
+        for position in range(used[-1] + 1 if len(used) else 0):
+            hashes ^= words[:, position]
+            hashes *= _FNV_PRIME
+        distinct, inverse = np.unique(hashes, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        first = np.empty(len(distinct), dtype=np.int64)
+        first[inverse] = np.arange(len(column))
+        values = column[first]
+        if np.array_equal(values[inverse], column):
+            order = np.argsort(values, kind="stable")
+            rank = np.empty(len(order), dtype=np.int64)
+            rank[order] = np.arange(len(order))
+            return values[order], rank[inverse]
+    values, inverse = np.unique(column, return_inverse=True)
+    return values, inverse.reshape(-1)
+
+
+def _factorize(columns: Sequence[np.ndarray]) -> Tuple[np.ndarray, List[np.ndarray]]:
+    # Group code per row and the key values per group, sorted by key.
+    if len(columns) == 1:
+        values, codes = _factorize_column(columns[0])
+        return codes, [values]
+    codes = np.zeros(len(columns[0]) if columns else 0, dtype=np.int64)
+    for column in columns:
+        values, inverse = _factorize_column(column)
+        codes = codes * len(values) + inverse
+    _combined, first, codes = np.unique(codes, return_index=True, return_inverse=True)
+    return codes.reshape(-1), [np.asarray(column)[first] for column in columns]
+
+
+def _key_column(values, size: int) -> np.ndarray:
+    column = np.asarray(values)
+    if column.shape != (size,):
+        raise ValueError(f"Group columns must have {size} rows.")
+    if column.dtype.kind not in "U":
+        column = column.astype(str)
+    return column
+
+
+class MarginGroups:
+    # Partial aggregates of a quote set grouped by one or more key columns. Every field
+    # is a sum, minimum, maximum or histogram count, so groups from separate chunks
+    # (or processes) merge exactly; only the percentiles depend on the bin width.
+    def __init__(
+        self,
+        names: Sequence[str],
+        keys: List[np.ndarray],
+        quotes: np.ndarray,
+        priced: np.ndarray,
+        below_target: np.ndarray,
+        revenue: np.ndarray,
+        weighted_margin: np.ndarray,
+        leakage: np.ndarray,
+        minimum: np.ndarray,
+        maximum: np.ndarray,
+        bin_groups: np.ndarray,
+        bins: np.ndarray,
+        bin_counts: np.ndarray,
+    ) -> None:
+        self.names = tuple(names)
+        self.keys = keys
+        self.quotes = quotes
+        self.priced = priced
+        self.below_target = below_target
+        self.revenue = revenue
+        self.weighted_margin = weighted_margin
+        self.leakage = leakage
+        self.minimum = minimum
+        self.maximum = maximum
+        self.bin_groups = bin_groups
+        self.bins = bins
+        self.bin_counts = bin_counts
+
+    def __len__(self) -> int:
+        return len(self.quotes)
+
+    @classmethod
+    def from_batch(
+        cls,
+        result: BatchResult,
+        keys: Dict[str, Sequence],
+        target_margin: Optional[float] = None,
+    ) -> "MarginGroups":
+        # `keys` maps each group column name to its value per row. A row is below
+        # target when its margin on Net2 is under its own target margin, or under
+        # `target_margin` for rows without one.
+        if not keys:
+            raise ValueError("Group by at least one column.")
+        size = len(result)
+        codes, values = _factorize([_key_column(column, size) for column in keys.values()])
+        groups = len(values[0])
+
+        net1 = result.net1
+        net2 = result.net2
+        margin = result.m_with
+        ok = result.status == STATUS_OK
+        priced = ok & np.isfinite(margin) & np.isfinite(net2)
+        leaking = ok & np.isfinite(net1) & np.isfinite(net2)
+        targets = result.target_margin
+        if target_margin is not None:
+            targets = np.where(np.isnan(targets), target_margin, targets)
+        with np.errstate(invalid="ignore"):
+            below = priced & (margin < targets - TARGET_TOLERANCE)
+
+        priced_codes = codes[priced]
+        priced_margin = margin[priced]
+        minimum = np.full(groups, np.inf)
+        maximum = np.full(groups, -np.inf)
+        np.minimum.at(minimum, priced_codes, priced_margin)
+        np.maximum.at(maximum, priced_codes, priced_margin)
+
+        bins = np.clip(np.floor(priced_margin / MARGIN_BIN_WIDTH), -_BIN_LIMIT, _BIN_LIMIT).astype(np.int64)
+        bin_groups, bins, bin_counts = _count_bins(priced_codes, bins, np.ones(len(bins), dtype=np.int64))
+        return cls(
+            keys.keys(),
+            values,
+            np.bincount(codes, minlength=groups),
+            np.bincount(priced_codes, minlength=groups),
+            np.bincount(codes[below], minlength=groups),
+            np.bincount(priced_codes, weights=net2[priced], minlength=groups),
+            np.bincount(priced_codes, weights=priced_margin * net2[priced], minlength=groups),
+            np.bincount(codes[leaking], weights=(net1 - net2)[leaking], minlength=groups),
+            minimum,
+            maximum,
+            bin_groups,
+            bins,
+            bin_counts,
+        )
+
+    def merge(self, other: "MarginGroups") -> "MarginGroups":
+        return merge_groups([self, other])
+
+    def percentiles(self, fractions: Sequence[float] = DEFAULT_PERCENTILES) -> np.ndarray:
+        # (groups, len(fractions)) margins; NaN for groups without priced quotes. Bin
+        # entries are sorted by group then bin, so one cumulative sum serves every group.
+        result = np.full((len(self), len(fractions)), np.nan)
+        if not len(self.bin_counts):
+            return result
+        cumulative = np.cumsum(self.bin_counts)
+        starts = np.searchsorted(self.bin_groups, np.arange(len(self)))
+        before = np.where(starts > 0, cumulative[np.maximum(starts - 1, 0)], 0)
+        has = self.priced > 0
+        for column, percent in enumerate(fractions):
+            if not 0.0 <= percent <= 100.0:
+                raise ValueError("Percentiles must be between 0 and 100.")
+            rank = np.maximum(np.ceil(self.priced * percent / 100.0), 1)
+            position = np.searchsorted(cumulative, before + rank)
+            position = np.minimum(position, len(cumulative) - 1)
+            middle = np.round((self.bins[position] + 0.5) * MARGIN_BIN_WIDTH, 6)
+            result[has, column] = np.clip(middle, self.minimum, self.maximum)[has]
+        return result
+
+    def summary(self, fractions: Sequence[float] = DEFAULT_PERCENTILES) -> List[Dict[str, object]]:
+        # One dict per group, in key order: the key columns, then the metrics. `margin`
+        # is the revenue-weighted margin on Net2; leakage sums Net1 - Net2.
+        with np.errstate(invalid="ignore", divide="ignore"):
+            margin = self.weighted_margin / self.revenue
+        percentiles = self.percentiles(fractions)
+        priced = self.priced > 0
+        columns = {
+            "quotes": self.quotes.tolist(),
+            "priced": self.priced.tolist(),
+            "revenue": self.revenue.tolist(),
+            "margin": np.where(self.revenue != 0, margin, np.nan).tolist(),
+        }
+        for column, percent in enumerate(fractions):
+            columns[f"p{percent:g}"] = percentiles[:, column].tolist()
+        columns["min_margin"] = np.where(priced, self.minimum, np.nan).tolist()
+        columns["max_margin"] = np.where(priced, self.maximum, np.nan).tolist()
+        columns["below_target"] = self.below_target.tolist()
+        columns["leakage"] = self.leakage.tolist()
+        keys = [values.tolist() for values in self.keys]
+        rows = []
+        for index in range(len(self)):
+            row: Dict[str, object] = {name: values[index] for name, values in zip(self.names, keys)}
+            for name, values in columns.items():
+                value = values[index]
+                row[name] = None if value != value else value
+            rows.append(row)
+        return rows
+
+
+def _count_bins(groups: np.ndarray, bins: np.ndarray, counts: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Sums counts per (group, bin) pair, sorted by group then bin.
+    combined = (groups.astype(np.int64) << 32) | (bins + _BIN_LIMIT + 1)
+    pairs, inverse = np.unique(combined, return_inverse=True)
+    totals = np.bincount(inverse.reshape(-1), weights=counts, minlength=len(pairs)).astype(np.int64)
+    return pairs >> 32, (pairs & 0xFFFFFFFF) - _BIN_LIMIT - 1, totals
+
+
+def merge_groups(parts: Iterable[MarginGroups]) -> MarginGroups:
+    # Combines partial aggregates over the same group columns, e.g. one per chunk.
+    parts = [part for part in parts]
+    if not parts:
+        raise ValueError("Nothing to merge.")
+    names = parts[0].names
+    if any(part.names != names for part in parts):
+        raise ValueError("Only groups over the same columns can be merged.")
+    codes, values = _factorize([np.concatenate([part.keys[index] for part in parts]) for index in range(len(names))])
+    groups = len(values[0])
+    offsets = np.cumsum([0] + [len(part) for part in parts])
+
+    def total(field: str, dtype) -> np.ndarray:
+        return np.bincount(codes, weights=np.concatenate([getattr(part, field) for part in parts]), minlength=groups).astype(dtype)
+
+    minimum = np.full(groups, np.inf)
+    maximum = np.full(groups, -np.inf)
+    np.minimum.at(minimum, codes, np.concatenate([part.minimum for part in parts]))
+    np.maximum.at(maximum, codes, np.concatenate([part.maximum for part in parts]))
+    bin_groups, bins, bin_counts = _count_bins(
+        np.concatenate([codes[offset + part.bin_groups] for offset, part in zip(offsets, parts)]),
+        np.concatenate([part.bins for part in parts]),
+        np.concatenate([part.bin_counts for part in parts]),
+    )
+    return MarginGroups(
+        names,
+        values,
+        total("quotes", np.int64),
+        total("priced", np.int64),
+        total("below_target", np.int64),
+        total("revenue", np.float64),
+        total("weighted_margin", np.float64),
+        total("leakage", np.float64),
+        minimum,
+        maximum,
+        bin_groups,
+        bins,
+        bin_counts,
+    )
+
+
+def rollup_name(names: Sequence[str]) -> str:
+    return "+".join(names)
+
+
+def write_summary(path, rollups: Sequence[MarginGroups], fractions: Sequence[float] = DEFAULT_PERCENTILES) -> None:
+    # JSON when the path ends in .json, otherwise CSV with a `rollup` column and one
+    # column per key name used by any rollup.
+    if str(path).lower().endswith(".json"):
+        report = {
+            rollup_name(groups.names): {"group_by": list(groups.names), "groups": groups.summary(fractions)}
+            for groups in rollups
+        }
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+        return
+
+    key_names: List[str] = []
+    for groups in rollups:
+        key_names.extend(name for name in groups.names if name not in key_names)
+    with open(path, "w", encoding="utf-8", newline="") as handle:
+        writer = None
+        for groups in rollups:
+            for row in groups.summary(fractions):
+                if writer is None:
+                    metrics = [name for name in row if name not in groups.names]
+                    writer = csv.DictWriter(handle, ["rollup"] + key_names + metrics, lineterminator="\n")
+                    writer.writeheader()
+                writer.writerow({"rollup": rollup_name(groups.names), **{k: ("" if v is None else v) for k, v in row.items()}})
+
+
+class MarginRollup:
+    # Running totals for one or more group-by column sets; each chunk's partial is
+    # merged in as it arrives, so memory follows the number of groups, not rows.
+    def __init__(self, group_by: Sequence[Sequence[str]], target_margin: Optional[float] = None) -> None:
+        if not group_by or any(not names for names in group_by):
+            raise ValueError("Group by at least one column.")
+        self.group_by = [tuple(names) for names in group_by]
+        self.target_margin = target_margin
+        self.totals: List[Optional[MarginGroups]] = [None] * len(self.group_by)
+
+    @property
+    def columns(self) -> List[str]:
+        names: List[str] = []
+        for group in self.group_by:
+            names.extend(name for name in group if name not in names)
+        return names
+
+    def add(self, result: BatchResult, keys: Dict[str, Sequence]) -> None:
+        # `keys` holds a value column for every name in `columns`.
+        for position, names in enumerate(self.group_by):
+            part = MarginGroups.from_batch(result, {name: keys[name] for name in names}, self.target_margin)
+            total = self.totals[position]
+            self.totals[position] = part if total is None else total.merge(part)
+
+    def merge(self, other: "MarginRollup") -> None:
+        if other.group_by != self.group_by:
+            raise ValueError("Only rollups over the same columns can be merged.")
+        self.totals = [
+            mine if theirs is None else theirs if mine is None else mine.merge(theirs)
+            for mine, theirs in zip(self.totals, other.totals)
+        ]
+
+    def write(self, path, fractions: Sequence[float] = DEFAULT_PERCENTILES) -> None:
+        write_summary(path, [groups for groups in self.totals if groups is not None], fractions)
+
+
+def parse_group_by(items: Sequence[str]) -> List[Tuple[str, ...]]:
+    # "family" or "rep,customer" per item.
+    group_by = []
+    for item in items:
+        names = tuple(name.strip() for name in item.split(",") if name.strip())
+        if not names:
+            raise ValueError(f"Invalid group columns {item!r}.")
+        group_by.append(names)
+    return group_by
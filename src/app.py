@@ -1,7 +1,22 @@
-import math
+import importlib.util
+import os
+import time
 import tkinter as tk
 
-from .calculations import calculate_all, reset_values
+from .assets import load_logo
+from .cache import CalculationCache
+from .calculations import (
+    FIELD_BITS,
+    FIELD_NAMES,
+    CalculationResult,
+    affected_fields,
+    calculate_all,
+    fmt_money,
+    fmt_pct,
+    parse_float,
+    reset_values,
+    set_journal,
+)
 from .theme import (
     APP_THEME,
     FONT_BODY,
@@ -16,6 +31,10 @@ from .theme import (
 )
 from .ui_components import FieldRow
 
+# Panels that start hidden are imported on first use; the sensitivity panel pulls in
+# numpy, which is optional for the calculator and slow to import.
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+
 
 FIELD_DEFINITIONS = (
     ("cost", "Cost Price (€):"),
@@ -26,6 +45,11 @@ FIELD_DEFINITIONS = (
     ("target_margin", "Target Margin on Net2 (%):"),
 )
 
+LIVE_DELAY_MS = 250
+HISTORY_FLUSH_MS = 2000
+HISTORY_RECENT = 100
+SCENARIO_POLL_MS = 16
+
 OUTPUT_DEFINITIONS = (
     ("m_no", "Margin without Discount (%):"),
     ("m_with", "Margin with Discount & Added Value (%):"),
@@ -33,7 +57,7 @@ OUTPUT_DEFINITIONS = (
 
 
 class MarginCalculatorApp:
-    def __init__(self, root: tk.Tk) -> None:
+    def __init__(self, root: tk.Tk, record_history: bool = True) -> None:
         self.root = root
         self.root.title("Margin Calculator")
         self.root.geometry("980x900")
@@ -41,6 +65,23 @@ class MarginCalculatorApp:
         self.root.configure(bg=APP_THEME.background)
 
         self.values, self.sources = reset_values()
+        self.cache = CalculationCache(maxsize=256)
+        self.live = tk.BooleanVar(value=False)
+        self._live_job = None
+        self._dirty = set()
+        self._status_color = None
+        self.record_history = record_history
+        self.history = None
+        self._history_unavailable = False
+        self._history_job = None
+        self._history_entries = []
+        self.history_window = None
+        self.scenario_window = None
+        self.scenario_table = None
+        self.scenario_runner = None
+        self._scenario_job = None
+        self.customer = tk.StringVar(value="")
+        self.product = tk.StringVar(value="")
         self.variables = {name: tk.StringVar(value=value) for name, value in self.values.items()}
 
         self.page = tk.Frame(self.root, bg=APP_THEME.background)
@@ -148,25 +189,37 @@ class MarginCalculatorApp:
             padx=20,
             pady=8,
         )
-        self.reset_button = tk.Button(
+        self.reset_button = self._secondary_button("Reset", self.on_reset)
+
+        self.calculate_button.pack(side="left")
+        self.reset_button.pack(side="left", padx=(SPACING_SM, 0))
+
+        self.sensitivity = None
+        if HAS_NUMPY:
+            self.sensitivity_button = self._secondary_button("Sensitivity", self.on_toggle_sensitivity)
+            self.sensitivity_button.pack(side="left", padx=(SPACING_SM, 0))
+
+        self.quote_lines = None
+        self.quote_window = None
+        self.quote_lines_button = self._secondary_button("Quote Lines", self.on_open_quote_lines)
+        self.quote_lines_button.pack(side="left", padx=(SPACING_SM, 0))
+
+        self.history_button = self._secondary_button("History", self.on_open_history)
+        self.history_button.pack(side="left", padx=(SPACING_SM, 0))
+
+        self.scenarios_button = self._secondary_button("Scenarios", self.on_open_scenarios)
+        self.scenarios_button.pack(side="left", padx=(SPACING_SM, 0))
+
+        self.live_toggle = tk.Checkbutton(
             self.actions,
-            text="Reset",
-            command=self.on_reset,
+            text="Live",
+            variable=self.live,
+            command=self.on_toggle_live,
             font=FONT_BODY,
             bg=APP_THEME.surface,
-            fg=APP_THEME.primary,
-            activebackground=APP_THEME.primary_soft,
-            activeforeground=APP_THEME.primary,
-            relief="solid",
-            bd=1,
-            highlightthickness=1,
-            highlightbackground=APP_THEME.border,
-            padx=20,
-            pady=8,
+            activebackground=APP_THEME.surface,
         )
-
-        self.calculate_button.pack(side="left")
-        self.reset_button.pack(side="left", padx=(SPACING_SM, 0))
+        self.live_toggle.pack(side="left", padx=(SPACING_SM, 0))
 
         self.footer = tk.Label(
             self.footer_frame,
@@ -178,26 +231,31 @@ class MarginCalculatorApp:
         self.footer.pack(side="right", anchor="e", padx=(SPACING_MD, 0))
 
         self.root.bind("<Return>", lambda _event: self.on_calculate())
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
 
-    def _render_logo(self) -> None:
-        logo = None
-        for path in ("festo_logo.png", "png-transparent-festo-hd-logo.png"):
-            try:
-                logo = tk.PhotoImage(file=path)
-                break
-            except tk.TclError:
-                continue
+    def _secondary_button(self, text: str, command, parent=None) -> tk.Button:
+        return tk.Button(
+            self.actions if parent is None else parent,
+            text=text,
+            command=command,
+            font=FONT_BODY,
+            bg=APP_THEME.surface,
+            fg=APP_THEME.primary,
+            activebackground=APP_THEME.primary_soft,
+            activeforeground=APP_THEME.primary,
+            relief="solid",
+            bd=1,
+            highlightthickness=1,
+            highlightbackground=APP_THEME.border,
+            padx=20,
+            pady=8,
+        )
 
+    def _render_logo(self) -> None:
+        logo = load_logo()
         if logo is None:
             return
 
-        max_width = 220
-        max_height = 56
-        scale = max(logo.width() / max_width, logo.height() / max_height)
-        if scale > 1:
-            factor = math.ceil(scale)
-            logo = logo.subsample(factor, factor)
-
         logo_wrap = tk.Frame(self.header, bg=APP_THEME.background)
         logo_wrap.pack(side="right", anchor="e")
         badge = tk.Frame(
@@ -246,59 +304,399 @@ class MarginCalculatorApp:
         return row
 
     def _mark_user(self, name: str) -> None:
-        value = self.variables[name].get().strip()
-        self.sources[name] = "user" if value else ""
+        text = self.variables[name].get()
+        value = text.strip()
+        source = "user" if value else ""
+        if text == self.values.get(name) and source == self.sources.get(name):
+            return
+        self.values[name] = text
+        self.sources[name] = source
+        self._dirty.add(name)
         if name == "net1":
             self._sync_net2_from_net1(value)
+        if self.live.get():
+            self._schedule_live()
+        self._submit_scenarios()
 
     def _sync_net2_from_net1(self, net1_value: str) -> None:
         if self.sources.get("net2") == "user":
             return
-        if net1_value:
-            self.variables["net2"].set(net1_value)
-            self.sources["net2"] = "calc"
-            self.fields["net2"].set_mode("output")
-        else:
-            self.variables["net2"].set("")
-            self.sources["net2"] = ""
-            self.fields["net2"].set_mode("input")
+        self.values["net2"] = net1_value
+        self.sources["net2"] = "calc" if net1_value else ""
+        self._dirty.add("net2")
+        self.variables["net2"].set(net1_value)
+        self.fields["net2"].set_mode("output" if net1_value else "input")
 
     def _set_status_style(self, status: str) -> None:
         color = APP_THEME.danger if status else APP_THEME.muted
-        self.status_field.set_foreground(color)
+        if color != self._status_color:
+            self._status_color = color
+            self.status_field.set_foreground(color)
+
+    def _schedule_live(self) -> None:
+        if self._live_job is not None:
+            self.root.after_cancel(self._live_job)
+        self._live_job = self.root.after(LIVE_DELAY_MS, self._run_live)
+
+    def _cancel_live(self) -> None:
+        if self._live_job is not None:
+            self.root.after_cancel(self._live_job)
+            self._live_job = None
+        self._dirty.clear()
+
+    def _run_live(self) -> None:
+        # Debounced solve from the user-entered fields only, so results never feed back
+        # into the next keystroke. Only fields reachable from the edited ones in the
+        # dependency graph are compared and pushed; text being typed is left alone.
+        self._live_job = None
+        dirty, self._dirty = self._dirty, set()
+        previous_sources = dict(self.sources)
+        previous_status = self.values.get("status", "")
+        sources = {name: "user" for name, source in self.sources.items() if source == "user"}
+        values = {name: (value if name in sources else "") for name, value in self.values.items()}
+        result = calculate_all(values, sources, cache=self.cache)
+        if result.values.get("status", "") != previous_status:
+            names = FIELD_NAMES
+        else:
+            changed = dirty | {name for name in FIELD_NAMES if result.sources.get(name) != previous_sources.get(name)}
+            names = affected_fields(changed, result.sources)
+        self._apply(result, names, keep_user_text=True)
+
+    def _apply(self, result, names, keep_user_text: bool = False) -> None:
+        # self.values mirrors the displayed text, so unchanged fields cost no Tk calls.
+        previous = self.values
+        self.values = result.values
+        self.sources = result.sources
+        for name in names:
+            if keep_user_text and self.sources.get(name) == "user":
+                self.values[name] = previous.get(name, "")
+            elif self.values.get(name, "") != previous.get(name, ""):
+                self.variables[name].set(self.values.get(name, ""))
+            field = self.fields.get(name)
+            if field is not None and not field.output_only:
+                field.set_mode("output" if self.sources.get(name) == "calc" else "input")
+
+        self._set_status_style(self.values.get("status", ""))
+        if self.sensitivity is not None and self.sensitivity_visible:
+            self.sensitivity.update(self.values)
+        self._submit_scenarios()
 
     def on_calculate(self) -> None:
+        self._cancel_live()
         for key in self.values:
             self.values[key] = self.variables[key].get()
 
-        result = calculate_all(self.values, self.sources)
-        self.values = result.values
-        self.sources = result.sources
+        result = calculate_all(self.values, self.sources, cache=self.cache)
+        self._apply(result, FIELD_NAMES)
+        self._record_history(result)
 
-        for key, value in self.values.items():
-            self.variables[key].set(value)
+    def on_toggle_live(self) -> None:
+        if self.live.get():
+            self.on_calculate()
+        else:
+            self._cancel_live()
+
+    def on_toggle_sensitivity(self) -> None:
+        if self.sensitivity is None:
+            self.sensitivity_visible = False
+            self.sensitivity_frame = tk.Frame(
+                self.page,
+                bg=APP_THEME.surface,
+                highlightbackground=APP_THEME.border,
+                highlightthickness=1,
+            )
+            from .sensitivity_panel import SensitivityPanel
+
+            self.sensitivity = SensitivityPanel(self.sensitivity_frame, background=APP_THEME.surface)
+            self.sensitivity.pack(padx=SPACING_LG, pady=SPACING_LG)
+
+        self.sensitivity_visible = not self.sensitivity_visible
+        if self.sensitivity_visible:
+            self.root.geometry("1500x900")
+            self.sensitivity_frame.pack(
+                side="right",
+                fill="y",
+                padx=(0, SPACING_LG),
+                pady=(0, SPACING_LG),
+                before=self.card,
+            )
+            self.sensitivity.update(self.values)
+        else:
+            self.sensitivity_frame.pack_forget()
+            self.root.geometry("980x900")
 
-        for name, field in self.fields.items():
-            if field.output_only:
-                field.set_mode("output")
-                continue
-            field.set_mode("output" if self.sources.get(name) == "calc" else "input")
+    def on_open_quote_lines(self) -> None:
+        if self.quote_window is not None:
+            self.quote_window.deiconify()
+            self.quote_window.lift()
+            return
 
-        self._set_status_style(self.values.get("status", ""))
+        from .quote_lines import QuoteLines
+        from .quote_table import QuoteTable
+
+        self.quote_lines = QuoteLines()
+        self.quote_window = tk.Toplevel(self.root)
+        self.quote_window.title("Quote Lines")
+        self.quote_window.configure(bg=APP_THEME.surface)
+        self.quote_window.protocol("WM_DELETE_WINDOW", self.quote_window.withdraw)
+
+        self.quote_table = QuoteTable(self.quote_window, self.quote_lines)
+        self.quote_table.pack(fill="both", expand=True, padx=SPACING_LG, pady=(SPACING_LG, SPACING_SM))
+
+        buttons = tk.Frame(self.quote_window, bg=APP_THEME.surface)
+        buttons.pack(fill="x", padx=SPACING_LG, pady=(0, SPACING_LG))
+        self._secondary_button("Add Line", self.on_add_line, buttons).pack(side="left")
+        self._secondary_button("Add Calculator Quote", self.on_add_calculator_quote, buttons).pack(
+            side="left", padx=(SPACING_SM, 0)
+        )
+        if HAS_NUMPY:
+            self._secondary_button("Load Schedule…", self.on_load_schedule, buttons).pack(
+                side="left", padx=(SPACING_SM, 0)
+            )
+
+    def on_load_schedule(self) -> None:
+        from tkinter import filedialog, messagebox
+
+        from .schedules import load_schedule
+
+        path = filedialog.askopenfilename(
+            parent=self.quote_window,
+            title="Discount Schedule",
+            filetypes=(("CSV files", "*.csv"), ("All files", "*.*")),
+        )
+        if not path:
+            return
+        try:
+            schedule = load_schedule(path)
+        except (OSError, ValueError) as exc:
+            messagebox.showerror("Discount Schedule", str(exc), parent=self.quote_window)
+            return
+        self.quote_lines.set_schedule(schedule)
+        self.quote_table.render()
+
+    def on_add_line(self, **values) -> None:
+        index = self.quote_lines.append(**values)
+        self.quote_table.scroll_to(index)
+        self.quote_table.render()
+
+    def on_add_calculator_quote(self) -> None:
+        values = {}
+        for name in FIELD_BITS:
+            if self.sources.get(name) != "user":
+                continue
+            try:
+                values[name] = parse_float(self.variables[name].get())
+            except ValueError:
+                continue
+        self.on_add_line(**values)
 
     def on_reset(self) -> None:
-        self.values, self.sources = reset_values()
-        for key, value in self.values.items():
-            self.variables[key].set(value)
-        for field in self.fields.values():
-            field.set_mode("output" if field.output_only else "input")
-        self._set_status_style("")
+        self._cancel_live()
+        values, sources = reset_values()
+        self._apply(CalculationResult(values, sources, ""), FIELD_NAMES)
+
+    def _get_history(self):
+        # Opened on first use; when the history file cannot be opened the calculator
+        # simply works without it.
+        if self.history is None and self.record_history and not self._history_unavailable:
+            from .history import HISTORY_ERRORS, QuoteHistory
+
+            try:
+                self.history = QuoteHistory()
+            except HISTORY_ERRORS:
+                self._history_unavailable = True
+        return self.history
+
+    def _record_history(self, result: CalculationResult) -> None:
+        history = self._get_history()
+        if history is None:
+            return
+        customer = self.customer.get().strip() or None
+        product = self.product.get().strip() or None
+        if history.record_calculation(result, customer, product) and self._history_job is None:
+            # Calculations in quick succession are written in one transaction.
+            self._history_job = self.root.after(HISTORY_FLUSH_MS, self._flush_history)
+
+    def _flush_history(self) -> None:
+        from .history import HISTORY_ERRORS
+
+        self._history_job = None
+        try:
+            self.history.flush()
+        except HISTORY_ERRORS:
+            return
+        if self.history_window is not None and self.history_window.winfo_ismapped():
+            self._refresh_history()
+
+    def on_open_history(self) -> None:
+        if self.history_window is not None:
+            self.history_window.deiconify()
+            self.history_window.lift()
+            self._refresh_history()
+            return
+
+        self.history_window = tk.Toplevel(self.root)
+        self.history_window.title("Quote History")
+        self.history_window.configure(bg=APP_THEME.surface)
+        self.history_window.protocol("WM_DELETE_WINDOW", self.history_window.withdraw)
+
+        tags = tk.Frame(self.history_window, bg=APP_THEME.surface)
+        tags.pack(fill="x", padx=SPACING_LG, pady=(SPACING_LG, SPACING_SM))
+        for column, (label, variable) in enumerate((("Customer", self.customer), ("Product", self.product))):
+            tk.Label(tags, text=label, font=FONT_BODY, bg=APP_THEME.surface, fg=APP_THEME.text).grid(
+                row=0, column=column * 2, sticky="w", padx=(0 if column == 0 else SPACING_MD, SPACING_XS)
+            )
+            tk.Entry(tags, textvariable=variable, width=24, font=FONT_BODY).grid(row=0, column=column * 2 + 1, sticky="w")
+            variable.trace_add("write", lambda *_args: self._refresh_history())
+        tk.Label(
+            tags,
+            text="New calculations are tagged with these; the list shows matching quotes.",
+            font=FONT_SMALL,
+            bg=APP_THEME.surface,
+            fg=APP_THEME.muted,
+        ).grid(row=1, column=0, columnspan=4, sticky="w", pady=(SPACING_XS, 0))
+
+        self.history_list = tk.Listbox(
+            self.history_window,
+            width=100,
+            height=20,
+            font=FONT_SMALL,
+            activestyle="none",
+            bg=APP_THEME.surface,
+            fg=APP_THEME.text,
+            selectbackground=APP_THEME.primary_soft,
+            selectforeground=APP_THEME.text,
+            relief="flat",
+            highlightthickness=1,
+            highlightbackground=APP_THEME.border,
+        )
+        self.history_list.pack(fill="both", expand=True, padx=SPACING_LG)
+        self.history_list.bind("<Double-Button-1>", lambda _event: self.on_recall_history())
+        self.history_list.bind("<Return>", lambda _event: self.on_recall_history())
+
+        buttons = tk.Frame(self.history_window, bg=APP_THEME.surface)
+        buttons.pack(fill="x", padx=SPACING_LG, pady=SPACING_LG)
+        self._secondary_button("Recall", self.on_recall_history, buttons).pack(side="left")
+        self._refresh_history()
+
+    def _refresh_history(self) -> None:
+        from .history import HISTORY_ERRORS
+
+        history = self._get_history()
+        entries = []
+        if history is not None:
+            try:
+                entries = history.recent(
+                    HISTORY_RECENT,
+                    customer=self.customer.get().strip() or None,
+                    product=self.product.get().strip() or None,
+                )
+            except HISTORY_ERRORS:
+                entries = []
+        self._history_entries = entries
+        self.history_list.delete(0, "end")
+        for entry in entries:
+            result = entry.result
+            net2 = "—" if result.net2 is None else f"€{fmt_money(result.net2)}"
+            margin = "—" if result.m_with is None else f"{fmt_pct(result.m_with)}%"
+            self.history_list.insert(
+                "end",
+                f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(entry.created))}   "
+                f"{entry.customer or '—':<16} {entry.product or '—':<16} "
+                f"Net2 {net2:<12} Margin {margin:<9} {result.message}",
+            )
+
+    def on_recall_history(self) -> None:
+        selection = self.history_list.curselection()
+        if not selection:
+            return
+        self._cancel_live()
+        self._apply(self._history_entries[selection[0]].to_calculation(), FIELD_NAMES)
+
+    def on_open_scenarios(self) -> None:
+        if self.scenario_window is not None:
+            self.scenario_window.deiconify()
+            self.scenario_window.lift()
+            self._submit_scenarios()
+            return
+
+        from .scenario_table import ScenarioTable
+        from .scenarios import ScenarioRunner
+
+        self.scenario_runner = ScenarioRunner()
+        self.scenario_window = tk.Toplevel(self.root)
+        self.scenario_window.title("Scenarios")
+        self.scenario_window.configure(bg=APP_THEME.surface)
+        self.scenario_window.protocol("WM_DELETE_WINDOW", self.on_close_scenarios)
+
+        self.scenario_table = ScenarioTable(self.scenario_window, self._submit_scenarios)
+        self.scenario_table.pack(fill="both", expand=True, padx=SPACING_LG, pady=(SPACING_LG, SPACING_SM))
+
+        buttons = tk.Frame(self.scenario_window, bg=APP_THEME.surface)
+        buttons.pack(fill="x", padx=SPACING_LG, pady=(0, SPACING_LG))
+        self._secondary_button("Add Scenario", self.on_add_scenario, buttons).pack(side="left")
+        self._submit_scenarios()
+
+    def on_add_scenario(self) -> None:
+        from .scenarios import Scenario
+
+        self.scenario_table.add(Scenario(f"Scenario {len(self.scenario_table.columns)}"))
+
+    def on_close_scenarios(self) -> None:
+        self.scenario_runner.cancel()
+        self.scenario_window.withdraw()
+
+    def _submit_scenarios(self) -> None:
+        # Called on every input change while the window is open. Solving happens on the
+        # runner's worker; earlier work that is now stale is cancelled there.
+        if self.scenario_table is None or self.scenario_window.state() == "withdrawn":
+            return
+        self.scenario_runner.submit(self.values, self.sources, self.scenario_table.scenarios)
+        if self._scenario_job is None:
+            self._scenario_job = self.root.after(SCENARIO_POLL_MS, self._poll_scenarios)
+
+    def _poll_scenarios(self) -> None:
+        self._scenario_job = None
+        for index, result in self.scenario_runner.poll():
+            self.scenario_table.show(index, result)
+        if self.scenario_runner.busy:
+            self._scenario_job = self.root.after(SCENARIO_POLL_MS, self._poll_scenarios)
+
+    def on_close(self) -> None:
+        if self._scenario_job is not None:
+            self.root.after_cancel(self._scenario_job)
+            self._scenario_job = None
+        if self.scenario_runner is not None:
+            self.scenario_runner.close()
+        if self._history_job is not None:
+            self.root.after_cancel(self._history_job)
+            self._history_job = None
+        if self.history is not None:
+            from .history import HISTORY_ERRORS
+
+            try:
+                self.history.close()
+            except HISTORY_ERRORS:
+                pass
+        self.root.destroy()
 
 
 def main() -> None:
+    journal = None
+    # The journal needs numpy, so it is only imported when one is configured.
+    if HAS_NUMPY and os.environ.get("MARGIN_CALCULATOR_JOURNAL"):
+        from .journal import journal_from_environment
+
+        journal = journal_from_environment()
+        set_journal(journal)
     root = tk.Tk()
     MarginCalculatorApp(root)
-    root.mainloop()
+    try:
+        root.mainloop()
+    finally:
+        if journal is not None:
+            set_journal(None)
+            journal.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,79 @@
+import math
+import os
+import sys
+import tkinter as tk
+from pathlib import Path
+from typing import Optional, Sequence
+
+# Assets sit next to Mergeberekening4.pyw, one level above this package, so the app
+# finds them whatever the working directory is.
+ASSET_ROOT = Path(__file__).resolve().parent.parent
+LOGO_FILES = ("festo_logo.png", "png-transparent-festo-hd-logo.png")
+LOGO_MAX_WIDTH = 220
+LOGO_MAX_HEIGHT = 56
+
+
+def find_asset(names: Sequence[str]) -> Optional[Path]:
+    for name in names:
+        path = ASSET_ROOT / name
+        if path.is_file():
+            return path
+    return None
+
+
+def cache_dir() -> Path:
+    # Kept on the local machine: the app itself is often started from a network share.
+    override = os.environ.get("MARGIN_CALCULATOR_CACHE")
+    if override:
+        return Path(override)
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or str(Path.home() / "AppData" / "Local")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or str(Path.home() / ".cache")
+    return Path(base) / "margin-calculator"
+
+
+def _store(image: "tk.PhotoImage", target: Path) -> None:
+    # Written under a temporary name and renamed, so two launches never see half a file.
+    # Cached copies of older versions of the same logo at this size are removed.
+    try:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        partial = target.with_name(f"{target.stem}.{os.getpid()}.tmp")
+        image.write(str(partial), format="png")
+        os.replace(partial, target)
+        stem, _stamp, size = target.stem.rsplit("-", 2)
+        for stale in target.parent.glob(f"{stem}-*-{size}.png"):
+            if stale != target:
+                stale.unlink()
+    except (OSError, tk.TclError):
+        pass
+
+
+def load_logo(max_width: int = LOGO_MAX_WIDTH, max_height: int = LOGO_MAX_HEIGHT) -> Optional["tk.PhotoImage"]:
+    # The scaled logo is cached on disk, keyed by the source file's mtime, so a normal
+    # launch decodes one small PNG instead of decoding and subsampling the original.
+    source = find_asset(LOGO_FILES)
+    if source is None:
+        return None
+    try:
+        stamp = source.stat().st_mtime_ns
+    except OSError:
+        return None
+
+    cached = cache_dir() / f"{source.stem}-{stamp}-{max_width}x{max_height}.png"
+    if cached.is_file():
+        try:
+            return tk.PhotoImage(file=str(cached))
+        except tk.TclError:
+            pass
+
+    try:
+        logo = tk.PhotoImage(file=str(source))
+    except tk.TclError:
+        return None
+    scale = max(logo.width() / max_width, logo.height() / max_height)
+    if scale > 1:
+        factor = math.ceil(scale)
+        logo = logo.subsample(factor, factor)
+    _store(logo, cached)
+    return logo
@@ -0,0 +1,604 @@
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+
+import numpy as np
+
+from .calculations import (
+    FIELD_BITS,
+    INPUT_FIELDS,
+    PLAN_PASSES,
+    SOLVE_PLANS,
+    STATUS_AV_NEGATIVE,
+    STATUS_AV_NEGATIVE_SOLVED,
+    STATUS_DISCOUNT_100_AV,
+    STATUS_DISCOUNT_100_NET1,
+    STATUS_DISCOUNT_RANGE,
+    STATUS_MARGIN_100_NET2,
+    STATUS_MARGIN_RANGE,
+    STATUS_MESSAGES,
+    STATUS_SOLVED_DISCOUNT_RANGE,
+    STATUS_TOO_MANY_INPUTS,
+    STATUS_ZERO_DENOMINATOR,
+    STEP_NAMES,
+    QuoteResult,
+    get_journal,
+    get_tracer,
+)
+from .fixedpoint import (
+    ROUND_CEILING,
+    ROUND_DOWN,
+    ROUND_HALF_DOWN,
+    ROUND_HALF_EVEN,
+    ROUND_HALF_UP,
+    ROUND_UP,
+    SCALE,
+    check_rounding,
+)
+
+if TYPE_CHECKING:
+    from .cache import CalculationCache
+
+_KEY_DTYPE = np.dtype([("inputs", "<f8", (len(INPUT_FIELDS),)), ("user", "u1")])
+_RESULT_FIELDS = ("cost", "net1", "added_value", "discount", "net2", "target_margin", "m_no", "m_with")
+
+# Missing value marker for the int64 cents/basis-point columns.
+MISSING_CENTS = np.iinfo(np.int64).min
+
+
+@dataclass
+class BatchResult:
+    cost: np.ndarray
+    net1: np.ndarray
+    added_value: np.ndarray
+    discount: np.ndarray
+    net2: np.ndarray
+    target_margin: np.ndarray
+    m_no: np.ndarray
+    m_with: np.ndarray
+    status: np.ndarray
+    calc: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.status)
+
+    def messages(self) -> List[str]:
+        return [STATUS_MESSAGES[code] for code in self.status.tolist()]
+
+
+@dataclass
+class BatchTrace:
+    rows: int
+    seconds: float
+    iterations: int
+    patterns: np.ndarray
+    statuses: np.ndarray
+
+
+def _column(values, name: str, size: Optional[int]) -> np.ndarray:
+    # float64 arrays (including memory-mapped ones) are used as they are; the solver
+    # only reads its inputs and works on its own copies.
+    column = np.asarray(values, dtype=np.float64)
+    if column.ndim != 1:
+        raise ValueError(f"Column '{name}' must be one-dimensional.")
+    if size is not None and len(column) != size:
+        raise ValueError(f"Column '{name}' has {len(column)} rows, expected {size}.")
+    return column
+
+
+def calculate_batch(
+    cost,
+    net1,
+    added_value,
+    discount,
+    net2,
+    target_margin,
+    user=None,
+    cache: Optional["CalculationCache"] = None,
+) -> BatchResult:
+    if cache is not None and cache.active:
+        result = _calculate_batch_cached(cache, cost, net1, added_value, discount, net2, target_margin, user)
+    else:
+        result = _solve_batch(cost, net1, added_value, discount, net2, target_margin, user)
+    journal = get_journal()
+    if journal is not None:
+        journal.record_batch((cost, net1, added_value, discount, net2, target_margin), user, result)
+    return result
+
+
+def _solve_batch(cost, net1, added_value, discount, net2, target_margin, user) -> BatchResult:
+    # Missing inputs are NaN. Discount and target margin are percentages, as in the
+    # string fields. `user` holds one FIELD_BITS bitmask per row for "user" sources.
+    tracer = get_tracer()
+    started = time.perf_counter()
+    inputs = []
+    size = None
+    for name, values in zip(INPUT_FIELDS, (cost, net1, added_value, discount, net2, target_margin)):
+        column = _column(values, name, size)
+        size = len(column)
+        inputs.append(column)
+
+    if user is None:
+        user_bits = np.zeros(size, dtype=np.uint8)
+    else:
+        user_bits = np.asarray(user, dtype=np.uint8)
+        if user_bits.shape != (size,):
+            raise ValueError(f"User mask must have shape ({size},).")
+
+    c, n1, av, d, n2, m = (column.copy() for column in inputs)
+    d /= 100.0
+    m /= 100.0
+
+    has_c = ~np.isnan(c)
+    has_n1 = ~np.isnan(n1)
+    has_av = ~np.isnan(av)
+    has_d = ~np.isnan(d)
+    has_n2 = ~np.isnan(n2)
+    has_m = ~np.isnan(m)
+
+    net2_user = (user_bits & FIELD_BITS["net2"]) != 0
+    av_user = (user_bits & FIELD_BITS["added_value"]) != 0
+
+    status = np.zeros(size, dtype=np.uint8)
+    active = np.ones(size, dtype=bool)
+    av_assumed_zero = np.zeros(size, dtype=bool)
+
+    def fail(mask: np.ndarray, code: int) -> None:
+        mask = mask & active
+        status[mask] = code
+        active[mask] = False
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fail(has_av & (av < 0), STATUS_AV_NEGATIVE)
+        fail(has_d & ((d < 0) | (d > 1)), STATUS_DISCOUNT_RANGE)
+        fail(has_m & ((m < 0) | (m > 1)), STATUS_MARGIN_RANGE)
+
+        cleared = has_m & ~net2_user
+        n2[cleared] = np.nan
+        has_n2 &= ~cleared
+
+        fail(has_m & has_c & has_n2 & net2_user, STATUS_TOO_MANY_INPUTS)
+
+        net_pair = has_n1 & has_n2
+        both_missing = active & ~has_av & ~has_d
+        av_only_missing = active & ~has_av & has_d & ~net_pair
+        discount_only_missing = active & has_av & ~has_d & (~has_m | ~has_c) & ~net_pair
+
+        assume_av = both_missing | av_only_missing
+        av[assume_av] = 0.0
+        has_av |= assume_av
+        av_assumed_zero |= assume_av
+
+        assume_discount = (both_missing & ~net_pair) | discount_only_missing
+        d[assume_discount] = 0.0
+        has_d |= assume_discount
+
+        iterations = 0
+        for iterations in range(1, 31):
+            progress = np.zeros(size, dtype=bool)
+
+            rule = active & ~has_av & has_n1 & has_n2 & ~has_d
+            av[rule] = 0.0
+            has_av |= rule
+            av_assumed_zero |= rule
+            progress |= rule
+
+            one_minus_m = 1.0 - m
+            rule = active & has_m & ~has_n2 & has_c
+            fail(rule & (one_minus_m == 0), STATUS_MARGIN_100_NET2)
+            rule &= active
+            n2[rule] = c[rule] / one_minus_m[rule]
+            has_n2 |= rule
+            progress |= rule
+
+            rule = active & has_m & ~has_c & has_n2
+            c[rule] = n2[rule] * one_minus_m[rule]
+            has_c |= rule
+            progress |= rule
+
+            rule = active & ~has_d & has_n2 & has_n1 & has_av
+            denom = n1 + av
+            fail(rule & (denom == 0), STATUS_ZERO_DENOMINATOR)
+            rule &= active
+            candidate = 1.0 - (n2 / denom)
+            fallback = rule & (candidate < 0) & av_assumed_zero & ~av_user
+            av_candidate = n2 - n1
+            fail(fallback & (av_candidate < 0), STATUS_AV_NEGATIVE_SOLVED)
+            fallback &= active
+            d[fallback] = 0.0
+            av[fallback] = av_candidate[fallback]
+            solved = rule & ~fallback & active
+            d[solved] = candidate[solved]
+            fail(solved & ((d < 0) | (d > 1)), STATUS_SOLVED_DISCOUNT_RANGE)
+            rule &= active
+            has_d |= rule
+            progress |= rule
+
+            rule = active & ~has_n2 & has_n1 & has_av & has_d
+            n2[rule] = (n1[rule] + av[rule]) * (1.0 - d[rule])
+            has_n2 |= rule
+            progress |= rule
+
+            one_minus_d = 1.0 - d
+            rule = active & ~has_n1 & has_n2 & has_av & has_d
+            fail(rule & (one_minus_d == 0), STATUS_DISCOUNT_100_NET1)
+            rule &= active
+            n1[rule] = (n2[rule] / one_minus_d[rule]) - av[rule]
+            has_n1 |= rule
+            progress |= rule
+
+            rule = active & ~has_av & has_n2 & has_n1 & has_d
+            fail(rule & (one_minus_d == 0), STATUS_DISCOUNT_100_AV)
+            rule &= active
+            av_candidate = (n2 / one_minus_d) - n1
+            fail(rule & (av_candidate < 0), STATUS_AV_NEGATIVE_SOLVED)
+            rule &= active
+            av[rule] = av_candidate[rule]
+            has_av |= rule
+            progress |= rule
+
+            rule = (
+                active
+                & ~has_d
+                & (~has_m | ~has_c)
+                & (
+                    (~has_n2 & has_n1 & has_av)
+                    | (~has_n1 & has_n2 & has_av)
+                    | (~has_av & has_n2 & has_n1)
+                )
+            )
+            d[rule] = 0.0
+            has_d |= rule
+            progress |= rule
+
+            if not progress.any():
+                break
+
+        fail(has_av & (av < 0), STATUS_AV_NEGATIVE)
+
+        m_no = np.full(size, np.nan)
+        rule = active & has_c & has_n1 & (n1 != 0)
+        m_no[rule] = ((n1[rule] - c[rule]) / n1[rule]) * 100.0
+
+        m_with = np.full(size, np.nan)
+        rule = active & has_c & has_n2 & (n2 != 0)
+        m_with[rule] = ((n2[rule] - c[rule]) / n2[rule]) * 100.0
+
+    d *= 100.0
+    calc = np.zeros(size, dtype=np.uint8)
+    outputs = []
+    # Fields left unsolved (or failed rows) keep their input, like calculate_all keeps the string.
+    for name, original, column, present in zip(
+        INPUT_FIELDS,
+        inputs,
+        (c, n1, av, d, n2),
+        (has_c, has_n1, has_av, has_d, has_n2),
+    ):
+        solved = active & present
+        calc[solved] |= FIELD_BITS[name]
+        outputs.append(np.where(solved, column, original))
+    calc &= ~user_bits
+
+    if tracer is not None:
+        patterns = (net2_user.astype(np.uint8) << 6) | (av_user.astype(np.uint8) << 7)
+        for index, column in enumerate(inputs):
+            patterns |= (~np.isnan(column)).astype(np.uint8) << index
+        tracer.record_batch(
+            BatchTrace(
+                rows=size,
+                seconds=time.perf_counter() - started,
+                iterations=iterations,
+                patterns=np.bincount(patterns, minlength=256),
+                statuses=np.bincount(status, minlength=len(STATUS_MESSAGES)),
+            )
+        )
+
+    return BatchResult(
+        *outputs,
+        target_margin=inputs[5].copy(),
+        m_no=m_no,
+        m_with=m_with,
+        status=status,
+        calc=calc,
+    )
+
+
+def _optional(value: float) -> Optional[float]:
+    return None if value != value else value
+
+
+def _number(value: Optional[float]) -> float:
+    return np.nan if value is None else value
+
+
+def _calculate_batch_cached(
+    cache: "CalculationCache",
+    cost,
+    net1,
+    added_value,
+    discount,
+    net2,
+    target_margin,
+    user,
+) -> BatchResult:
+    # Duplicate rows are collapsed first; each distinct row then costs one cache lookup
+    # and only the misses go through the vectorized solver.
+    columns = [
+        _column(values, name, None)
+        for name, values in zip(INPUT_FIELDS, (cost, net1, added_value, discount, net2, target_margin))
+    ]
+    size = len(columns[0])
+    records = np.empty(size, dtype=_KEY_DTYPE)
+    for index, column in enumerate(columns):
+        if len(column) != size:
+            raise ValueError(f"Column '{INPUT_FIELDS[index]}' has {len(column)} rows, expected {size}.")
+        records["inputs"][:, index] = column
+    records["user"] = 0 if user is None else user
+
+    keys = records.view(np.dtype((np.void, _KEY_DTYPE.itemsize)))
+    unique_keys, first_rows, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    key_bytes = [key.tobytes() for key in unique_keys]
+
+    results: List[Optional[QuoteResult]] = [cache.get(key) for key in key_bytes]
+    missing = [index for index, result in enumerate(results) if result is None]
+    if missing:
+        rows = first_rows[missing]
+        solved = _solve_batch(*(column[rows] for column in columns), user=records["user"][rows])
+        fields = [getattr(solved, name).tolist() for name in _RESULT_FIELDS]
+        status = solved.status.tolist()
+        calc = solved.calc.tolist()
+        for position, index in enumerate(missing):
+            result = QuoteResult(
+                *(_optional(values[position]) for values in fields),
+                status=status[position],
+                calc=calc[position],
+            )
+            results[index] = result
+            cache.put(key_bytes[index], result)
+
+    unique_columns: Dict[str, np.ndarray] = {
+        name: np.array([_number(getattr(result, name)) for result in results], dtype=np.float64)
+        for name in _RESULT_FIELDS
+    }
+    unique_columns["status"] = np.array([result.status for result in results], dtype=np.uint8)
+    unique_columns["calc"] = np.array([result.calc for result in results], dtype=np.uint8)
+    return BatchResult(**{name: values[inverse.reshape(-1)] for name, values in unique_columns.items()})
+
+
+def div_round_array(numerator: np.ndarray, denominator, rounding: str = ROUND_HALF_UP) -> np.ndarray:
+    negative = (numerator < 0) != (np.asarray(denominator) < 0)
+    denominator = np.abs(denominator)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        quotient, remainder = np.divmod(np.abs(numerator), denominator)
+    twice = 2 * remainder
+    if rounding == ROUND_HALF_UP:
+        up = twice >= denominator
+    elif rounding == ROUND_HALF_EVEN:
+        up = (twice > denominator) | ((twice == denominator) & (quotient % 2 == 1))
+    elif rounding == ROUND_HALF_DOWN:
+        up = twice > denominator
+    elif rounding == ROUND_UP:
+        up = np.ones(quotient.shape, dtype=bool)
+    elif rounding == ROUND_DOWN:
+        up = np.zeros(quotient.shape, dtype=bool)
+    elif rounding == ROUND_CEILING:
+        up = ~negative
+    else:
+        up = negative
+    quotient += up & (remainder != 0)
+    return np.where(negative, -quotient, quotient)
+
+
+Fail = Callable[[np.ndarray, int], None]
+Divide = Callable[[np.ndarray, object], np.ndarray]
+
+
+# Array twins of the fixedpoint steps. Every row of a group shares one input pattern,
+# so the steps run unmasked; rows that already failed are ignored by `fail`.
+def _clear_net2_cents(x: List[np.ndarray], fail: Fail, div: Divide) -> None:
+    x[4] = np.full_like(x[4], MISSING_CENTS)
+
+
+def _too_many_inputs_cents(x: List[np.ndarray], fail: Fail, div: Divide) -> None:
+    fail(np.ones(len(x[0]), dtype=bool), STATUS_TOO_MANY_INPUTS)
+
+
+def _assume_av_zero_cents(x: List[np.ndarray], fail: Fail, div: Divide) -> None:
+    x[2] = np.zeros_like(x[2])
+
+
+def _assume_discount_zero_cents(x: List[np.ndarray], fail: Fail, div: Divide) -> None:
+    x[3] = np.zeros_like(x[3])
+
+
+def _net2_from_margin_cents(x: List[np.ndarray], fail: Fail, div: Divide) -> None:
+    denom = SCALE - x[5]
+    fail(denom == 0, STATUS_MARGIN_100_NET2)
+    x[4] = div(x[0] * SCALE, denom)
+
+
+def _cost_from_margin_cents(x: List[np.ndarray], fail: Fail, div: Divide) -> None:
+    x[0] = div(x[4] * (SCALE - x[5]), SCALE)
+
+
+def _discount_candidate_cents(x: List[np.ndarray], fail: Fail, div: Divide) -> np.ndarray:
+    denom = x[1] + x[2]
+    fail(denom == 0, STATUS_ZERO_DENOMINATOR)
+    return div((denom - x[4]) * SCALE, denom)
+
+
+def _solve_discount_cents(x: List[np.ndarray], fail: Fail, div: Divide) -> None:
+    discount = _discount_candidate_cents(x, fail, div)
+    fail((discount < 0) | (discount > SCALE), STATUS_SOLVED_DISCOUNT_RANGE)
+    x[3] = discount
+
+
+def _solve_discount_or_av_cents(x: List[np.ndarray], fail: Fail, div: Divide) -> None:
+    discount = _discount_candidate_cents(x, fail, div)
+    fallback = discount < 0
+    av_candidate = x[4] - x[1]
+    fail(fallback & (av_candidate < 0), STATUS_AV_NEGATIVE_SOLVED)
+    fail(discount > SCALE, STATUS_SOLVED_DISCOUNT_RANGE)
+    x[2] = np.where(fallback, av_candidate, x[2])
+    x[3] = np.where(fallback, 0, discount)
+
+
+def _net2_from_discount_cents(x: List[np.ndarray], fail: Fail, div: Divide) -> None:
+    x[4] = div((x[1] + x[2]) * (SCALE - x[3]), SCALE)
+
+
+def _net1_from_net2_cents(x: List[np.ndarray], fail: Fail, div: Divide) -> None:
+    denom = SCALE - x[3]
+    fail(denom == 0, STATUS_DISCOUNT_100_NET1)
+    x[1] = div(x[4] * SCALE, denom) - x[2]
+
+
+def _av_from_net2_cents(x: List[np.ndarray], fail: Fail, div: Divide) -> None:
+    denom = SCALE - x[3]
+    fail(denom == 0, STATUS_DISCOUNT_100_AV)
+    av_candidate = div(x[4] * SCALE, denom) - x[1]
+    fail(av_candidate < 0, STATUS_AV_NEGATIVE_SOLVED)
+    x[2] = av_candidate
+
+
+_CENTS_STEPS = {
+    "clear_net2": _clear_net2_cents,
+    "too_many_inputs": _too_many_inputs_cents,
+    "assume_av_zero": _assume_av_zero_cents,
+    "assume_discount_zero": _assume_discount_zero_cents,
+    "net2_from_margin": _net2_from_margin_cents,
+    "cost_from_margin": _cost_from_margin_cents,
+    "solve_discount": _solve_discount_cents,
+    "solve_discount_or_av": _solve_discount_or_av_cents,
+    "net2_from_discount": _net2_from_discount_cents,
+    "net1_from_net2": _net1_from_net2_cents,
+    "av_from_net2": _av_from_net2_cents,
+}
+_CENTS_PLANS = tuple(tuple(_CENTS_STEPS[STEP_NAMES[step]] for step in plan) for plan in SOLVE_PLANS)
+
+
+def _int_column(values, name: str, size: Optional[int]) -> np.ndarray:
+    column = np.asarray(values)
+    if column.ndim != 1:
+        raise ValueError(f"Column '{name}' must be one-dimensional.")
+    if column.dtype.kind not in "iu":
+        raise ValueError(f"Column '{name}' must hold integers (cents or basis points).")
+    if size is not None and len(column) != size:
+        raise ValueError(f"Column '{name}' has {len(column)} rows, expected {size}.")
+    return column.astype(np.int64)
+
+
+def calculate_batch_cents(
+    cost,
+    net1,
+    added_value,
+    discount,
+    net2,
+    target_margin,
+    user=None,
+    rounding: str = ROUND_HALF_UP,
+) -> BatchResult:
+    # Money columns are int64 cents, discount and target margin int64 basis points, and
+    # missing inputs are MISSING_CENTS. m_no and m_with come back in basis points.
+    # Rows are grouped by input pattern and each group runs its compiled solve plan.
+    check_rounding(rounding)
+    tracer = get_tracer()
+    started = time.perf_counter()
+    inputs = []
+    size = None
+    for name, values in zip(INPUT_FIELDS, (cost, net1, added_value, discount, net2, target_margin)):
+        column = _int_column(values, name, size)
+        size = len(column)
+        inputs.append(column)
+
+    if user is None:
+        user_bits = np.zeros(size, dtype=np.uint8)
+    else:
+        user_bits = np.asarray(user, dtype=np.uint8)
+        if user_bits.shape != (size,):
+            raise ValueError(f"User mask must have shape ({size},).")
+
+    def div(numerator: np.ndarray, denominator) -> np.ndarray:
+        return div_round_array(numerator, denominator, rounding)
+
+    present = [column != MISSING_CENTS for column in inputs]
+    status = np.zeros(size, dtype=np.uint8)
+    status[present[2] & (inputs[2] < 0)] = STATUS_AV_NEGATIVE
+    status[(status == 0) & present[3] & ((inputs[3] < 0) | (inputs[3] > SCALE))] = STATUS_DISCOUNT_RANGE
+    status[(status == 0) & present[5] & ((inputs[5] < 0) | (inputs[5] > SCALE))] = STATUS_MARGIN_RANGE
+
+    patterns = (((user_bits & FIELD_BITS["net2"]) != 0).astype(np.uint8) << 6) | (
+        ((user_bits & FIELD_BITS["added_value"]) != 0).astype(np.uint8) << 7
+    )
+    for index, mask in enumerate(present):
+        patterns |= mask.astype(np.uint8) << index
+    order = np.argsort(patterns, kind="stable")
+    counts = np.bincount(patterns, minlength=256)
+
+    solved = [column.copy() for column in inputs[:5]]
+    iterations = 0
+    start = 0
+    for pattern, count in enumerate(counts.tolist()):
+        if not count:
+            continue
+        rows = order[start:start + count]
+        start += count
+        plan = _CENTS_PLANS[pattern]
+        group_status = status[rows]
+        group_active = group_status == 0
+        if not plan or not group_active.any():
+            continue
+        iterations = max(iterations, PLAN_PASSES[pattern])
+
+        def fail(mask: np.ndarray, code: int) -> None:
+            mask = mask & group_active
+            group_status[mask] = code
+            group_active[mask] = False
+
+        x = [column[rows] for column in solved] + [inputs[5][rows]]
+        for step in plan:
+            step(x, fail, div)
+        for index in range(5):
+            solved[index][rows] = x[index]
+        status[rows] = group_status
+
+    c, n1, av, d, n2 = solved
+    has = [column != MISSING_CENTS for column in solved]
+    status[(status == 0) & has[2] & (av < 0)] = STATUS_AV_NEGATIVE
+    active = status == 0
+
+    m_no = np.full(size, MISSING_CENTS, dtype=np.int64)
+    rule = active & has[0] & has[1] & (n1 != 0)
+    m_no[rule] = div((n1[rule] - c[rule]) * SCALE, n1[rule])
+
+    m_with = np.full(size, MISSING_CENTS, dtype=np.int64)
+    rule = active & has[0] & has[4] & (n2 != 0)
+    m_with[rule] = div((n2[rule] - c[rule]) * SCALE, n2[rule])
+
+    calc = np.zeros(size, dtype=np.uint8)
+    outputs = []
+    for name, original, column, mask in zip(INPUT_FIELDS, inputs, solved, has):
+        mask = active & mask
+        calc[mask] |= FIELD_BITS[name]
+        outputs.append(np.where(mask, column, original))
+    calc &= ~user_bits
+
+    if tracer is not None:
+        tracer.record_batch(
+            BatchTrace(
+                rows=size,
+                seconds=time.perf_counter() - started,
+                iterations=iterations,
+                patterns=counts,
+                statuses=np.bincount(status, minlength=len(STATUS_MESSAGES)),
+            )
+        )
+
+    return BatchResult(
+        *outputs,
+        target_margin=inputs[5].copy(),
+        m_no=m_no,
+        m_with=m_with,
+        status=status,
+        calc=calc,
+    )
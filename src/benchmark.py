@@ -0,0 +1,699 @@
+import argparse
+import json
+import platform
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import fields
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .calculations import INPUT_FIELDS, SOLVER_LOOP, SOLVER_PLAN, QuoteInput, calculate_all, solve
+from .fixedpoint import solve_cents, solve_decimal
+
+PATTERN_CASES = {
+    "cost_margin": (
+        {"cost": "80", "target_margin": "30"},
+        ("cost", "target_margin"),
+    ),
+    "net1_discount": (
+        {"cost": "80", "net1": "120", "discount": "15"},
+        ("cost", "net1", "discount"),
+    ),
+    "net1_net2_solve_discount": (
+        {"cost": "80", "net1": "120", "net2": "100"},
+        ("cost", "net1", "net2"),
+    ),
+    "negative_discount_av_fallback": (
+        {"cost": "80", "net1": "100", "net2": "120"},
+        ("cost", "net1", "net2"),
+    ),
+    "error_too_many_inputs": (
+        {"cost": "80", "net2": "120", "target_margin": "30"},
+        ("cost", "net2", "target_margin"),
+    ),
+    "error_discount_range": (
+        {"net1": "120", "discount": "140"},
+        ("net1", "discount"),
+    ),
+    "error_margin_100": (
+        {"cost": "80", "target_margin": "100"},
+        ("cost", "target_margin"),
+    ),
+}
+
+BATCH_SIZES = (1, 10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+DEFAULT_MAX_ROWS = 1_000_000
+DEFAULT_THRESHOLD = 0.10
+
+
+def measure(func: Callable[[], object], min_time: float = 0.2, repeats: int = 5) -> Tuple[float, int]:
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time / repeats or number >= 1 << 20:
+            break
+        number *= 2 if elapsed == 0 else max(2, min(10, int((min_time / repeats) / elapsed) + 1))
+
+    best = elapsed / number
+    for _ in range(repeats - 1):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - started) / number)
+    return best, number
+
+
+def _record(results: Dict[str, dict], name: str, seconds: float, rows: int = 1, **extra) -> None:
+    entry = {"seconds_per_op": seconds, "ops_per_second": 1.0 / seconds if seconds else None}
+    if rows != 1:
+        entry["rows"] = rows
+        entry["rows_per_second"] = rows / seconds if seconds else None
+    entry.update(extra)
+    results[name] = entry
+
+
+def bench_patterns(results: Dict[str, dict], min_time: float) -> None:
+    for name, (filled, user_fields) in PATTERN_CASES.items():
+        values = {field: filled.get(field, "") for field in INPUT_FIELDS}
+        sources = {field: "user" for field in user_fields}
+        for solver in (SOLVER_PLAN, SOLVER_LOOP):
+            seconds, _ = measure(lambda: calculate_all(values, sources, solver), min_time)
+            _record(results, f"calculate_all.{solver}.{name}", seconds)
+
+
+def bench_batch(results: Dict[str, dict], max_rows: int, min_time: float) -> None:
+    try:
+        from .batch import calculate_batch
+        from .parallel import sample_columns
+    except ImportError as exc:
+        sys.stderr.write(f"Skipping batch benchmarks: {exc}\n")
+        return
+
+    for size in BATCH_SIZES:
+        if size > max_rows:
+            break
+        columns, user = sample_columns(size)
+        seconds, _ = measure(lambda: calculate_batch(*columns, user=user), min_time, repeats=3)
+        _record(results, f"calculate_batch.rows_{size}", seconds, rows=size)
+
+
+def bench_thresholds(results: Dict[str, dict], max_rows: int, min_time: float) -> None:
+    try:
+        from .parallel import sample_columns
+        from .thresholds import DiscountThresholdIndex
+    except ImportError as exc:
+        sys.stderr.write(f"Skipping threshold benchmarks: {exc}\n")
+        return
+
+    (cost, net1, added_value, *_rest), _user = sample_columns(max_rows)
+    started = time.perf_counter()
+    index = DiscountThresholdIndex(cost, net1, added_value)
+    _record(results, f"thresholds.build.rows_{max_rows}", time.perf_counter() - started, rows=max_rows)
+    seconds, _ = measure(lambda: index.count_below(20.0, 25.0), min_time)
+    _record(results, "thresholds.count_below", seconds)
+    seconds, _ = measure(lambda: index.max_discount(25.0, 100), min_time)
+    _record(results, "thresholds.max_discount", seconds)
+    state = {"row": 0}
+
+    def update() -> None:
+        state["row"] = (state["row"] + 7919) % max_rows
+        index.update(state["row"], cost=float(cost[state["row"]]) * 1.01)
+
+    seconds, _ = measure(update, min_time)
+    _record(results, "thresholds.update", seconds)
+
+
+def bench_bom(results: Dict[str, dict], max_rows: int, min_time: float) -> None:
+    # A layered BOM: half bought parts, half assemblies of four earlier items each.
+    # An update reprices only the assemblies that use the changed part.
+    try:
+        import numpy as np
+
+        from .bom import BomGraph, BomPriceList
+    except ImportError as exc:
+        sys.stderr.write(f"Skipping BOM benchmarks: {exc}\n")
+        return
+
+    rng = np.random.default_rng(1)
+    parts = max(max_rows // 2, 8)
+    names = [f"P{row}" for row in range(parts)] + [f"A{row}" for row in range(parts)]
+    picks = (rng.random((parts, 4)) * (parts + np.arange(parts)[:, None])).astype(np.int64)
+    lines = [(names[parts + row], names[pick], 1 + int(pick % 3)) for row in range(parts) for pick in picks[row]]
+    costs = list(zip(names[:parts], rng.uniform(1.0, 50.0, parts).tolist()))
+    started = time.perf_counter()
+    bom = BomGraph.from_rows(lines, costs)
+    _record(results, f"bom.build.items_{2 * parts}", time.perf_counter() - started, rows=2 * parts)
+    assemblies = names[parts:]
+    started = time.perf_counter()
+    prices = BomPriceList(bom, assemblies, net1=rng.uniform(100.0, 5000.0, parts), target_margin=np.full(parts, 30.0))
+    _record(results, f"bom.price_list.rows_{parts}", time.perf_counter() - started, rows=parts)
+    state = {"part": 0}
+
+    def update() -> None:
+        state["part"] = (state["part"] + 7919) % parts
+        prices.set_component_cost(names[state["part"]], float(costs[state["part"]][1]) * 1.01)
+
+    seconds, _ = measure(update, min_time)
+    _record(results, "bom.update", seconds)
+
+
+def bench_schedules(results: Dict[str, dict], max_rows: int, min_time: float) -> None:
+    # Same lines as calculate_batch.rows_N, with every empty discount resolved from a
+    # three-tier quantity-break schedule first.
+    try:
+        import numpy as np
+
+        from .parallel import sample_columns
+        from .schedules import DiscountSchedule, calculate_batch_scheduled
+    except ImportError as exc:
+        sys.stderr.write(f"Skipping schedule benchmarks: {exc}\n")
+        return
+
+    schedule = DiscountSchedule(
+        [("*", 1, 0.0), ("*", 10, 5.0), ("*", 100, 10.0), ("gold", 1, 5.0), ("gold", 50, 12.0), ("silver", 10, 7.0)]
+    )
+    columns, user = sample_columns(max_rows)
+    rng = np.random.default_rng(1)
+    quantity = rng.integers(1, 1000, max_rows).astype(np.float64)
+    tiers = rng.integers(0, len(schedule) + 1, max_rows)
+    seconds, _ = measure(lambda: calculate_batch_scheduled(schedule, quantity, tiers, *columns, user=user), min_time, repeats=3)
+    _record(results, f"calculate_batch_scheduled.rows_{max_rows}", seconds, rows=max_rows)
+
+
+def bench_analytics(results: Dict[str, dict], max_rows: int, min_time: float) -> None:
+    # Margin rollup of calculate_batch.rows_N results by 1,000 customers, in one pass
+    # and as ten chunk partials merged together.
+    try:
+        import numpy as np
+
+        from .analytics import MarginGroups, merge_groups
+        from .batch import BatchResult, calculate_batch
+        from .parallel import sample_columns
+    except ImportError as exc:
+        sys.stderr.write(f"Skipping analytics benchmarks: {exc}\n")
+        return
+
+    columns, user = sample_columns(max_rows)
+    result = calculate_batch(*columns, user=user)
+    customers = np.char.add("c", np.random.default_rng(1).integers(0, 1000, max_rows).astype(str))
+    seconds, _ = measure(lambda: MarginGroups.from_batch(result, {"customer": customers}, 20.0), min_time, repeats=3)
+    _record(results, f"analytics.group.rows_{max_rows}", seconds, rows=max_rows)
+    step = max(max_rows // 10, 1)
+    parts = []
+    for start in range(0, max_rows, step):
+        rows = slice(start, start + step)
+        chunk = BatchResult(**{field.name: getattr(result, field.name)[rows] for field in fields(BatchResult)})
+        parts.append(MarginGroups.from_batch(chunk, {"customer": customers[rows]}, 20.0))
+    seconds, _ = measure(lambda: merge_groups(parts), min_time)
+    _record(results, f"analytics.merge.parts_{len(parts)}", seconds)
+
+
+def bench_optimizer(results: Dict[str, dict], max_rows: int, min_time: float) -> None:
+    # Discount proposals for calculate_batch.rows_N catalogs, unconstrained and with a
+    # leakage cap at half of what the unconstrained plan gives away.
+    try:
+        import numpy as np
+
+        from .optimizer import optimize_discounts
+    except ImportError as exc:
+        sys.stderr.write(f"Skipping optimizer benchmarks: {exc}\n")
+        return
+
+    rng = np.random.default_rng(3)
+    cost = rng.uniform(20.0, 90.0, max_rows)
+    net1 = rng.uniform(100.0, 150.0, max_rows)
+    elasticity = rng.uniform(0.5, 3.0, max_rows)
+    free = optimize_discounts(cost, net1, floor=25.0, elasticity=elasticity)
+    for name, cap in (("free", None), ("capped", free.total_leakage / 2)):
+        last = {}
+
+        def run(cap=cap) -> None:
+            last["plan"] = optimize_discounts(cost, net1, floor=25.0, elasticity=elasticity, leakage_cap=cap)
+
+        seconds, _ = measure(run, min_time, repeats=3)
+        plan = last["plan"]
+        _record(
+            results,
+            f"optimizer.{name}.rows_{max_rows}",
+            seconds,
+            rows=max_rows,
+            iterations=plan.iterations,
+            relative_gap=plan.summary()["relative_gap"],
+        )
+
+
+def bench_arithmetic(results: Dict[str, dict], max_rows: int, min_time: float) -> None:
+    # Same quotes through the float, integer-cents and Decimal backends.
+    user = 0b100011
+    quote = QuoteInput(80.0, 120.0, None, None, None, 30.0, user=user)
+    cents_quote = QuoteInput(8000, 12000, None, None, None, 3000, user=user)
+    for name, run in (
+        ("float", lambda: solve(quote)),
+        ("cents", lambda: solve_cents(cents_quote)),
+        ("decimal", lambda: solve_decimal(cents_quote)),
+    ):
+        seconds, _ = measure(run, min_time)
+        _record(results, f"arithmetic.single.{name}", seconds)
+
+    try:
+        import numpy as np
+
+        from .batch import MISSING_CENTS, calculate_batch, calculate_batch_cents
+        from .parallel import sample_columns
+    except ImportError as exc:
+        sys.stderr.write(f"Skipping arithmetic batch benchmarks: {exc}\n")
+        return
+
+    size = min(100_000, max_rows)
+    columns, user_bits = sample_columns(size)
+    cents_columns = [
+        np.where(np.isnan(column), MISSING_CENTS, np.round(column * 100.0)).astype(np.int64) for column in columns
+    ]
+    quotes = [
+        QuoteInput(*(None if value == MISSING_CENTS else value for value in row), user=int(bits))
+        for row, bits in zip(zip(*(column[:1_000].tolist() for column in cents_columns)), user_bits[:1_000].tolist())
+    ]
+    for name, run, rows in (
+        ("float", lambda: calculate_batch(*columns, user=user_bits), size),
+        ("cents", lambda: calculate_batch_cents(*cents_columns, user=user_bits), size),
+        ("decimal", lambda: [solve_decimal(quote) for quote in quotes], len(quotes)),
+    ):
+        seconds, _ = measure(run, min_time, repeats=3)
+        _record(results, f"arithmetic.batch.{name}", seconds, rows=rows)
+
+
+class _FakeTclError(Exception):
+    pass
+
+
+class _FakeTk:
+    # Just enough of tkinter for MarginCalculatorApp to build and refresh without a display.
+    # Widget configure() and variable set() calls are counted as the Tk work of a refresh.
+    TclError = _FakeTclError
+
+    def __init__(self) -> None:
+        self.calls = 0
+        fake = self
+
+        class Widget:
+            def __init__(self, master=None, **options) -> None:
+                self.options = dict(options)
+                self.mapped = False
+
+            def configure(self, **options) -> None:
+                fake.calls += 1
+                self.options.update(options)
+
+            config = configure
+
+            def cget(self, key: str):
+                return self.options.get(key, "")
+
+            def pack(self, **_options) -> None:
+                self.mapped = True
+
+            grid = place = pack
+
+            def pack_forget(self) -> None:
+                self.mapped = False
+
+            grid_forget = place_forget = pack_forget
+
+            def winfo_ismapped(self) -> bool:
+                return self.mapped
+
+            def after(self, _delay, callback=None, *args) -> str:
+                return "after#0"
+
+            def __getattr__(self, _name: str):
+                return lambda *args, **kwargs: None
+
+        class Variable:
+            def __init__(self, master=None, value="") -> None:
+                self.value = value
+
+            def get(self):
+                return self.value
+
+            def set(self, value) -> None:
+                fake.calls += 1
+                self.value = value
+
+            def trace_add(self, _mode, _callback) -> str:
+                return "trace#0"
+
+        def photo_image(*_args, **_kwargs):
+            raise _FakeTclError("no images without a display")
+
+        self.Tk = self.Toplevel = self.Frame = self.Label = self.Entry = self.Button = Widget
+        self.Canvas = self.Scrollbar = self.Checkbutton = self.Listbox = Widget
+        self.StringVar = self.BooleanVar = self.IntVar = self.DoubleVar = Variable
+        self.PhotoImage = photo_image
+
+    def reset(self) -> None:
+        self.calls = 0
+
+
+@contextmanager
+def fake_tk() -> Iterator[_FakeTk]:
+    from . import app, assets, quote_table, scenario_table, ui_components
+
+    modules = [app, assets, quote_table, scenario_table, ui_components]
+    if app.HAS_NUMPY:
+        from . import sensitivity_panel
+
+        modules.append(sensitivity_panel)
+
+    fake = _FakeTk()
+    originals = [module.tk for module in modules]
+    for module in modules:
+        module.tk = fake
+    try:
+        yield fake
+    finally:
+        for module, original in zip(modules, originals):
+            module.tk = original
+
+
+def bench_gui(results: Dict[str, dict], min_time: float) -> None:
+    from . import app
+
+    def refresh_cycle(gui) -> Callable[[], None]:
+        inputs = ({"cost": "80", "net1": "120", "discount": "15"}, {"net1": "120", "net2": "100", "cost": "80"})
+        state = {"index": 0}
+
+        def run() -> None:
+            gui.on_reset()
+            filled = inputs[state["index"] % 2]
+            state["index"] += 1
+            for name, value in filled.items():
+                gui.variables[name].set(value)
+                gui._mark_user(name)
+            gui.on_calculate()
+
+        return run
+
+    try:
+        root = app.tk.Tk()
+        root.withdraw()
+        gui = app.MarginCalculatorApp(root, record_history=False)
+        backend = "tk"
+    except app.tk.TclError:
+        root = None
+        backend = "mock"
+
+    if root is not None:
+        try:
+            seconds, _ = measure(refresh_cycle(gui), min_time)
+            _record(results, "gui.refresh_cycle", seconds, backend=backend)
+        finally:
+            root.destroy()
+        return
+
+    with fake_tk() as fake:
+        gui = app.MarginCalculatorApp(fake.Tk(), record_history=False)
+        run = refresh_cycle(gui)
+        fake.reset()
+        run()
+        calls = fake.calls
+        seconds, _ = measure(run, min_time)
+        _record(results, "gui.refresh_cycle", seconds, backend=backend, tk_calls=calls)
+
+
+def bench_live(results: Dict[str, dict], min_time: float) -> None:
+    from . import app
+
+    def keystroke(gui) -> Callable[[], None]:
+        for name, value in {"cost": "80", "net1": "120", "discount": "15"}.items():
+            gui.variables[name].set(value)
+            gui._mark_user(name)
+        gui._run_live()
+        state = {"index": 0}
+
+        def run() -> None:
+            state["index"] += 1
+            gui.variables["discount"].set(str(10 + state["index"] % 20))
+            gui._mark_user("discount")
+            gui._run_live()
+
+        return run
+
+    try:
+        root = app.tk.Tk()
+        root.withdraw()
+    except app.tk.TclError:
+        root = None
+
+    if root is not None:
+        try:
+            seconds, _ = measure(keystroke(app.MarginCalculatorApp(root, record_history=False)), min_time)
+            _record(results, "gui.live_keystroke", seconds, backend="tk")
+        finally:
+            root.destroy()
+        return
+
+    with fake_tk() as fake:
+        run = keystroke(app.MarginCalculatorApp(fake.Tk(), record_history=False))
+        fake.reset()
+        run()
+        calls = fake.calls
+        seconds, _ = measure(run, min_time)
+        _record(results, "gui.live_keystroke", seconds, backend="mock", tk_calls=calls)
+
+
+def bench_quote_table(results: Dict[str, dict], min_time: float, lines: int = 10_000) -> None:
+    from . import app
+    from .quote_lines import QuoteLines
+    from .quote_table import QuoteTable
+
+    model = QuoteLines()
+    for index in range(lines):
+        model.append(quantity=1 + index % 5, cost=50.0 + index % 97, net1=90.0 + index % 113, discount=float(index % 30))
+
+    def run(table: QuoteTable) -> None:
+        state = {"step": 1, "edit": 0}
+
+        def scroll() -> None:
+            if not 0 <= table.first + state["step"] <= lines - table.visible_rows:
+                state["step"] = -state["step"]
+            table.scroll(state["step"])
+
+        def edit() -> None:
+            state["edit"] += 1
+            row = table.rows[state["edit"] % table.visible_rows]
+            row.variables["discount"].set(str(state["edit"] % 40))
+            table._on_edit(state["edit"] % table.visible_rows, "discount")
+
+        seconds, _ = measure(scroll, min_time)
+        _record(results, f"gui.quote_table_scroll_{lines}", seconds, backend=backend)
+        seconds, _ = measure(edit, min_time)
+        _record(results, f"gui.quote_table_edit_{lines}", seconds, backend=backend)
+
+    try:
+        root = app.tk.Tk()
+        root.withdraw()
+        backend = "tk"
+    except app.tk.TclError:
+        root = None
+        backend = "mock"
+
+    if root is not None:
+        try:
+            run(QuoteTable(root, model))
+        finally:
+            root.destroy()
+        return
+
+    with fake_tk() as fake:
+        run(QuoteTable(fake.Tk(), model))
+
+
+def bench_scenarios(results: Dict[str, dict], min_time: float, scenarios: int = 4) -> None:
+    # Tk-thread cost only: a keystroke with the scenario window open (the solves go to
+    # the worker), and one poll handing all finished scenario results to the table.
+    from . import app
+    from .scenarios import Scenario
+
+    def run(gui, backend: str) -> None:
+        gui.on_open_scenarios()
+        for index in range(scenarios):
+            gui.scenario_table.add(Scenario(f"Scenario {index + 1}", {"discount": str(5 * index)}))
+        for name, value in {"cost": "80", "net1": "120"}.items():
+            gui.variables[name].set(value)
+            gui._mark_user(name)
+        state = {"index": 0}
+
+        def keystroke() -> None:
+            state["index"] += 1
+            gui.variables["cost"].set(str(70 + state["index"] % 20))
+            gui._mark_user("cost")
+
+        def poll() -> None:
+            keystroke()
+            while any(not future.done() for _index, future in gui.scenario_runner._pending):
+                time.sleep(0.0005)
+            started = time.perf_counter()
+            gui._poll_scenarios()
+            timings.append(time.perf_counter() - started)
+
+        timings: List[float] = []
+        seconds, _ = measure(keystroke, min_time)
+        _record(results, "gui.scenarios_keystroke", seconds, backend=backend, scenarios=scenarios + 1)
+        measure(poll, min_time)
+        _record(results, "gui.scenarios_poll", min(timings), backend=backend, worst_seconds=max(timings))
+        gui.on_close()
+
+    try:
+        root = app.tk.Tk()
+        root.withdraw()
+    except app.tk.TclError:
+        root = None
+
+    if root is not None:
+        run(app.MarginCalculatorApp(root, record_history=False), "tk")
+        return
+
+    with fake_tk() as fake:
+        run(app.MarginCalculatorApp(fake.Tk(), record_history=False), "mock")
+
+
+def bench_sensitivity(results: Dict[str, dict], min_time: float) -> None:
+    try:
+        from .sensitivity import render_heatmap
+    except ImportError as exc:
+        sys.stderr.write(f"Skipping sensitivity benchmarks: {exc}\n")
+        return
+
+    # A new base quote every call, so the image cache never hits.
+    state = {"cost": 80.0}
+
+    def redraw() -> None:
+        state["cost"] += 0.01
+        render_heatmap.__wrapped__(state["cost"], 120.0, (0.0, 40.0), (0.0, 100.0), 25.0, 200, 2)
+
+    seconds, _ = measure(redraw, min_time)
+    _record(results, "gui.sensitivity_redraw_200x200", seconds)
+
+
+def bench_startup(results: Dict[str, dict]) -> None:
+    from .startup import measure_startup
+
+    report = measure_startup(runs=3)
+    for phase, seconds in report["median_seconds"].items():
+        if seconds is not None:
+            _record(results, f"startup.{phase}", seconds, backend=report["backend"])
+
+
+def run_benchmarks(max_rows: int = DEFAULT_MAX_ROWS, min_time: float = 0.2, groups: Sequence[str] = ()) -> dict:
+    results: Dict[str, dict] = {}
+    if not groups or "patterns" in groups:
+        bench_patterns(results, min_time)
+    if not groups or "batch" in groups:
+        bench_batch(results, max_rows, min_time)
+        bench_thresholds(results, max_rows, min_time)
+        bench_bom(results, max_rows, min_time)
+        bench_schedules(results, max_rows, min_time)
+        bench_analytics(results, max_rows, min_time)
+        bench_optimizer(results, max_rows, min_time)
+    if not groups or "arithmetic" in groups:
+        bench_arithmetic(results, max_rows, min_time)
+    if not groups or "gui" in groups:
+        bench_gui(results, min_time)
+        bench_live(results, min_time)
+        bench_quote_table(results, min_time)
+        bench_scenarios(results, min_time)
+        bench_sensitivity(results, min_time)
+    if not groups or "startup" in groups:
+        bench_startup(results)
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float = DEFAULT_THRESHOLD) -> Tuple[List[str], List[str]]:
+    lines = []
+    regressions = []
+    base_results = baseline.get("results", {})
+    for name, entry in sorted(current.get("results", {}).items()):
+        base = base_results.get(name)
+        if base is None:
+            lines.append(f"{name:<48} {'new':>10}")
+            continue
+        before = base["seconds_per_op"]
+        after = entry["seconds_per_op"]
+        change = (after - before) / before if before else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "REGRESSION"
+            regressions.append(name)
+        elif change < -threshold:
+            flag = "faster"
+        lines.append(f"{name:<48} {before * 1e6:>12.2f}us {after * 1e6:>12.2f}us {change:>+8.1%} {flag}")
+    for name in sorted(set(base_results) - set(current.get("results", {}))):
+        lines.append(f"{name:<48} {'missing':>10}")
+    return lines, regressions
+
+
+def _load(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the margin calculation engine.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run the benchmarks and write JSON results.")
+    run_parser.add_argument("--output", "-o", default="-", help="JSON output file (default: stdout).")
+    run_parser.add_argument("--max-rows", type=int, default=DEFAULT_MAX_ROWS, help="Largest batch size to run.")
+    run_parser.add_argument("--min-time", type=float, default=0.2, help="Target seconds per measurement.")
+    run_parser.add_argument(
+        "--group",
+        action="append",
+        default=[],
+        choices=("patterns", "batch", "arithmetic", "gui", "startup"),
+        help="Only run these groups (repeatable).",
+    )
+    run_parser.add_argument("--compare", metavar="BASELINE", help="Compare against a stored baseline after running.")
+    run_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Allowed slowdown (default: 0.10).")
+
+    compare_parser = commands.add_parser("compare", help="Flag regressions between two result files.")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Allowed slowdown (default: 0.10).")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        report = run_benchmarks(args.max_rows, args.min_time, args.group)
+        text = json.dumps(report, indent=2)
+        if args.output == "-":
+            sys.stdout.write(text + "\n")
+        else:
+            with open(args.output, "w", encoding="utf-8") as handle:
+                handle.write(text + "\n")
+        if not args.compare:
+            return 0
+        baseline, current = _load(args.compare), report
+    else:
+        baseline, current = _load(args.baseline), _load(args.current)
+
+    lines, regressions = compare(baseline, current, args.threshold)
+    sys.stderr.write("\n".join(lines) + "\n")
+    if regressions:
+        sys.stderr.write(f"{len(regressions)} regression(s) above {args.threshold:.0%}\n")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
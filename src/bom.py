@@ -0,0 +1,248 @@
+import csv
+import math
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from .batch import BatchResult, calculate_batch
+from .calculations import FIELD_BITS, INPUT_FIELDS, CalculationResult, calculate_all, fmt_money, parse_float
+
+_RESULT_FIELDS = ("cost", "net1", "added_value", "discount", "net2", "target_margin", "m_no", "m_with", "status", "calc")
+
+
+class BomGraph:
+    # Items are component or assembly ids. An item's rolled-up cost is its own cost
+    # (labour, or the purchase price of a bought part) plus quantity x rolled-up cost
+    # of each component. A part without components or an own cost has no known cost,
+    # and neither has anything built from it. Rolled-up costs are memoized; a change
+    # drops the memo of the item and its ancestors only.
+    def __init__(self) -> None:
+        self.own_cost: Dict[str, Optional[float]] = {}
+        self.children: Dict[str, Dict[str, float]] = {}
+        self.parents: Dict[str, Dict[str, float]] = {}
+        self._rolled: Dict[str, Optional[float]] = {}
+
+    def __len__(self) -> int:
+        return len(self.own_cost)
+
+    def __contains__(self, item: str) -> bool:
+        return item in self.own_cost
+
+    def add_item(self, item: str, cost: Optional[float] = None) -> None:
+        if item not in self.own_cost:
+            self.own_cost[item] = cost
+            self.children[item] = {}
+            self.parents[item] = {}
+        elif cost is not None:
+            self.set_cost(item, cost)
+
+    def _check_item(self, item: str) -> None:
+        if item not in self.own_cost:
+            raise ValueError(f"Unknown BOM item: {item}")
+
+    def ancestors(self, item: str) -> Set[str]:
+        self._check_item(item)
+        found: Set[str] = set()
+        pending = [item]
+        while pending:
+            for parent in self.parents[pending.pop()]:
+                if parent not in found:
+                    found.add(parent)
+                    pending.append(parent)
+        return found
+
+    def set_quantity(self, parent: str, component: str, quantity: float) -> List[str]:
+        # Adds, changes or (with quantity 0) removes a BOM line; returns the items whose
+        # rolled-up cost changed.
+        if quantity < 0:
+            raise ValueError(f"Quantity of {component} in {parent} cannot be negative.")
+        self.add_item(parent)
+        self.add_item(component)
+        if quantity and component not in self.children[parent]:
+            if parent == component or parent in self._descendants(component):
+                raise ValueError(f"Adding {component} to {parent} would make the BOM circular.")
+        if quantity:
+            self.children[parent][component] = quantity
+            self.parents[component][parent] = quantity
+        else:
+            self.children[parent].pop(component, None)
+            self.parents[component].pop(parent, None)
+        return self._refresh(parent)
+
+    def _descendants(self, item: str) -> Set[str]:
+        found: Set[str] = set()
+        pending = [item]
+        while pending:
+            for child in self.children[pending.pop()]:
+                if child not in found:
+                    found.add(child)
+                    pending.append(child)
+        return found
+
+    def set_cost(self, item: str, cost: Optional[float]) -> List[str]:
+        # Returns the items (this one and its ancestors) whose rolled-up cost changed.
+        self._check_item(item)
+        self.own_cost[item] = cost
+        return self._refresh(item)
+
+    def _refresh(self, item: str) -> List[str]:
+        stale = self.ancestors(item)
+        stale.add(item)
+        previous = {name: self._rolled.pop(name, None) for name in stale}
+        return [name for name in stale if self.cost(name) != previous[name]]
+
+    def _roll(self, item: str) -> Optional[float]:
+        own = self.own_cost[item]
+        children = self.children[item]
+        if not children:
+            return own
+        total = own or 0.0
+        rolled = self._rolled
+        for child, quantity in children.items():
+            value = rolled[child]
+            if value is None:
+                return None
+            total += quantity * value
+        return total
+
+    def cost(self, item: str) -> Optional[float]:
+        # Iterative depth-first evaluation, so deep BOMs do not hit the recursion limit.
+        rolled = self._rolled
+        if item in rolled:
+            return rolled[item]
+        self._check_item(item)
+        path: Set[str] = set()
+        stack: List[Tuple[str, bool]] = [(item, False)]
+        while stack:
+            name, expanded = stack.pop()
+            if expanded:
+                path.discard(name)
+                rolled[name] = self._roll(name)
+                continue
+            if name in rolled:
+                continue
+            if name in path:
+                raise ValueError(f"The BOM is circular at {name}.")
+            path.add(name)
+            stack.append((name, True))
+            stack.extend((child, False) for child in self.children[name] if child not in rolled)
+        return rolled[item]
+
+    def costs(self, items: Sequence[str]) -> np.ndarray:
+        # Rolled-up costs as a float column, NaN where unknown, ready for calculate_batch.
+        return np.array([math.nan if (value := self.cost(item)) is None else value for item in items], dtype=np.float64)
+
+    @classmethod
+    def from_rows(
+        cls,
+        lines: Iterable[Tuple[str, str, float]],
+        costs: Iterable[Tuple[str, Optional[float]]] = (),
+    ) -> "BomGraph":
+        # `lines` are (parent, component, quantity); `costs` are (item, own cost).
+        bom = cls()
+        for item, cost in costs:
+            bom.add_item(item, cost)
+        for parent, component, quantity in lines:
+            bom.add_item(parent)
+            bom.add_item(component)
+            if quantity < 0:
+                raise ValueError(f"Quantity of {component} in {parent} cannot be negative.")
+            if quantity:
+                bom.children[parent][component] = bom.children[parent].get(component, 0.0) + quantity
+                bom.parents[component][parent] = bom.children[parent][component]
+        # One pass over everything also rejects circular structures up front.
+        for item in bom.own_cost:
+            bom.cost(item)
+        return bom
+
+
+def _read_csv(path, columns: Sequence[str], delimiter: str) -> Iterable[Tuple[int, List[str]]]:
+    with open(path, "r", encoding="utf-8-sig", newline="") as handle:
+        reader = csv.reader(handle, delimiter=delimiter)
+        header = [name.strip().lower() for name in next(reader, [])]
+        missing = [name for name in columns if name not in header]
+        if missing:
+            raise ValueError(f"{path} is missing columns: {', '.join(missing)}.")
+        indexes = [header.index(name) for name in columns]
+        for line, row in enumerate(reader, start=2):
+            if any(cell.strip() for cell in row):
+                yield line, [row[index].strip() if index < len(row) else "" for index in indexes]
+
+
+def load_bom(structure_path, costs_path=None, delimiter: str = ",") -> BomGraph:
+    # structure: parent, component, quantity (repeated lines add up); costs: item, cost.
+    lines = []
+    for line, (parent, component, quantity) in _read_csv(structure_path, ("parent", "component", "quantity"), delimiter):
+        try:
+            value = parse_float(quantity)
+        except ValueError as exc:
+            raise ValueError(f"{structure_path}, line {line}: {exc}") from None
+        lines.append((parent, component, 1.0 if value is None else value))
+    costs = []
+    if costs_path is not None:
+        for line, (item, cost) in _read_csv(costs_path, ("item", "cost"), delimiter):
+            try:
+                costs.append((item, parse_float(cost)))
+            except ValueError as exc:
+                raise ValueError(f"{costs_path}, line {line}: {exc}") from None
+    return BomGraph.from_rows(lines, costs)
+
+
+def calculate_item(bom: BomGraph, item: str, values: Dict[str, str], sources: Dict[str, str], **options) -> CalculationResult:
+    # calculate_all with the item's rolled-up cost entered as the cost field.
+    values = dict(values)
+    sources = dict(sources)
+    cost = bom.cost(item)
+    values["cost"] = "" if cost is None else fmt_money(cost)
+    sources["cost"] = "" if cost is None else "user"
+    return calculate_all(values, sources, **options)
+
+
+class BomPriceList:
+    # Priced assemblies whose cost column is the BOM roll-up. After a component price
+    # change only the assemblies built from it are solved again.
+    def __init__(
+        self,
+        bom: BomGraph,
+        items: Sequence[str],
+        net1=None,
+        added_value=None,
+        discount=None,
+        net2=None,
+        target_margin=None,
+        user=None,
+    ) -> None:
+        self.bom = bom
+        self.items = list(items)
+        self.rows = {item: row for row, item in enumerate(self.items)}
+        size = len(self.items)
+        self.columns = [bom.costs(self.items)]
+        for name, values in zip(INPUT_FIELDS[1:], (net1, added_value, discount, net2, target_margin)):
+            column = np.full(size, np.nan) if values is None else np.array(values, dtype=np.float64)
+            if column.shape != (size,):
+                raise ValueError(f"Column '{name}' must have {size} rows.")
+            self.columns.append(column)
+        self.user = np.zeros(size, dtype=np.uint8) if user is None else np.array(user, dtype=np.uint8)
+        self.user |= FIELD_BITS["cost"]
+        self.result: BatchResult = calculate_batch(*self.columns, user=self.user)
+
+    def _resolve(self, rows: np.ndarray) -> None:
+        self.columns[0][rows] = self.bom.costs([self.items[row] for row in rows])
+        part = calculate_batch(*(column[rows] for column in self.columns), user=self.user[rows])
+        for name in _RESULT_FIELDS:
+            getattr(self.result, name)[rows] = getattr(part, name)
+
+    def set_component_cost(self, item: str, cost: Optional[float]) -> np.ndarray:
+        # Returns the rows that were solved again.
+        changed = self.bom.set_cost(item, cost)
+        rows = np.array(sorted(self.rows[name] for name in changed if name in self.rows), dtype=np.intp)
+        if len(rows):
+            self._resolve(rows)
+        return rows
+
+    def set_quantity(self, parent: str, component: str, quantity: float) -> np.ndarray:
+        changed = self.bom.set_quantity(parent, component, quantity)
+        rows = np.array(sorted(self.rows[name] for name in changed if name in self.rows), dtype=np.intp)
+        if len(rows):
+            self._resolve(rows)
+        return rows
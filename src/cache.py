@@ -0,0 +1,99 @@
+import struct
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Hashable, Optional
+
+from .calculations import SOLVER_PLAN, QuoteInput, QuoteResult, solve
+
+_KEY_FORMAT = struct.Struct("<6dB")
+_NAN = float("nan")
+
+
+@dataclass
+class CacheStats:
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+    maxsize: int
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def quote_key(quote: QuoteInput) -> Optional[bytes]:
+    # Same bytes as one batch key record, so single quotes and batch rows share entries.
+    # Missing fields pack as NaN; quotes that actually contain NaN are not cached.
+    values = (quote.cost, quote.net1, quote.added_value, quote.discount, quote.net2, quote.target_margin)
+    packed = []
+    for value in values:
+        if value is None:
+            packed.append(_NAN)
+        elif value != value:
+            return None
+        else:
+            packed.append(value)
+    return _KEY_FORMAT.pack(*packed, quote.user)
+
+
+class CalculationCache:
+    def __init__(self, maxsize: int = 4096, enabled: bool = True) -> None:
+        if maxsize < 0:
+            raise ValueError("Cache size cannot be negative.")
+        self.maxsize = maxsize
+        self.enabled = enabled
+        self._entries: "OrderedDict[Hashable, QuoteResult]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def active(self) -> bool:
+        return self.enabled and self.maxsize > 0
+
+    def get(self, key: Hashable) -> Optional[QuoteResult]:
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key: Hashable, result: QuoteResult) -> None:
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(self.hits, self.misses, self.evictions, len(self._entries), self.maxsize)
+
+    def solve(self, quote: QuoteInput, solver: str = SOLVER_PLAN) -> QuoteResult:
+        # Cached results are shared between callers and must be treated as read-only.
+        if not self.active:
+            return solve(quote, solver)
+        key = quote_key(quote)
+        if key is None:
+            return solve(quote, solver)
+        result = self.get(key)
+        if result is None:
+            result = solve(quote, solver)
+            self.put(key, result)
+        return result
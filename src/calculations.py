@@ -1,5 +1,9 @@
+import time
 from dataclasses import dataclass
-from typing import Dict, Optional, Tuple
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from .cache import CalculationCache
 
 
 def parse_float(value: str) -> Optional[float]:
@@ -17,6 +21,41 @@ def fmt_pct(value: float) -> str:
     return f"{value:.2f}"
 
 
+STATUS_OK = 0
+STATUS_AV_NEGATIVE = 1
+STATUS_DISCOUNT_RANGE = 2
+STATUS_MARGIN_RANGE = 3
+STATUS_TOO_MANY_INPUTS = 4
+STATUS_MARGIN_100_NET2 = 5
+STATUS_ZERO_DENOMINATOR = 6
+STATUS_AV_NEGATIVE_SOLVED = 7
+STATUS_SOLVED_DISCOUNT_RANGE = 8
+STATUS_DISCOUNT_100_NET1 = 9
+STATUS_DISCOUNT_100_AV = 10
+STATUS_INVALID_NUMBER = 11
+
+STATUS_MESSAGES = (
+    "",
+    "Added Value cannot be negative.",
+    "Discount must be between 0% and 100%.",
+    "Target margin must be between 0% and 100%.",
+    "Too many inputs. Clear one of the fields to solve.",
+    "Target margin cannot be 100% when solving Net2.",
+    "Net1 + Added Value cannot be 0 when solving discount.",
+    "Added Value cannot be negative with these inputs.",
+    "Solved discount is outside 0%..100%. Check inputs.",
+    "Discount cannot be 100% when solving Net1 from Net2.",
+    "Discount cannot be 100% when solving Added Value.",
+    "Invalid number.",
+)
+
+
+class CalculationError(ValueError):
+    def __init__(self, code: int) -> None:
+        super().__init__(STATUS_MESSAGES[code])
+        self.code = code
+
+
 @dataclass
 class CalculationResult:
     values: Dict[str, str]
@@ -36,193 +75,728 @@ FIELD_NAMES = (
     "status",
 )
 
+INPUT_FIELDS = FIELD_NAMES[:6]
+FIELD_BITS = {name: 1 << index for index, name in enumerate(INPUT_FIELDS)}
+
+
+# Which fields each solved field is computed from, following the solve steps.
+FIELD_DEPENDENCIES = {
+    "cost": ("net2", "target_margin"),
+    "net1": ("net2", "added_value", "discount"),
+    "added_value": ("net1", "net2", "discount"),
+    "discount": ("net1", "added_value", "net2"),
+    "net2": ("cost", "net1", "added_value", "discount", "target_margin"),
+    "m_no": ("cost", "net1"),
+    "m_with": ("cost", "net2"),
+}
+FIELD_DEPENDENTS = {
+    name: tuple(field for field, inputs in FIELD_DEPENDENCIES.items() if name in inputs) for name in INPUT_FIELDS
+}
+
+
+def affected_fields(changed, sources: Dict[str, str]) -> List[str]:
+    # Fields whose value can differ after `changed` inputs were edited. User fields keep
+    # their value, so the walk stops there; status can always change.
+    affected = set(changed)
+    pending = list(changed)
+    while pending:
+        for field in FIELD_DEPENDENTS.get(pending.pop(), ()):
+            if field not in affected and sources.get(field) != "user":
+                affected.add(field)
+                pending.append(field)
+    affected.add("status")
+    return [name for name in FIELD_NAMES if name in affected]
+
+
+def source_bits(sources: Dict[str, str]) -> int:
+    bits = 0
+    for name, bit in FIELD_BITS.items():
+        if sources.get(name) == "user":
+            bits |= bit
+    return bits
+
 
 def _set_calc_value(values: Dict[str, str], sources: Dict[str, str], name: str, value: str) -> None:
     values[name] = value
     sources[name] = "calc"
 
 
-def calculate_all(values: Dict[str, str], sources: Dict[str, str]) -> CalculationResult:
-    updated_values = dict(values)
-    updated_sources = dict(sources)
+SOLVER_PLAN = "plan"
+SOLVER_LOOP = "loop"
 
-    _set_calc_value(updated_values, updated_sources, "m_no", "")
-    _set_calc_value(updated_values, updated_sources, "m_with", "")
-    _set_calc_value(updated_values, updated_sources, "status", "")
+_NET2_USER_BIT = 1 << len(INPUT_FIELDS)
+_AV_USER_BIT = _NET2_USER_BIT << 1
 
-    try:
-        cost = parse_float(updated_values.get("cost", ""))
-        net1 = parse_float(updated_values.get("net1", ""))
-        added_value = parse_float(updated_values.get("added_value", ""))
-        discount_pct = parse_float(updated_values.get("discount", ""))
-        net2 = parse_float(updated_values.get("net2", ""))
-        target_margin_pct = parse_float(updated_values.get("target_margin", ""))
-
-        discount = None if discount_pct is None else (discount_pct / 100.0)
-        margin = None if target_margin_pct is None else (target_margin_pct / 100.0)
-
-        discount_assumed = False
-        discount_solved = False
-        av_assumed_zero = False
-
-        if added_value is not None and added_value < 0:
-            raise ValueError("Added Value cannot be negative.")
-
-        if discount is not None and (discount < 0 or discount > 1):
-            raise ValueError("Discount must be between 0% and 100%.")
-        if margin is not None and (margin < 0 or margin > 1):
-            raise ValueError("Target margin must be between 0% and 100%.")
-
-        if margin is not None and sources.get("net2") != "user":
-            net2 = None
-
-        if (
-            margin is not None
-            and cost is not None
-            and net2 is not None
-            and sources.get("net2") == "user"
-        ):
-            raise ValueError("Too many inputs. Clear one of the fields to solve.")
-
-        if added_value is None and discount is None:
+
+def _check_inputs(x: List[Optional[float]]) -> None:
+    added_value, discount, margin = x[2], x[3], x[5]
+    if added_value is not None and added_value < 0:
+        raise CalculationError(STATUS_AV_NEGATIVE)
+
+    if discount is not None and (discount < 0 or discount > 1):
+        raise CalculationError(STATUS_DISCOUNT_RANGE)
+    if margin is not None and (margin < 0 or margin > 1):
+        raise CalculationError(STATUS_MARGIN_RANGE)
+
+
+def _solve_loop(x: List[Optional[float]], user: int, trace: Optional["SolveTrace"] = None) -> None:
+    cost, net1, added_value, discount, net2, margin = x
+    net2_user = bool(user & FIELD_BITS["net2"])
+    av_user = bool(user & FIELD_BITS["added_value"])
+    rules = None if trace is None else trace.rules
+
+    av_assumed_zero = False
+
+    if margin is not None and not net2_user:
+        if rules is not None and net2 is not None:
+            rules.append("clear_net2")
+        net2 = None
+
+    if margin is not None and cost is not None and net2 is not None and net2_user:
+        if rules is not None:
+            rules.append("too_many_inputs")
+        raise CalculationError(STATUS_TOO_MANY_INPUTS)
+
+    if added_value is None and discount is None:
+        added_value = 0.0
+        av_assumed_zero = True
+        if rules is not None:
+            rules.append("assume_av_zero")
+        if net1 is None or net2 is None:
+            discount = 0.0
+            if rules is not None:
+                rules.append("assume_discount_zero")
+    elif added_value is None:
+        if not (net1 is not None and net2 is not None and discount is not None):
             added_value = 0.0
             av_assumed_zero = True
-            if net1 is None or net2 is None:
+            if rules is not None:
+                rules.append("assume_av_zero")
+    elif discount is None:
+        if margin is None or cost is None:
+            if not (net1 is not None and net2 is not None and added_value is not None):
                 discount = 0.0
-                discount_assumed = True
-        elif added_value is None:
-            if not (net1 is not None and net2 is not None and discount is not None):
-                added_value = 0.0
-                av_assumed_zero = True
-        elif discount is None:
-            if margin is None or cost is None:
-                if not (net1 is not None and net2 is not None and added_value is not None):
-                    discount = 0.0
-                    discount_assumed = True
+                if rules is not None:
+                    rules.append("assume_discount_zero")
 
-        for _ in range(30):
-            progress = False
+    for _ in range(30):
+        progress = False
+        if trace is not None:
+            trace.iterations += 1
 
-            if added_value is None and net1 is not None and net2 is not None and discount is None:
-                added_value = 0.0
-                av_assumed_zero = True
+        if added_value is None and net1 is not None and net2 is not None and discount is None:
+            added_value = 0.0
+            av_assumed_zero = True
+            progress = True
+            if rules is not None:
+                rules.append("assume_av_zero")
+
+        if margin is not None:
+            if net2 is None and cost is not None:
+                if rules is not None:
+                    rules.append("net2_from_margin")
+                if (1.0 - margin) == 0:
+                    raise CalculationError(STATUS_MARGIN_100_NET2)
+                net2 = cost / (1.0 - margin)
                 progress = True
+            if cost is None and net2 is not None:
+                cost = net2 * (1.0 - margin)
+                progress = True
+                if rules is not None:
+                    rules.append("cost_from_margin")
 
-            if margin is not None:
-                if net2 is None and cost is not None:
-                    if (1.0 - margin) == 0:
-                        raise ValueError("Target margin cannot be 100% when solving Net2.")
-                    net2 = cost / (1.0 - margin)
-                    progress = True
-                if cost is None and net2 is not None:
-                    cost = net2 * (1.0 - margin)
-                    progress = True
+        if discount is None and (net2 is not None) and (net1 is not None) and (added_value is not None):
+            if rules is not None:
+                rules.append("solve_discount_or_av" if av_assumed_zero and not av_user else "solve_discount")
+            denom = (net1 + added_value)
+            if denom == 0:
+                raise CalculationError(STATUS_ZERO_DENOMINATOR)
 
-            if discount is None and (net2 is not None) and (net1 is not None) and (added_value is not None):
-                denom = (net1 + added_value)
-                if denom == 0:
-                    raise ValueError("Net1 + Added Value cannot be 0 when solving discount.")
+            discount_candidate = 1.0 - (net2 / denom)
 
-                discount_candidate = 1.0 - (net2 / denom)
+            if discount_candidate < 0 and av_assumed_zero and not av_user:
+                discount = 0.0
+                av_candidate = net2 - net1
+                if av_candidate < 0:
+                    raise CalculationError(STATUS_AV_NEGATIVE_SOLVED)
+                added_value = av_candidate
+                progress = True
+            else:
+                discount = discount_candidate
+                if discount < 0 or discount > 1:
+                    raise CalculationError(STATUS_SOLVED_DISCOUNT_RANGE)
+                progress = True
 
-                if discount_candidate < 0 and av_assumed_zero and updated_sources.get("added_value", "") != "user":
+        if net2 is None and (net1 is not None) and (added_value is not None) and (discount is not None):
+            net2 = (net1 + added_value) * (1.0 - discount)
+            progress = True
+            if rules is not None:
+                rules.append("net2_from_discount")
+
+        if net1 is None and (net2 is not None) and (added_value is not None) and (discount is not None):
+            if rules is not None:
+                rules.append("net1_from_net2")
+            if (1.0 - discount) == 0:
+                raise CalculationError(STATUS_DISCOUNT_100_NET1)
+            net1 = (net2 / (1.0 - discount)) - added_value
+            progress = True
+
+        if added_value is None and (net2 is not None) and (net1 is not None) and (discount is not None):
+            if rules is not None:
+                rules.append("av_from_net2")
+            if (1.0 - discount) == 0:
+                raise CalculationError(STATUS_DISCOUNT_100_AV)
+            av_candidate = (net2 / (1.0 - discount)) - net1
+            if av_candidate < 0:
+                raise CalculationError(STATUS_AV_NEGATIVE_SOLVED)
+            added_value = av_candidate
+            progress = True
+
+        if discount is None:
+            if margin is None or cost is None:
+                if (
+                    (net2 is None and net1 is not None and added_value is not None)
+                    or (net1 is None and net2 is not None and added_value is not None)
+                    or (added_value is None and net2 is not None and net1 is not None)
+                ):
                     discount = 0.0
-                    discount_solved = True
-                    av_candidate = net2 - net1
-                    if av_candidate < 0:
-                        raise ValueError("Added Value cannot be negative with these inputs.")
-                    added_value = av_candidate
-                    progress = True
-                else:
-                    discount = discount_candidate
-                    if discount < 0 or discount > 1:
-                        raise ValueError("Solved discount is outside 0%..100%. Check inputs.")
-                    discount_solved = True
                     progress = True
+                    if rules is not None:
+                        rules.append("assume_discount_zero")
 
-            if net2 is None and (net1 is not None) and (added_value is not None) and (discount is not None):
-                net2 = (net1 + added_value) * (1.0 - discount)
-                progress = True
+        if not progress:
+            break
 
-            if net1 is None and (net2 is not None) and (added_value is not None) and (discount is not None):
-                if (1.0 - discount) == 0:
-                    raise ValueError("Discount cannot be 100% when solving Net1 from Net2.")
-                net1 = (net2 / (1.0 - discount)) - added_value
-                progress = True
+    x[:] = cost, net1, added_value, discount, net2, margin
 
-            if added_value is None and (net2 is not None) and (net1 is not None) and (discount is not None):
-                if (1.0 - discount) == 0:
-                    raise ValueError("Discount cannot be 100% when solving Added Value.")
-                av_candidate = (net2 / (1.0 - discount)) - net1
-                if av_candidate < 0:
-                    raise ValueError("Added Value cannot be negative with these inputs.")
-                added_value = av_candidate
-                progress = True
 
-            if discount is None and discount_pct is None:
-                if margin is None or cost is None:
-                    if (
-                        (net2 is None and net1 is not None and added_value is not None)
-                        or (net1 is None and net2 is not None and added_value is not None)
-                        or (added_value is None and net2 is not None and net1 is not None)
-                    ):
-                        discount = 0.0
-                        discount_assumed = True
-                        progress = True
-
-            if not progress:
-                break
-
-        if cost is not None:
-            if updated_sources.get("cost", "") == "user":
-                updated_values["cost"] = fmt_money(cost)
-            else:
-                _set_calc_value(updated_values, updated_sources, "cost", fmt_money(cost))
+def _clear_net2(x: List[Optional[float]]) -> None:
+    x[4] = None
 
-        if net1 is not None:
-            if updated_sources.get("net1", "") == "user":
-                updated_values["net1"] = fmt_money(net1)
-            else:
-                _set_calc_value(updated_values, updated_sources, "net1", fmt_money(net1))
 
-        if added_value is not None:
-            if added_value < 0:
-                raise ValueError("Added Value cannot be negative.")
-            if updated_sources.get("added_value", "") == "user":
-                updated_values["added_value"] = fmt_money(added_value)
-            else:
-                _set_calc_value(updated_values, updated_sources, "added_value", fmt_money(added_value))
+def _too_many_inputs(x: List[Optional[float]]) -> None:
+    raise CalculationError(STATUS_TOO_MANY_INPUTS)
 
-        if discount is not None and (discount_pct is not None or discount_assumed or discount_solved):
-            if updated_sources.get("discount", "") == "user":
-                updated_values["discount"] = fmt_pct(discount * 100.0)
-            else:
-                _set_calc_value(updated_values, updated_sources, "discount", fmt_pct(discount * 100.0))
 
-        if net2 is not None:
-            if updated_sources.get("net2", "") == "user":
-                updated_values["net2"] = fmt_money(net2)
-            else:
-                _set_calc_value(updated_values, updated_sources, "net2", fmt_money(net2))
+def _assume_av_zero(x: List[Optional[float]]) -> None:
+    x[2] = 0.0
 
-        if cost is not None and net1 is not None and net1 != 0:
-            margin_no_discount = ((net1 - cost) / net1) * 100.0
-            _set_calc_value(updated_values, updated_sources, "m_no", fmt_pct(margin_no_discount))
-        else:
-            _set_calc_value(updated_values, updated_sources, "m_no", "—")
 
-        if cost is not None and net2 is not None and net2 != 0:
-            margin_with_discount = ((net2 - cost) / net2) * 100.0
-            _set_calc_value(updated_values, updated_sources, "m_with", fmt_pct(margin_with_discount))
-        else:
-            _set_calc_value(updated_values, updated_sources, "m_with", "—")
+def _assume_discount_zero(x: List[Optional[float]]) -> None:
+    x[3] = 0.0
 
-        _set_calc_value(updated_values, updated_sources, "status", "")
 
-    except ValueError as exc:
-        _set_calc_value(updated_values, updated_sources, "status", str(exc))
+def _net2_from_margin(x: List[Optional[float]]) -> None:
+    if (1.0 - x[5]) == 0:
+        raise CalculationError(STATUS_MARGIN_100_NET2)
+    x[4] = x[0] / (1.0 - x[5])
+
+
+def _cost_from_margin(x: List[Optional[float]]) -> None:
+    x[0] = x[4] * (1.0 - x[5])
+
+
+def _solve_discount(x: List[Optional[float]]) -> None:
+    denom = x[1] + x[2]
+    if denom == 0:
+        raise CalculationError(STATUS_ZERO_DENOMINATOR)
+    discount = 1.0 - (x[4] / denom)
+    if discount < 0 or discount > 1:
+        raise CalculationError(STATUS_SOLVED_DISCOUNT_RANGE)
+    x[3] = discount
+
+
+def _solve_discount_or_av(x: List[Optional[float]]) -> None:
+    denom = x[1] + x[2]
+    if denom == 0:
+        raise CalculationError(STATUS_ZERO_DENOMINATOR)
+    discount = 1.0 - (x[4] / denom)
+    if discount < 0:
+        av_candidate = x[4] - x[1]
+        if av_candidate < 0:
+            raise CalculationError(STATUS_AV_NEGATIVE_SOLVED)
+        x[2] = av_candidate
+        x[3] = 0.0
+    elif discount > 1:
+        raise CalculationError(STATUS_SOLVED_DISCOUNT_RANGE)
+    else:
+        x[3] = discount
+
+
+def _net2_from_discount(x: List[Optional[float]]) -> None:
+    x[4] = (x[1] + x[2]) * (1.0 - x[3])
+
+
+def _net1_from_net2(x: List[Optional[float]]) -> None:
+    if (1.0 - x[3]) == 0:
+        raise CalculationError(STATUS_DISCOUNT_100_NET1)
+    x[1] = (x[4] / (1.0 - x[3])) - x[2]
+
+
+def _av_from_net2(x: List[Optional[float]]) -> None:
+    if (1.0 - x[3]) == 0:
+        raise CalculationError(STATUS_DISCOUNT_100_AV)
+    av_candidate = (x[4] / (1.0 - x[3])) - x[1]
+    if av_candidate < 0:
+        raise CalculationError(STATUS_AV_NEGATIVE_SOLVED)
+    x[2] = av_candidate
+
+
+SolveStep = Callable[[List[Optional[float]]], None]
+
 
-    return CalculationResult(updated_values, updated_sources, updated_values.get("status", ""))
+def _compile_plan(pattern: int) -> Tuple[Tuple[SolveStep, ...], int]:
+    # Replays the rule order of _solve_loop on presence flags only; every branch in
+    # the loop depends on which inputs exist, never on their values.
+    cost, net1, added_value, discount, net2, margin = (bool(pattern & (1 << i)) for i in range(6))
+    net2_user = bool(pattern & _NET2_USER_BIT)
+    av_user = bool(pattern & _AV_USER_BIT)
+    steps: List[SolveStep] = []
+    av_assumed_zero = False
+
+    if margin and not net2_user and net2:
+        net2 = False
+        steps.append(_clear_net2)
+
+    if margin and cost and net2 and net2_user:
+        return (_too_many_inputs,), 0
+
+    if not added_value and not discount:
+        added_value = av_assumed_zero = True
+        steps.append(_assume_av_zero)
+        if not net1 or not net2:
+            discount = True
+            steps.append(_assume_discount_zero)
+    elif not added_value:
+        if not (net1 and net2 and discount):
+            added_value = av_assumed_zero = True
+            steps.append(_assume_av_zero)
+    elif not discount:
+        if not margin or not cost:
+            if not (net1 and net2 and added_value):
+                discount = True
+                steps.append(_assume_discount_zero)
+
+    passes = 0
+    for passes in range(1, 31):
+        progress = False
+
+        if not added_value and net1 and net2 and not discount:
+            added_value = av_assumed_zero = progress = True
+            steps.append(_assume_av_zero)
+
+        if margin:
+            if not net2 and cost:
+                net2 = progress = True
+                steps.append(_net2_from_margin)
+            if not cost and net2:
+                cost = progress = True
+                steps.append(_cost_from_margin)
+
+        if not discount and net2 and net1 and added_value:
+            discount = progress = True
+            steps.append(_solve_discount_or_av if av_assumed_zero and not av_user else _solve_discount)
+
+        if not net2 and net1 and added_value and discount:
+            net2 = progress = True
+            steps.append(_net2_from_discount)
+
+        if not net1 and net2 and added_value and discount:
+            net1 = progress = True
+            steps.append(_net1_from_net2)
+
+        if not added_value and net2 and net1 and discount:
+            added_value = progress = True
+            steps.append(_av_from_net2)
+
+        if not discount and (not margin or not cost):
+            if (not net2 and net1 and added_value) or (not net1 and net2 and added_value) or (
+                not added_value and net2 and net1
+            ):
+                discount = progress = True
+                steps.append(_assume_discount_zero)
+
+        if not progress:
+            break
+
+    return tuple(steps), passes
+
+
+SOLVE_PLANS, PLAN_PASSES = zip(*(_compile_plan(pattern) for pattern in range(1 << (len(INPUT_FIELDS) + 2))))
+STEP_NAMES = {step: step.__name__.lstrip("_") for plan in SOLVE_PLANS for step in plan}
+
+
+_USER_PATTERN_BITS = tuple(
+    (_NET2_USER_BIT if user & FIELD_BITS["net2"] else 0) | (_AV_USER_BIT if user & FIELD_BITS["added_value"] else 0)
+    for user in range(1 << len(INPUT_FIELDS))
+)
+
+
+def solve_pattern(x: List[Optional[float]], user: int) -> int:
+    cost, net1, added_value, discount, net2, margin = x
+    pattern = _USER_PATTERN_BITS[user]
+    if cost is not None:
+        pattern |= 1
+    if net1 is not None:
+        pattern |= 2
+    if added_value is not None:
+        pattern |= 4
+    if discount is not None:
+        pattern |= 8
+    if net2 is not None:
+        pattern |= 16
+    if margin is not None:
+        pattern |= 32
+    return pattern
+
+
+def _solve_plan(x: List[Optional[float]], user: int, trace: Optional["SolveTrace"] = None) -> None:
+    pattern = solve_pattern(x, user)
+    if trace is None:
+        for step in SOLVE_PLANS[pattern]:
+            step(x)
+        return
+
+    trace.iterations = PLAN_PASSES[pattern]
+    for step in SOLVE_PLANS[pattern]:
+        trace.rules.append(STEP_NAMES[step])
+        step(x)
+
+
+_SOLVERS = {SOLVER_PLAN: _solve_plan, SOLVER_LOOP: _solve_loop}
+
+
+class QuoteInput:
+    __slots__ = ("cost", "net1", "added_value", "discount", "net2", "target_margin", "user")
+
+    def __init__(
+        self,
+        cost: Optional[float] = None,
+        net1: Optional[float] = None,
+        added_value: Optional[float] = None,
+        discount: Optional[float] = None,
+        net2: Optional[float] = None,
+        target_margin: Optional[float] = None,
+        user: int = 0,
+    ) -> None:
+        self.cost = cost
+        self.net1 = net1
+        self.added_value = added_value
+        self.discount = discount
+        self.net2 = net2
+        self.target_margin = target_margin
+        self.user = user
+
+
+class QuoteResult:
+    __slots__ = (
+        "cost",
+        "net1",
+        "added_value",
+        "discount",
+        "net2",
+        "target_margin",
+        "m_no",
+        "m_with",
+        "status",
+        "calc",
+    )
+
+    def __init__(
+        self,
+        cost: Optional[float],
+        net1: Optional[float],
+        added_value: Optional[float],
+        discount: Optional[float],
+        net2: Optional[float],
+        target_margin: Optional[float],
+        m_no: Optional[float],
+        m_with: Optional[float],
+        status: int,
+        calc: int,
+    ) -> None:
+        self.cost = cost
+        self.net1 = net1
+        self.added_value = added_value
+        self.discount = discount
+        self.net2 = net2
+        self.target_margin = target_margin
+        self.m_no = m_no
+        self.m_with = m_with
+        self.status = status
+        self.calc = calc
+
+    @property
+    def message(self) -> str:
+        return STATUS_MESSAGES[self.status]
+
+
+class SolveTrace:
+    __slots__ = ("solver", "pattern", "iterations", "rules", "assumptions", "phases", "status")
+
+    def __init__(self, solver: str) -> None:
+        self.solver = solver
+        self.pattern = -1
+        self.iterations = 0
+        self.rules: List[str] = []
+        self.assumptions: List[str] = []
+        self.phases: Dict[str, float] = {}
+        self.status = STATUS_OK
+
+    @property
+    def elapsed(self) -> float:
+        return sum(self.phases.values())
+
+    def _finish(self, result: QuoteResult) -> None:
+        self.status = result.status
+        rules = self.rules
+        if "assume_av_zero" in rules:
+            self.assumptions.append("av_assumed_zero")
+        if "assume_discount_zero" in rules:
+            self.assumptions.append("discount_assumed")
+        if "solve_discount" in rules or "solve_discount_or_av" in rules:
+            self.assumptions.append("discount_solved")
+        if "solve_discount_or_av" in rules and result.status == STATUS_OK and result.added_value:
+            self.assumptions.append("av_back_solved")
+
+
+# Receives every SolveTrace (record) and batch summary (record_batch) while set.
+_tracer = None
+
+
+def set_tracer(tracer) -> object:
+    global _tracer
+    previous = _tracer
+    _tracer = tracer
+    return previous
+
+
+def get_tracer():
+    return _tracer
+
+
+# Receives the inputs and result of every calculate_all (record) and calculate_batch
+# (record_batch) solve while set; see journal.CalculationJournal.
+_journal = None
+
+
+def set_journal(journal) -> object:
+    global _journal
+    previous = _journal
+    _journal = journal
+    return previous
+
+
+def get_journal():
+    return _journal
+
+
+def detach_hooks() -> None:
+    # Process pool initializer: a forked worker inherits the parent's tracer and journal
+    # (and the journal's open file), so workers drop both and only the parent records.
+    set_tracer(None)
+    set_journal(None)
+
+
+def failed_quote(quote: QuoteInput, code: int) -> QuoteResult:
+    return QuoteResult(
+        quote.cost,
+        quote.net1,
+        quote.added_value,
+        quote.discount,
+        quote.net2,
+        quote.target_margin,
+        None,
+        None,
+        code,
+        0,
+    )
+
+
+def solve(quote: QuoteInput, solver: str = SOLVER_PLAN, trace: Optional[SolveTrace] = None) -> QuoteResult:
+    # Discount and target margin are percentages, like the string fields. Fields the
+    # solver leaves empty keep their input value; `calc` flags the ones it produced.
+    solve_inputs = _SOLVERS.get(solver)
+    if solve_inputs is None:
+        raise ValueError(f"Unknown solver: {solver!r}")
+    tracer = _tracer
+    if trace is None and tracer is None:
+        return _solve_quote(quote, solve_inputs, None)
+
+    recording = trace is None
+    if recording:
+        trace = SolveTrace(solver)
+    started = time.perf_counter()
+    result = _solve_quote(quote, solve_inputs, trace)
+    trace.phases["solve"] = time.perf_counter() - started
+    trace._finish(result)
+    if recording:
+        tracer.record(trace)
+    return result
+
+
+def _solve_quote(quote: QuoteInput, solve_inputs, trace: Optional[SolveTrace]) -> QuoteResult:
+    discount = quote.discount
+    margin = quote.target_margin
+    x = [
+        quote.cost,
+        quote.net1,
+        quote.added_value,
+        None if discount is None else discount / 100.0,
+        quote.net2,
+        None if margin is None else margin / 100.0,
+    ]
+    try:
+        if trace is None:
+            _check_inputs(x)
+            solve_inputs(x, quote.user)
+        else:
+            trace.pattern = solve_pattern(x, quote.user)
+            _check_inputs(x)
+            solve_inputs(x, quote.user, trace)
+    except CalculationError as exc:
+        return failed_quote(quote, exc.code)
+
+    cost, net1, added_value, discount, net2, _ = x
+    if added_value is not None and added_value < 0:
+        return failed_quote(quote, STATUS_AV_NEGATIVE)
+
+    calc = 0
+    if cost is not None:
+        calc |= 1
+    if net1 is not None:
+        calc |= 2
+    if added_value is not None:
+        calc |= 4
+    if discount is not None:
+        calc |= 8
+        discount = discount * 100.0
+    if net2 is not None:
+        calc |= 16
+
+    m_no = None
+    if cost is not None and net1 is not None and net1 != 0:
+        m_no = ((net1 - cost) / net1) * 100.0
+    m_with = None
+    if cost is not None and net2 is not None and net2 != 0:
+        m_with = ((net2 - cost) / net2) * 100.0
+
+    if net2 is None:
+        net2 = quote.net2
+
+    return QuoteResult(
+        cost,
+        net1,
+        added_value,
+        discount,
+        net2,
+        quote.target_margin,
+        m_no,
+        m_with,
+        STATUS_OK,
+        calc & ~quote.user,
+    )
+
+
+def calculate_all(
+    values: Dict[str, str],
+    sources: Dict[str, str],
+    solver: str = SOLVER_PLAN,
+    cache: Optional["CalculationCache"] = None,
+) -> CalculationResult:
+    tracer = _tracer
+    trace = None
+    if tracer is not None and cache is None:
+        trace = SolveTrace(solver)
+        started = time.perf_counter()
+
+    updated_values, updated_sources = _cleared_outputs(values, sources)
+
+    try:
+        quote = QuoteInput(*(parse_float(updated_values.get(name, "")) for name in INPUT_FIELDS))
+    except ValueError as exc:
+        if trace is not None:
+            trace.phases["parse"] = time.perf_counter() - started
+            trace.status = STATUS_INVALID_NUMBER
+            tracer.record(trace)
+        return _error_result(updated_values, updated_sources, str(exc))
+
+    quote.user = source_bits(sources)
+    if trace is not None:
+        trace.phases["parse"] = time.perf_counter() - started
+    result = solve(quote, solver, trace) if cache is None else cache.solve(quote, solver)
+    if _journal is not None:
+        _journal.record(quote, result)
+    if trace is not None:
+        started = time.perf_counter()
+    calculation = _format_result(updated_values, updated_sources, quote, result)
+    if trace is not None:
+        trace.phases["format"] = time.perf_counter() - started
+        tracer.record(trace)
+    return calculation
+
+
+def _cleared_outputs(values: Dict[str, str], sources: Dict[str, str]) -> Tuple[Dict[str, str], Dict[str, str]]:
+    updated_values = dict(values)
+    updated_sources = dict(sources)
+    _set_calc_value(updated_values, updated_sources, "m_no", "")
+    _set_calc_value(updated_values, updated_sources, "m_with", "")
+    _set_calc_value(updated_values, updated_sources, "status", "")
+    return updated_values, updated_sources
+
+
+def _error_result(updated_values: Dict[str, str], updated_sources: Dict[str, str], message: str) -> CalculationResult:
+    _set_calc_value(updated_values, updated_sources, "status", message)
+    return CalculationResult(updated_values, updated_sources, message)
+
+
+def _format_result(
+    updated_values: Dict[str, str],
+    updated_sources: Dict[str, str],
+    quote: QuoteInput,
+    result: QuoteResult,
+    money: Callable[[float], str] = fmt_money,
+    pct: Callable[[float], str] = fmt_pct,
+) -> CalculationResult:
+    status = result.message
+    _set_calc_value(updated_values, updated_sources, "status", status)
+    if result.status != STATUS_OK:
+        return CalculationResult(updated_values, updated_sources, status)
+
+    for name, bit in FIELD_BITS.items():
+        if name == "target_margin":
+            continue
+        value = getattr(result, name)
+        if value is None:
+            continue
+        text = pct(value) if name == "discount" else money(value)
+        if result.calc & bit:
+            _set_calc_value(updated_values, updated_sources, name, text)
+        elif quote.user & bit:
+            updated_values[name] = text
+
+    _set_calc_value(updated_values, updated_sources, "m_no", "—" if result.m_no is None else pct(result.m_no))
+    _set_calc_value(updated_values, updated_sources, "m_with", "—" if result.m_with is None else pct(result.m_with))
+    return CalculationResult(updated_values, updated_sources, status)
+
+
+def format_result(
+    values: Dict[str, str],
+    sources: Dict[str, str],
+    quote: QuoteInput,
+    result: QuoteResult,
+    money: Callable[[float], str] = fmt_money,
+    pct: Callable[[float], str] = fmt_pct,
+) -> CalculationResult:
+    # What calculate_all returns for these fields when the solver gives `result` for
+    # `quote`; lets other backends be compared with it field by field, or format their
+    # own numbers (e.g. integer cents) with `money` and `pct`.
+    return _format_result(*_cleared_outputs(values, sources), quote, result, money, pct)
+
+
+def error_result(values: Dict[str, str], sources: Dict[str, str], message: str) -> CalculationResult:
+    # What calculate_all returns when an input cannot be read.
+    return _error_result(*_cleared_outputs(values, sources), message)
 
 
 def reset_values() -> Tuple[Dict[str, str], Dict[str, str]]:
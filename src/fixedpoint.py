@@ -0,0 +1,330 @@
+from decimal import (
+    ROUND_CEILING,
+    ROUND_DOWN,
+    ROUND_FLOOR,
+    ROUND_HALF_DOWN,
+    ROUND_HALF_EVEN,
+    ROUND_HALF_UP,
+    ROUND_UP,
+    Decimal,
+    InvalidOperation,
+    localcontext,
+)
+from typing import Callable, Dict, List, Optional, Union
+
+from .calculations import (
+    INPUT_FIELDS,
+    SOLVE_PLANS,
+    STATUS_AV_NEGATIVE,
+    STATUS_AV_NEGATIVE_SOLVED,
+    STATUS_DISCOUNT_100_AV,
+    STATUS_DISCOUNT_100_NET1,
+    STATUS_DISCOUNT_RANGE,
+    STATUS_MARGIN_100_NET2,
+    STATUS_MARGIN_RANGE,
+    STATUS_OK,
+    STATUS_SOLVED_DISCOUNT_RANGE,
+    STATUS_TOO_MANY_INPUTS,
+    STATUS_ZERO_DENOMINATOR,
+    STEP_NAMES,
+    CalculationError,
+    CalculationResult,
+    QuoteInput,
+    QuoteResult,
+    error_result,
+    failed_quote,
+    format_result,
+    solve_pattern,
+    source_bits,
+)
+
+# Money is held as integer cents and percentages as integer basis points (1 bp = 0.01%).
+# Every derived value is rounded once, to its own unit, with an explicit rounding mode.
+SCALE = 10_000
+ROUNDING_MODES = (
+    ROUND_HALF_UP,
+    ROUND_HALF_EVEN,
+    ROUND_HALF_DOWN,
+    ROUND_DOWN,
+    ROUND_UP,
+    ROUND_FLOOR,
+    ROUND_CEILING,
+)
+
+Number = Union[int, Decimal]
+Divide = Callable[[Number, Number], Number]
+
+
+def check_rounding(rounding: str) -> None:
+    if rounding not in ROUNDING_MODES:
+        raise ValueError(f"Unknown rounding mode: {rounding!r}")
+
+
+def div_round(numerator: int, denominator: int, rounding: str = ROUND_HALF_UP) -> int:
+    quotient, remainder = divmod(abs(numerator), abs(denominator))
+    negative = (numerator < 0) != (denominator < 0)
+    if remainder:
+        twice = 2 * remainder
+        if rounding == ROUND_HALF_UP:
+            up = twice >= abs(denominator)
+        elif rounding == ROUND_HALF_EVEN:
+            up = twice > abs(denominator) or (twice == abs(denominator) and quotient % 2 == 1)
+        elif rounding == ROUND_HALF_DOWN:
+            up = twice > abs(denominator)
+        elif rounding == ROUND_UP:
+            up = True
+        elif rounding == ROUND_DOWN:
+            up = False
+        elif rounding == ROUND_CEILING:
+            up = not negative
+        else:
+            up = negative
+        if up:
+            quotient += 1
+    return -quotient if negative else quotient
+
+
+def _integer_divider(rounding: str) -> Divide:
+    return lambda numerator, denominator: div_round(numerator, denominator, rounding)
+
+
+def _decimal_divider(rounding: str) -> Divide:
+    return lambda numerator, denominator: (numerator / denominator).to_integral_value(rounding=rounding)
+
+
+_INTEGER_DIVIDERS = {rounding: _integer_divider(rounding) for rounding in ROUNDING_MODES}
+_DECIMAL_DIVIDERS = {rounding: _decimal_divider(rounding) for rounding in ROUNDING_MODES}
+
+
+def _parse_decimal(value) -> Optional[Decimal]:
+    if value is None:
+        return None
+    if isinstance(value, Decimal):
+        amount = value
+    elif isinstance(value, float):
+        amount = Decimal(repr(value))
+    elif isinstance(value, int):
+        return Decimal(value)
+    else:
+        raw = (value or "").strip()
+        if not raw:
+            return None
+        try:
+            amount = Decimal(raw.replace(",", "."))
+        except InvalidOperation:
+            raise ValueError(f"could not convert string to decimal: {value!r}") from None
+    # Cents and basis points are integers, so infinities and NaNs have no value here.
+    if not amount.is_finite():
+        raise ValueError(f"could not convert string to decimal: {value!r}")
+    return amount
+
+
+def to_cents(value, rounding: str = ROUND_HALF_UP) -> Optional[int]:
+    amount = _parse_decimal(value)
+    return None if amount is None else int((amount * 100).to_integral_value(rounding=rounding))
+
+
+def to_bp(value, rounding: str = ROUND_HALF_UP) -> Optional[int]:
+    pct = _parse_decimal(value)
+    return None if pct is None else int((pct * 100).to_integral_value(rounding=rounding))
+
+
+def format_cents(value: int) -> str:
+    sign = "-" if value < 0 else ""
+    whole, cents = divmod(abs(value), 100)
+    return f"{sign}{whole}.{cents:02d}"
+
+
+format_bp = format_cents
+
+
+def _check_inputs(x: List[Optional[Number]]) -> None:
+    added_value, discount, margin = x[2], x[3], x[5]
+    if added_value is not None and added_value < 0:
+        raise CalculationError(STATUS_AV_NEGATIVE)
+    if discount is not None and (discount < 0 or discount > SCALE):
+        raise CalculationError(STATUS_DISCOUNT_RANGE)
+    if margin is not None and (margin < 0 or margin > SCALE):
+        raise CalculationError(STATUS_MARGIN_RANGE)
+
+
+def _clear_net2(x: List[Optional[Number]], div: Divide) -> None:
+    x[4] = None
+
+
+def _too_many_inputs(x: List[Optional[Number]], div: Divide) -> None:
+    raise CalculationError(STATUS_TOO_MANY_INPUTS)
+
+
+def _assume_av_zero(x: List[Optional[Number]], div: Divide) -> None:
+    x[2] = 0
+
+
+def _assume_discount_zero(x: List[Optional[Number]], div: Divide) -> None:
+    x[3] = 0
+
+
+def _net2_from_margin(x: List[Optional[Number]], div: Divide) -> None:
+    if SCALE - x[5] == 0:
+        raise CalculationError(STATUS_MARGIN_100_NET2)
+    x[4] = div(x[0] * SCALE, SCALE - x[5])
+
+
+def _cost_from_margin(x: List[Optional[Number]], div: Divide) -> None:
+    x[0] = div(x[4] * (SCALE - x[5]), SCALE)
+
+
+def _discount_candidate(x: List[Optional[Number]], div: Divide) -> Number:
+    denom = x[1] + x[2]
+    if denom == 0:
+        raise CalculationError(STATUS_ZERO_DENOMINATOR)
+    return div((denom - x[4]) * SCALE, denom)
+
+
+def _solve_discount(x: List[Optional[Number]], div: Divide) -> None:
+    discount = _discount_candidate(x, div)
+    if discount < 0 or discount > SCALE:
+        raise CalculationError(STATUS_SOLVED_DISCOUNT_RANGE)
+    x[3] = discount
+
+
+def _solve_discount_or_av(x: List[Optional[Number]], div: Divide) -> None:
+    discount = _discount_candidate(x, div)
+    if discount < 0:
+        av_candidate = x[4] - x[1]
+        if av_candidate < 0:
+            raise CalculationError(STATUS_AV_NEGATIVE_SOLVED)
+        x[2] = av_candidate
+        x[3] = 0
+    elif discount > SCALE:
+        raise CalculationError(STATUS_SOLVED_DISCOUNT_RANGE)
+    else:
+        x[3] = discount
+
+
+def _net2_from_discount(x: List[Optional[Number]], div: Divide) -> None:
+    x[4] = div((x[1] + x[2]) * (SCALE - x[3]), SCALE)
+
+
+def _net1_from_net2(x: List[Optional[Number]], div: Divide) -> None:
+    if SCALE - x[3] == 0:
+        raise CalculationError(STATUS_DISCOUNT_100_NET1)
+    x[1] = div(x[4] * SCALE, SCALE - x[3]) - x[2]
+
+
+def _av_from_net2(x: List[Optional[Number]], div: Divide) -> None:
+    if SCALE - x[3] == 0:
+        raise CalculationError(STATUS_DISCOUNT_100_AV)
+    av_candidate = div(x[4] * SCALE, SCALE - x[3]) - x[1]
+    if av_candidate < 0:
+        raise CalculationError(STATUS_AV_NEGATIVE_SOLVED)
+    x[2] = av_candidate
+
+
+FIXED_STEPS: Dict[str, Callable[[List[Optional[Number]], Divide], None]] = {
+    "clear_net2": _clear_net2,
+    "too_many_inputs": _too_many_inputs,
+    "assume_av_zero": _assume_av_zero,
+    "assume_discount_zero": _assume_discount_zero,
+    "net2_from_margin": _net2_from_margin,
+    "cost_from_margin": _cost_from_margin,
+    "solve_discount": _solve_discount,
+    "solve_discount_or_av": _solve_discount_or_av,
+    "net2_from_discount": _net2_from_discount,
+    "net1_from_net2": _net1_from_net2,
+    "av_from_net2": _av_from_net2,
+}
+
+_FIXED_PLANS = tuple(tuple(FIXED_STEPS[STEP_NAMES[step]] for step in plan) for plan in SOLVE_PLANS)
+
+
+def _solve_fixed(quote: QuoteInput, div: Divide) -> QuoteResult:
+    x = [quote.cost, quote.net1, quote.added_value, quote.discount, quote.net2, quote.target_margin]
+    try:
+        _check_inputs(x)
+        for step in _FIXED_PLANS[solve_pattern(x, quote.user)]:
+            step(x, div)
+    except CalculationError as exc:
+        return failed_quote(quote, exc.code)
+
+    cost, net1, added_value, discount, net2, _ = x
+    if added_value is not None and added_value < 0:
+        return failed_quote(quote, STATUS_AV_NEGATIVE)
+
+    calc = 0
+    for index, value in enumerate(x[:5]):
+        if value is not None:
+            calc |= 1 << index
+
+    m_no = None
+    if cost is not None and net1 is not None and net1 != 0:
+        m_no = div((net1 - cost) * SCALE, net1)
+    m_with = None
+    if cost is not None and net2 is not None and net2 != 0:
+        m_with = div((net2 - cost) * SCALE, net2)
+
+    if net2 is None:
+        net2 = quote.net2
+
+    return QuoteResult(
+        cost,
+        net1,
+        added_value,
+        discount,
+        net2,
+        quote.target_margin,
+        m_no,
+        m_with,
+        STATUS_OK,
+        calc & ~quote.user,
+    )
+
+
+def solve_cents(quote: QuoteInput, rounding: str = ROUND_HALF_UP) -> QuoteResult:
+    # Money fields are int cents, discount/target_margin int basis points; m_no and
+    # m_with come back in basis points.
+    div = _INTEGER_DIVIDERS.get(rounding)
+    if div is None:
+        check_rounding(rounding)
+    return _solve_fixed(quote, div)
+
+
+def solve_decimal(quote: QuoteInput, rounding: str = ROUND_HALF_UP) -> QuoteResult:
+    # Same units and rounding as solve_cents, computed with Decimal; slower, used as
+    # the reference for the integer backend.
+    div = _DECIMAL_DIVIDERS.get(rounding)
+    if div is None:
+        check_rounding(rounding)
+    decimal_quote = QuoteInput(
+        *(
+            None if value is None else Decimal(value)
+            for value in (quote.cost, quote.net1, quote.added_value, quote.discount, quote.net2, quote.target_margin)
+        ),
+        user=quote.user,
+    )
+    with localcontext() as context:
+        context.prec = 40
+        result = _solve_fixed(decimal_quote, div)
+    for name in ("cost", "net1", "added_value", "discount", "net2", "target_margin", "m_no", "m_with"):
+        value = getattr(result, name)
+        if value is not None:
+            setattr(result, name, int(value))
+    return result
+
+
+def calculate_all_cents(
+    values: Dict[str, str],
+    sources: Dict[str, str],
+    rounding: str = ROUND_HALF_UP,
+) -> CalculationResult:
+    try:
+        parsed = [
+            (to_bp if name in ("discount", "target_margin") else to_cents)(values.get(name, ""), rounding)
+            for name in INPUT_FIELDS
+        ]
+    except ValueError as exc:
+        return error_result(values, sources, str(exc))
+
+    quote = QuoteInput(*parsed, user=source_bits(sources))
+    return format_result(values, sources, quote, solve_cents(quote, rounding), format_cents, format_bp)
+
@@ -0,0 +1,605 @@
+import argparse
+import json
+import math
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .batch import MISSING_CENTS, BatchResult, calculate_batch, calculate_batch_cents
+from .baseline import calculate_all as baseline_calculate_all
+from .cache import CalculationCache
+from .calculations import (
+    FIELD_BITS,
+    INPUT_FIELDS,
+    SOLVER_LOOP,
+    SOLVER_PLAN,
+    STATUS_AV_NEGATIVE_SOLVED,
+    STATUS_MESSAGES,
+    STATUS_SOLVED_DISCOUNT_RANGE,
+    CalculationResult,
+    QuoteInput,
+    QuoteResult,
+    calculate_all,
+    format_result,
+    solve,
+)
+from .fixedpoint import calculate_all_cents
+from .parallel import ParallelSolver
+
+# Every backend is checked against baseline.calculate_all, a frozen copy of the
+# original calculator, by the text it shows. The float backends must also agree bit for
+# bit with the loop solver: a difference too small to show in the text (drift below
+# display precision) fails as well unless drift is allowed. The cents backend rounds
+# every step, so its values only need to be within per-field tolerances, and rows it
+# accepts by rounding a solved value onto the edge of its range are counted apart.
+BACKENDS = ("loop", "plan", "batch", "cache", "parallel", "strings", "cents")
+DEFAULT_BACKENDS = ("loop", "plan", "batch", "cache", "parallel", "strings")
+RESULT_FIELDS = ("cost", "net1", "added_value", "discount", "net2", "target_margin", "m_no", "m_with")
+
+MONEY_EDGES = (0.0, 0.01, -0.01, 1.0, 99.99, 100.0, 100.01, 1e6, -5.0)
+PERCENT_EDGES = (0.0, 0.01, -0.01, 50.0, 99.99, 100.0, 100.01, -100.0)
+_PERCENT_FIELDS = (3, 5)
+_SHRINK_VALUES = (0.0, 1.0, 100.0, 50.0)
+_MAX_SHRINK_STEPS = 500
+
+
+@dataclass
+class FuzzCase:
+    # Inputs as the calculator holds them: None for an empty field, discount and target
+    # margin in percent, and FIELD_BITS set for fields whose source is "user".
+    values: List[Optional[float]]
+    user: int
+
+    def quote(self) -> QuoteInput:
+        return QuoteInput(*self.values, user=self.user)
+
+    def fields(self) -> Tuple[Dict[str, str], Dict[str, str]]:
+        values = {name: "" if value is None else repr(value) for name, value in zip(INPUT_FIELDS, self.values)}
+        sources = {name: ("user" if self.user & bit else "calc" if values[name] else "") for name, bit in FIELD_BITS.items()}
+        return values, sources
+
+    def describe(self) -> str:
+        parts = []
+        for name, value in zip(INPUT_FIELDS, self.values):
+            user = "*" if self.user & FIELD_BITS[name] else ""
+            if value is not None or user:
+                parts.append(f"{name}{user}={'' if value is None else repr(value)}")
+        return ", ".join(parts) or "(empty)"
+
+
+@dataclass
+class Divergence:
+    backend: str
+    case: FuzzCase
+    shrunk: FuzzCase
+    # Field name to (reference, backend) for every field, source or status that differs.
+    differences: Dict[str, Tuple[str, str]]
+    # False when the shrunk case is the original and it did not diverge on its own,
+    # e.g. a problem that only shows up with other rows in the same batch.
+    reproducible: bool = True
+
+    def describe(self) -> str:
+        lines = [f"{self.backend}: {self.shrunk.describe()}"]
+        if self.shrunk != self.case:
+            lines.append(f"  shrunk from: {self.case.describe()}")
+        if not self.reproducible:
+            lines.append("  only diverges as part of its batch")
+        for name, (expected, actual) in self.differences.items():
+            lines.append(f"  {name}: expected {expected!r}, got {actual!r}")
+        return "\n".join(lines)
+
+
+@dataclass
+class FuzzSummary:
+    rows: int = 0
+    seconds: float = 0.0
+    checked: Dict[str, int] = field(default_factory=dict)
+    # Rows whose numbers differed from the loop solver's but showed the same text; also
+    # counted as divergent unless drift is allowed.
+    drift: Dict[str, int] = field(default_factory=dict)
+    # Cents rows that pass a solved range check the baseline fails, by rounding the
+    # solved value onto the edge of its range; see _on_edge.
+    edges: Dict[str, int] = field(default_factory=dict)
+    divergent: Dict[str, int] = field(default_factory=dict)
+    divergences: List[Divergence] = field(default_factory=list)
+
+    @property
+    def rows_per_minute(self) -> float:
+        return self.rows / self.seconds * 60.0 if self.seconds else 0.0
+
+    @property
+    def passed(self) -> bool:
+        return not any(self.divergent.values())
+
+    def format(self) -> str:
+        lines = [f"{self.rows:,} cases in {self.seconds:.1f}s ({self.rows_per_minute:,.0f}/min)"]
+        for name, checked in self.checked.items():
+            lines.append(
+                f"  {name:<9}{checked:>12,} checked {self.divergent.get(name, 0):>8,} divergent "
+                f"{self.drift.get(name, 0):>8,} below display precision"
+                + (f" {self.edges[name]:>8,} on a range edge" if name in self.edges else "")
+            )
+        lines.extend(divergence.describe() for divergence in self.divergences)
+        return "\n".join(lines)
+
+    def to_json(self, path: str) -> None:
+        report = asdict(self)
+        report["rows_per_minute"] = self.rows_per_minute
+        report["passed"] = self.passed
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+
+
+def generate_cases(size: int, rng: np.random.Generator, raw_fraction: float = 0.1) -> Tuple[List[np.ndarray], np.ndarray]:
+    # Input columns (NaN for empty) and user bits. Each field is empty, a boundary value
+    # or a random value; random values are whole cents except for `raw_fraction` of
+    # rows. A tenth of the rows repeat earlier ones so caches see hits.
+    columns = []
+    kind = rng.random((len(INPUT_FIELDS), size))
+    raw = rng.random(size) < raw_fraction
+    for index in range(len(INPUT_FIELDS)):
+        percent = index in _PERCENT_FIELDS
+        edges = np.array(PERCENT_EDGES if percent else MONEY_EDGES)
+        if percent:
+            random = rng.uniform(0.0, 100.0, size)
+        else:
+            random = 10.0 ** rng.uniform(-1.0, 5.0, size)
+        random = np.where(raw, random, np.round(random, 2))
+        column = np.where(kind[index] < 0.2, edges[rng.integers(0, len(edges), size)], random)
+        column[kind[index] > 0.6] = np.nan
+        columns.append(column)
+
+    present = np.stack([~np.isnan(column) for column in columns])
+    chance = np.where(present, 0.6, 0.05)
+    user = np.zeros(size, dtype=np.uint8)
+    for index, bit in enumerate(FIELD_BITS.values()):
+        user[rng.random(size) < chance[index]] |= bit
+
+    repeats = np.flatnonzero(rng.random(size) < 0.1)
+    repeats = repeats[repeats > 0]
+    originals = rng.integers(0, np.maximum(repeats, 1))
+    for column in columns:
+        column[repeats] = column[originals]
+    user[repeats] = user[originals]
+    return columns, user
+
+
+def _optional(value: float) -> Optional[float]:
+    return None if value != value else value
+
+
+def _cases(columns: Sequence[np.ndarray], user: np.ndarray) -> List[FuzzCase]:
+    rows = zip(*(column.tolist() for column in columns))
+    return [FuzzCase([_optional(value) for value in row], bits) for row, bits in zip(rows, user.tolist())]
+
+
+def _collect(results: Sequence[QuoteResult]) -> BatchResult:
+    columns = {
+        name: np.array([np.nan if getattr(result, name) is None else getattr(result, name) for result in results])
+        for name in RESULT_FIELDS
+    }
+    return BatchResult(
+        **columns,
+        status=np.array([result.status for result in results], dtype=np.uint8),
+        calc=np.array([result.calc for result in results], dtype=np.uint8),
+    )
+
+
+def _row(result: BatchResult, index: int) -> QuoteResult:
+    values = [_optional(float(getattr(result, name)[index])) for name in RESULT_FIELDS]
+    return QuoteResult(*values, int(result.status[index]), int(result.calc[index]))
+
+
+def _mismatched(expected: BatchResult, actual: BatchResult) -> np.ndarray:
+    differs = (expected.status != actual.status) | (expected.calc != actual.calc)
+    for name in RESULT_FIELDS:
+        a = getattr(expected, name)
+        b = getattr(actual, name)
+        differs |= ~((a == b) | (np.isnan(a) & np.isnan(b)))
+    return differs
+
+
+def _tolerances(values: Dict[str, object], money: float) -> Dict[str, object]:
+    # Allowed difference per field when every solved amount is rounded to `money` and
+    # later steps work from the rounded value. Cost and Net2 are at most one rounding
+    # from the other, so 2 * money. Net1 and added value are solved from Net2 over
+    # (1 - discount), which scales that error up. A percentage 100 * n / d moves by
+    # 100 * (en / |d| + |n| * ed / d^2) for errors en and ed, plus a basis point of its
+    # own rounding. Works on numpy columns and on single values (NaN for empty).
+    def ratio(numerator, denominator, numerator_error, denominator_error):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            spread = numerator_error / np.abs(denominator) + np.abs(numerator) * denominator_error / denominator**2
+        return 100.0 * spread + 0.01
+
+    def amount(name, error):
+        # The baseline's own float arithmetic is only good to about 1e-14 of the amount.
+        return error + 1e-14 * np.abs(np.nan_to_num(values[name], nan=0.0))
+
+    keep = 1.0 - np.nan_to_num(values["discount"], nan=0.0) / 100.0
+    with np.errstate(divide="ignore"):
+        list_error = money + 2.0 * money / np.abs(keep)
+    net_error = 2.0 * money
+    base = values["net1"] + np.nan_to_num(values["added_value"], nan=0.0)
+    return {
+        "cost": amount("cost", net_error),
+        "net1": amount("net1", list_error),
+        "added_value": amount("added_value", list_error),
+        "net2": amount("net2", net_error),
+        "discount": ratio(values["net2"], base, net_error, 2.0 * list_error),
+        "target_margin": 0.01,
+        "m_no": ratio(values["cost"], values["net1"], net_error, list_error),
+        "m_with": ratio(values["cost"], values["net2"], net_error, net_error),
+    }
+
+
+def _outside(expected: BatchResult, actual: BatchResult, money: float) -> np.ndarray:
+    # Rows whose status or sources differ, or with a value, as displayed, further off
+    # than its tolerance.
+    tolerances = _tolerances({name: getattr(expected, name) for name in RESULT_FIELDS}, money)
+    differs = (expected.status != actual.status) | (expected.calc != actual.calc)
+    for name in RESULT_FIELDS:
+        a = getattr(expected, name)
+        b = getattr(actual, name)
+        with np.errstate(invalid="ignore"):
+            same = np.abs(np.round(a, 2) - np.round(b, 2)) <= tolerances[name] + 1e-9
+        differs |= ~(same | (np.isnan(a) & np.isnan(b)))
+    return differs
+
+
+def _number(text: str) -> float:
+    try:
+        return float(text)
+    except ValueError:
+        return math.nan
+
+
+def _differences(expected: CalculationResult, actual: CalculationResult) -> Dict[str, Tuple[str, str]]:
+    differences = {}
+    for name in expected.values.keys() | actual.values.keys():
+        if expected.values.get(name, "") != actual.values.get(name, ""):
+            differences[name] = (expected.values.get(name, ""), actual.values.get(name, ""))
+    for name in expected.sources.keys() | actual.sources.keys():
+        if expected.sources.get(name, "") != actual.sources.get(name, ""):
+            differences[f"source:{name}"] = (expected.sources.get(name, ""), actual.sources.get(name, ""))
+    return dict(sorted(differences.items()))
+
+
+def _on_edge(expected: CalculationResult, actual: CalculationResult) -> bool:
+    # The cents backend range-checks a solved discount or added value after rounding it,
+    # so a value just past 0% or 100% (or just below 0.00) that rounds onto the edge is
+    # accepted there and rejected by the baseline's exact check. Only those rows pass.
+    if actual.status:
+        return False
+    if expected.status == STATUS_MESSAGES[STATUS_SOLVED_DISCOUNT_RANGE]:
+        name, edges = "discount", ("0.00", "100.00")
+    elif expected.status == STATUS_MESSAGES[STATUS_AV_NEGATIVE_SOLVED]:
+        name, edges = "added_value", ("0.00",)
+    else:
+        return False
+    # Empty in the baseline's output means the field was not an input, so it was solved.
+    return not expected.values.get(name) and actual.values.get(name) in edges
+
+
+def reference(case: FuzzCase) -> CalculationResult:
+    return baseline_calculate_all(*case.fields())
+
+
+def _to_cents(column: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # int64 cents (or basis points) and whether the value sits exactly on that grid.
+    finite = np.isfinite(column) & (np.abs(column) < 1e12)
+    scaled = np.where(finite, column * 100.0, 0.0)
+    cents = np.round(scaled)
+    exact = ~finite | (np.abs(scaled - cents) < 1e-6)
+    return np.where(finite, cents, MISSING_CENTS).astype(np.int64), exact & (finite | np.isnan(column))
+
+
+class DifferentialFuzzer:
+    # Generates cases in rounds and solves each round with the baseline and every
+    # backend. The loop solver's results are formatted and compared with the baseline
+    # text; other float backends are compared with the loop solver column-wise, and only
+    # rows that differ are formatted. Divergences are shrunk and reported.
+    def __init__(
+        self,
+        backends: Sequence[str] = DEFAULT_BACKENDS,
+        seed: int = 0,
+        raw_fraction: float = 0.1,
+        cents_tolerance: float = 0.01,
+        workers: int = 2,
+        allow_drift: bool = False,
+        max_reports: int = 20,
+    ) -> None:
+        unknown = [name for name in backends if name not in BACKENDS]
+        if unknown:
+            raise ValueError(f"Unknown backend: {', '.join(unknown)}. Choose from {', '.join(BACKENDS)}.")
+        self.backends = tuple(backends)
+        self.rng = np.random.default_rng(seed)
+        self.raw_fraction = raw_fraction
+        self.cents_tolerance = cents_tolerance
+        self.allow_drift = allow_drift
+        self.max_reports = max_reports
+        self.cache = CalculationCache(65_536)
+        self.parallel = ParallelSolver(workers) if "parallel" in backends else None
+        self.summary = FuzzSummary()
+        self._solvers: Dict[str, Callable] = {
+            "loop": self._solve_loop,
+            "plan": self._solve_plan,
+            "batch": self._solve_batch,
+            "cache": self._solve_cache,
+            "parallel": self._solve_parallel,
+        }
+
+    def __enter__(self) -> "DifferentialFuzzer":
+        return self
+
+    def __exit__(self, *_exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self.parallel is not None:
+            self.parallel.close()
+            self.parallel = None
+
+    def _solve_loop(self, columns, user, cases: List[FuzzCase]) -> BatchResult:
+        return _collect([solve(case.quote(), SOLVER_LOOP) for case in cases])
+
+    def _solve_plan(self, columns, user, cases: List[FuzzCase]) -> BatchResult:
+        return _collect([solve(case.quote(), SOLVER_PLAN) for case in cases])
+
+    def _solve_batch(self, columns, user, _cases: List[FuzzCase]) -> BatchResult:
+        return calculate_batch(*columns, user=user)
+
+    def _solve_cache(self, columns, user, _cases: List[FuzzCase]) -> BatchResult:
+        return calculate_batch(*columns, user=user, cache=self.cache)
+
+    def _solve_parallel(self, columns, user, _cases: List[FuzzCase]) -> BatchResult:
+        # Small chunks, so even short rounds go through the shared-memory path.
+        self.parallel.chunk_size = max(len(user) // 4, 1)
+        return self.parallel.solve(*columns, user=user)
+
+    def _solve_cents(self, columns, user) -> Tuple[BatchResult, np.ndarray]:
+        # Only rows whose inputs are whole cents and basis points are comparable.
+        converted = [_to_cents(column) for column in columns]
+        comparable = np.logical_and.reduce([exact for _cents, exact in converted])
+        result = calculate_batch_cents(*(cents for cents, _exact in converted), user=user)
+        as_float = {
+            name: np.where(getattr(result, name) == MISSING_CENTS, np.nan, getattr(result, name) / 100.0)
+            for name in RESULT_FIELDS
+        }
+        return BatchResult(**as_float, status=result.status, calc=result.calc), comparable
+
+    def run_round(self, size: int) -> None:
+        columns, user = generate_cases(size, self.rng, self.raw_fraction)
+        cases = _cases(columns, user)
+        inputs = [case.fields() for case in cases]
+        expected = [baseline_calculate_all(values, sources) for values, sources in inputs]
+        looped = [solve(case.quote(), SOLVER_LOOP) for case in cases]
+        pivot = _collect(looped)
+        # Where the loop solver's text differs from the baseline, so does the text of
+        # every backend that matches the loop solver bit for bit.
+        wrong = np.array(
+            [
+                format_result(values, sources, case.quote(), result) != want
+                for case, (values, sources), result, want in zip(cases, inputs, looped, expected)
+            ],
+            dtype=bool,
+        )
+        for name in self.backends:
+            if name == "strings":
+                self._check_strings(cases, inputs, expected)
+                continue
+            if name == "cents":
+                self._check_cents(columns, user, cases, inputs, expected, pivot)
+                continue
+            self.summary.checked[name] = self.summary.checked.get(name, 0) + size
+            if name == "loop":
+                actual, differs = pivot, np.zeros(size, dtype=bool)
+            else:
+                actual = self._solvers[name](columns, user, cases)
+                differs = _mismatched(pivot, actual)
+            for index in np.flatnonzero(wrong & ~differs).tolist():
+                self._report(name, cases[index])
+            for index in np.flatnonzero(differs).tolist():
+                values, sources = inputs[index]
+                shown = format_result(values, sources, cases[index].quote(), _row(actual, index))
+                self._check_row(name, cases[index], shown == expected[index])
+        self.summary.rows += size
+
+    def _check_strings(self, cases: List[FuzzCase], inputs, expected: List[CalculationResult]) -> None:
+        # The full calculate_all path: parsing, the default solver and formatting.
+        self.summary.checked["strings"] = self.summary.checked.get("strings", 0) + len(cases)
+        for case, (values, sources), want in zip(cases, inputs, expected):
+            if calculate_all(values, sources) != want:
+                self._report("strings", case)
+
+    def _check_cents(self, columns, user, cases: List[FuzzCase], inputs, expected, pivot: BatchResult) -> None:
+        # Rows within tolerance of the loop solver's numbers pass; the rest are compared
+        # with the baseline text, with the same tolerances.
+        actual, comparable = self._solve_cents(columns, user)
+        self.summary.checked["cents"] = self.summary.checked.get("cents", 0) + int(comparable.sum())
+        for index in np.flatnonzero(_outside(pivot, actual, self.cents_tolerance) & comparable).tolist():
+            shown = calculate_all_cents(*inputs[index])
+            if _on_edge(expected[index], shown):
+                self.summary.edges["cents"] = self.summary.edges.get("cents", 0) + 1
+            elif not self._within_tolerance(expected[index], shown):
+                self._report("cents", cases[index])
+
+    def _check_row(self, name: str, case: FuzzCase, same_text: bool) -> None:
+        if same_text:
+            self.summary.drift[name] = self.summary.drift.get(name, 0) + 1
+            if self.allow_drift:
+                return
+        self._report(name, case)
+
+    def _report(self, name: str, case: FuzzCase) -> None:
+        self.summary.divergent[name] = self.summary.divergent.get(name, 0) + 1
+        if len(self.summary.divergences) >= self.max_reports:
+            return
+        reproducible = self.diverges(name, case)
+        shrunk = self.shrink(name, case) if reproducible else case
+        self.summary.divergences.append(
+            Divergence(name, case, shrunk, _differences(reference(shrunk), self.output(name, shrunk)), reproducible)
+        )
+
+    def _solve_one(self, name: str, case: FuzzCase) -> QuoteResult:
+        columns = [np.array([np.nan if value is None else value]) for value in case.values]
+        user = np.array([case.user], dtype=np.uint8)
+        return _row(self._solvers[name](columns, user, [case]), 0)
+
+    def output(self, name: str, case: FuzzCase) -> CalculationResult:
+        # What the backend makes of this one case, as calculate_all would show it.
+        values, sources = case.fields()
+        if name == "strings":
+            return calculate_all(values, sources)
+        if name == "cents":
+            return calculate_all_cents(values, sources)
+        return format_result(values, sources, case.quote(), self._solve_one(name, case))
+
+    def diverges(self, name: str, case: FuzzCase) -> bool:
+        expected = reference(case)
+        if name == "cents":
+            shown = self.output(name, case)
+            return not (_on_edge(expected, shown) or self._within_tolerance(expected, shown))
+        if self.output(name, case) != expected:
+            return True
+        if name in ("loop", "strings") or self.allow_drift:
+            return False
+        looped = _collect([solve(case.quote(), SOLVER_LOOP)])
+        return bool(_mismatched(looped, _collect([self._solve_one(name, case)])).any())
+
+    def _within_tolerance(self, expected: CalculationResult, actual: CalculationResult) -> bool:
+        if expected.status != actual.status or expected.sources != actual.sources:
+            return False
+        numbers = {name: _number(expected.values.get(name, "")) for name in RESULT_FIELDS}
+        tolerances = _tolerances(numbers, self.cents_tolerance)
+        for name in expected.values.keys() | actual.values.keys():
+            a = expected.values.get(name, "")
+            b = actual.values.get(name, "")
+            if a == b:
+                continue
+            if name not in tolerances or abs(_number(a) - _number(b)) > tolerances[name] + 1e-9:
+                # NaN, from text that is not a number, fails the comparison too.
+                return False
+        return True
+
+    def shrink(self, name: str, case: FuzzCase) -> FuzzCase:
+        # Greedy: keep any simplification that still diverges, until none does. Tries
+        # emptying fields, dropping user sources, then simpler numbers.
+        steps = 0
+        improved = True
+        while improved and steps < _MAX_SHRINK_STEPS:
+            improved = False
+            for candidate in _simpler(case):
+                steps += 1
+                if self.diverges(name, candidate):
+                    case = candidate
+                    improved = True
+                    break
+                if steps >= _MAX_SHRINK_STEPS:
+                    break
+        return case
+
+    def run(self, rows: Optional[int] = None, seconds: Optional[float] = None, round_size: int = 50_000) -> FuzzSummary:
+        # Stops after `rows` cases or `seconds`, whichever comes first.
+        if rows is None and seconds is None:
+            raise ValueError("Give a number of rows or a time limit.")
+        started = time.perf_counter()
+        while True:
+            elapsed = time.perf_counter() - started
+            if seconds is not None and elapsed >= seconds:
+                break
+            if rows is not None and self.summary.rows >= rows:
+                break
+            size = round_size if rows is None else min(round_size, rows - self.summary.rows)
+            self.run_round(size)
+        self.summary.seconds += time.perf_counter() - started
+        return self.summary
+
+
+def _complexity(value: float) -> Tuple[int, float, bool]:
+    return len(repr(abs(value))), abs(value), value < 0
+
+
+def _simpler(case: FuzzCase):
+    values, user = case.values, case.user
+    for index, value in enumerate(values):
+        bit = 1 << index
+        if value is not None or user & bit:
+            simpler = list(values)
+            simpler[index] = None
+            yield FuzzCase(simpler, user & ~bit)
+    for bit in FIELD_BITS.values():
+        if user & bit:
+            yield FuzzCase(list(values), user & ~bit)
+    for index, value in enumerate(values):
+        if value is None or not math.isfinite(value):
+            continue
+        # Values on the cent grid stay on it, so the cents backend sees the same input.
+        half = value / 2 if round(value, 2) != value else round(value / 2, 2)
+        for candidate in _SHRINK_VALUES + (float(round(value)), round(value, 1), abs(value), half):
+            if _complexity(candidate) < _complexity(value):
+                simpler = list(values)
+                simpler[index] = candidate
+                yield FuzzCase(simpler, user)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Differential fuzzing of the solver backends against the baseline calculator.")
+    parser.add_argument("--rows", type=int, help="Stop after this many cases.")
+    parser.add_argument("--seconds", type=float, help="Stop after this many seconds (default: 60 without --rows).")
+    parser.add_argument(
+        "--backend",
+        action="append",
+        choices=BACKENDS,
+        help=f"Backend to check (repeatable; default: {', '.join(DEFAULT_BACKENDS)}).",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0).")
+    parser.add_argument("--round-size", type=int, default=50_000, help="Cases generated per round (default: 50000).")
+    parser.add_argument("--raw-fraction", type=float, default=0.1, help="Share of cases with values off the cent grid.")
+    parser.add_argument(
+        "--cents-tolerance",
+        type=float,
+        default=0.01,
+        help="Allowed money difference for the cents backend; percentages get the difference it can cause.",
+    )
+    parser.add_argument("--workers", type=int, default=2, help="Processes for the parallel backend (default: 2).")
+    parser.add_argument(
+        "--allow-drift",
+        action="store_true",
+        help="Count float differences that do not change the displayed text instead of failing on them.",
+    )
+    parser.add_argument("--max-reports", type=int, default=20, help="Divergences to shrink and report (default: 20).")
+    parser.add_argument("--report", metavar="FILE", help="Write the summary and divergences as JSON.")
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.round_size < 1:
+        parser.error("--round-size must be at least 1.")
+    seconds = args.seconds if args.seconds is not None or args.rows is not None else 60.0
+    try:
+        fuzzer = DifferentialFuzzer(
+            args.backend or DEFAULT_BACKENDS,
+            seed=args.seed,
+            raw_fraction=args.raw_fraction,
+            cents_tolerance=args.cents_tolerance,
+            workers=args.workers,
+            allow_drift=args.allow_drift,
+            max_reports=args.max_reports,
+        )
+    except ValueError as exc:
+        parser.error(str(exc))
+    with fuzzer:
+        summary = fuzzer.run(args.rows, seconds, args.round_size)
+    sys.stdout.write(summary.format() + "\n")
+    if args.report:
+        summary.to_json(args.report)
+    return 0 if summary.passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
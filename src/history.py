@@ -0,0 +1,355 @@
+import math
+import os
+import sqlite3
+import sys
+import time
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from .calculations import (
+    FIELD_BITS,
+    INPUT_FIELDS,
+    STATUS_INVALID_NUMBER,
+    STATUS_MESSAGES,
+    STATUS_OK,
+    CalculationResult,
+    QuoteResult,
+    fmt_money,
+    fmt_pct,
+    parse_float,
+    source_bits,
+)
+
+HISTORY_FIELDS = INPUT_FIELDS + ("m_no", "m_with")
+DEFAULT_BATCH_SIZE = 500
+SCHEMA_VERSION = 1
+_NAN = math.nan
+
+# One row per solved quote. Solved and user values share the field columns; `user`
+# and `calc` are FIELD_BITS masks telling which were typed and which were solved.
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS quotes (
+    id INTEGER PRIMARY KEY,
+    created REAL NOT NULL,
+    customer TEXT,
+    product TEXT,
+    {", ".join(f"{name} REAL" for name in HISTORY_FIELDS)},
+    user INTEGER NOT NULL,
+    calc INTEGER NOT NULL,
+    status INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS quotes_customer ON quotes (customer, product, created);
+CREATE INDEX IF NOT EXISTS quotes_product ON quotes (product, created);
+CREATE INDEX IF NOT EXISTS quotes_created ON quotes (created);
+"""
+_COLUMNS = ("created", "customer", "product") + HISTORY_FIELDS + ("user", "calc", "status")
+_INSERT = f"INSERT INTO quotes ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' for _ in _COLUMNS)})"
+
+Tag = Union[None, str, Sequence[Optional[str]]]
+HISTORY_ERRORS = (OSError, sqlite3.Error)
+
+
+def history_path() -> Path:
+    # Local to the machine, next to the logo cache's home, so a shared install keeps
+    # one history per user.
+    override = os.environ.get("MARGIN_CALCULATOR_HISTORY")
+    if override:
+        return Path(override)
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or str(Path.home() / "AppData" / "Local")
+    else:
+        base = os.environ.get("XDG_DATA_HOME") or str(Path.home() / ".local" / "share")
+    return Path(base) / "margin-calculator" / "history.sqlite3"
+
+
+@dataclass
+class HistoryEntry:
+    id: int
+    created: float
+    customer: Optional[str]
+    product: Optional[str]
+    result: QuoteResult
+    user: int
+
+    def to_calculation(self) -> CalculationResult:
+        # The entry as the calculator shows it: typed fields as user input, solved ones as calc.
+        values: Dict[str, str] = {}
+        sources: Dict[str, str] = {}
+        result = self.result
+        for name, bit in FIELD_BITS.items():
+            value = getattr(result, name)
+            fmt = fmt_pct if name in ("discount", "target_margin") else fmt_money
+            values[name] = "" if value is None else fmt(value)
+            sources[name] = "user" if self.user & bit else ("calc" if result.calc & bit else "")
+        for name in ("m_no", "m_with"):
+            value = getattr(result, name)
+            values[name] = "" if result.status != STATUS_OK else ("—" if value is None else fmt_pct(value))
+            sources[name] = "calc"
+        values["status"] = result.message
+        sources["status"] = "calc"
+        return CalculationResult(values, sources, result.message)
+
+
+@dataclass
+class HistoryColumns:
+    id: array
+    created: array
+    customer: List[Optional[str]]
+    product: List[Optional[str]]
+    values: Dict[str, array]
+    user: array
+    calc: array
+    status: array
+
+    def __len__(self) -> int:
+        return len(self.id)
+
+
+@dataclass
+class MarginSummary:
+    quotes: int
+    first: Optional[float]
+    last: Optional[float]
+    mean_margin: Optional[float]
+    min_margin: Optional[float]
+    max_margin: Optional[float]
+    mean_discount: Optional[float]
+
+
+def _tags(tag: Tag, size: int) -> Iterable[Optional[str]]:
+    if tag is None or isinstance(tag, str):
+        return [tag] * size
+    if len(tag) != size:
+        raise ValueError(f"Tags must have {size} entries.")
+    return tag
+
+
+def _filters(
+    customer: Optional[str],
+    product: Optional[str],
+    since: Optional[float],
+    until: Optional[float],
+) -> Tuple[str, List]:
+    clauses = []
+    parameters: List = []
+    for column, value in (("customer", customer), ("product", product)):
+        if value is not None:
+            clauses.append(f"{column} = ?")
+            parameters.append(value)
+    if since is not None:
+        clauses.append("created >= ?")
+        parameters.append(since)
+    if until is not None:
+        clauses.append("created < ?")
+        parameters.append(until)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", parameters
+
+
+def _float(value: Optional[float]) -> float:
+    return _NAN if value is None else value
+
+
+class QuoteHistory:
+    # Records are buffered and written `batch_size` at a time in one transaction;
+    # queries flush first, so they always see everything recorded.
+    def __init__(self, path=None, batch_size: int = DEFAULT_BATCH_SIZE) -> None:
+        if batch_size < 1:
+            raise ValueError("Batch size must be at least 1.")
+        self.path = Path(path) if path is not None else history_path()
+        self.batch_size = batch_size
+        self._pending: List[tuple] = []
+        if str(self.path) != ":memory:":
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(str(self.path))
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        version = self._connection.execute("PRAGMA user_version").fetchone()[0]
+        if version > SCHEMA_VERSION:
+            raise ValueError(f"{self.path} was written by a newer version (schema {version}).")
+        with self._connection:
+            self._connection.executescript(_SCHEMA)
+            self._connection.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+
+    def __enter__(self) -> "QuoteHistory":
+        return self
+
+    def __exit__(self, *_exc) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        self.flush()
+        return self._connection.execute("SELECT COUNT(*) FROM quotes").fetchone()[0]
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def record(
+        self,
+        result: QuoteResult,
+        user: int,
+        customer: Optional[str] = None,
+        product: Optional[str] = None,
+        created: Optional[float] = None,
+    ) -> None:
+        self._pending.append(
+            (time.time() if created is None else created, customer, product)
+            + tuple(getattr(result, name) for name in HISTORY_FIELDS)
+            + (user, result.calc, result.status)
+        )
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def record_calculation(
+        self,
+        result: CalculationResult,
+        customer: Optional[str] = None,
+        product: Optional[str] = None,
+        created: Optional[float] = None,
+    ) -> bool:
+        # Quotes that did not parse are not recorded; returns whether this one was.
+        try:
+            numbers = [parse_float(result.values.get(name, "")) for name in INPUT_FIELDS]
+            margins = [parse_float(result.values.get(name, "").replace("—", "")) for name in ("m_no", "m_with")]
+        except ValueError:
+            return False
+        try:
+            status = STATUS_MESSAGES.index(result.status)
+        except ValueError:
+            status = STATUS_INVALID_NUMBER
+        if status == STATUS_INVALID_NUMBER:
+            return False
+        calc = 0
+        for name, bit in FIELD_BITS.items():
+            if result.sources.get(name) == "calc" and result.values.get(name, "").strip():
+                calc |= bit
+        quote = QuoteResult(*numbers, *margins, status=status, calc=calc)
+        self.record(quote, source_bits(result.sources), customer, product, created)
+        return True
+
+    def record_batch(
+        self,
+        result,
+        user=None,
+        customer: Tag = None,
+        product: Tag = None,
+        created: Optional[float] = None,
+    ) -> int:
+        # A BatchResult (or anything with its columns) goes in as one transaction.
+        # NaN is stored as NULL by sqlite3.
+        self.flush()
+        size = len(result.status)
+        stamp = time.time() if created is None else created
+        columns = [getattr(result, name).tolist() for name in HISTORY_FIELDS]
+        user_bits = [0] * size if user is None else (user.tolist() if hasattr(user, "tolist") else list(user))
+        if len(user_bits) != size:
+            raise ValueError(f"User mask must have {size} entries.")
+        rows = zip(
+            [stamp] * size,
+            _tags(customer, size),
+            _tags(product, size),
+            *columns,
+            user_bits,
+            result.calc.tolist(),
+            result.status.tolist(),
+        )
+        with self._connection:
+            self._connection.executemany(_INSERT, rows)
+        return size
+
+    def flush(self) -> None:
+        if self._pending:
+            pending, self._pending = self._pending, []
+            with self._connection:
+                self._connection.executemany(_INSERT, pending)
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self.flush()
+            self._connection.close()
+            self._connection = None
+
+    def recent(
+        self,
+        limit: int = 50,
+        customer: Optional[str] = None,
+        product: Optional[str] = None,
+    ) -> List[HistoryEntry]:
+        self.flush()
+        where, parameters = _filters(customer, product, None, None)
+        rows = self._connection.execute(
+            f"SELECT id, {', '.join(_COLUMNS)} FROM quotes{where} ORDER BY created DESC, id DESC LIMIT ?",
+            parameters + [limit],
+        ).fetchall()
+        entries = []
+        for row in rows:
+            fields = row[4:4 + len(HISTORY_FIELDS)]
+            user, calc, status = row[-3:]
+            entries.append(
+                HistoryEntry(
+                    id=row[0],
+                    created=row[1],
+                    customer=row[2],
+                    product=row[3],
+                    result=QuoteResult(*fields, status=status, calc=calc),
+                    user=user,
+                )
+            )
+        return entries
+
+    def query(
+        self,
+        customer: Optional[str] = None,
+        product: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: Optional[int] = None,
+    ) -> HistoryColumns:
+        # Oldest first, as typed arrays with NaN for empty values. Rows are fetched as
+        # tuples and copied into array.array columns, so the cost grows with the rows
+        # returned; np.frombuffer can wrap a column afterwards without another copy.
+        self.flush()
+        where, parameters = _filters(customer, product, since, until)
+        sql = f"SELECT id, {', '.join(_COLUMNS)} FROM quotes{where} ORDER BY created, id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            parameters.append(limit)
+        rows = self._connection.execute(sql, parameters).fetchall()
+        columns = list(zip(*rows)) if rows else [()] * (len(_COLUMNS) + 1)
+        fields = columns[4:4 + len(HISTORY_FIELDS)]
+        return HistoryColumns(
+            id=array("q", columns[0]),
+            created=array("d", columns[1]),
+            customer=list(columns[2]),
+            product=list(columns[3]),
+            values={name: array("d", map(_float, values)) for name, values in zip(HISTORY_FIELDS, fields)},
+            user=array("B", columns[-3]),
+            calc=array("B", columns[-2]),
+            status=array("B", columns[-1]),
+        )
+
+    def margin_summary(
+        self,
+        customer: Optional[str] = None,
+        product: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+    ) -> MarginSummary:
+        # Aggregated in SQLite over the index range, so nothing row-sized reaches Python.
+        self.flush()
+        where, parameters = _filters(customer, product, since, until)
+        where += (" AND " if where else " WHERE ") + "status = ?"
+        parameters.append(STATUS_OK)
+        row = self._connection.execute(
+            "SELECT COUNT(*), MIN(created), MAX(created), AVG(m_with), MIN(m_with), MAX(m_with), AVG(discount)"
+            f" FROM quotes{where}",
+            parameters,
+        ).fetchone()
+        return MarginSummary(*row)
+
+    def customers(self) -> List[str]:
+        self.flush()
+        rows = self._connection.execute("SELECT DISTINCT customer FROM quotes WHERE customer IS NOT NULL ORDER BY customer")
+        return [row[0] for row in rows]
@@ -0,0 +1,202 @@
+import json
+import math
+import threading
+from collections import Counter, deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, List, Optional
+
+from .calculations import INPUT_FIELDS, STATUS_MESSAGES, SolveTrace, set_tracer
+
+_NET2_USER = 1 << len(INPUT_FIELDS)
+_AV_USER = _NET2_USER << 1
+
+# Latency buckets grow by 5%, from 100 ns up; percentiles are read back at bucket midpoints.
+_BUCKET_BASE = 1e-7
+_BUCKET_GROWTH = 1.05
+_BUCKET_LOG = math.log(_BUCKET_GROWTH)
+
+
+def describe_pattern(pattern: int) -> str:
+    if pattern < 0:
+        return "unparsed"
+    present = [name for index, name in enumerate(INPUT_FIELDS) if pattern & (1 << index)]
+    label = "+".join(present) or "empty"
+    flags = []
+    if pattern & _NET2_USER:
+        flags.append("net2:user")
+    if pattern & _AV_USER:
+        flags.append("added_value:user")
+    if flags:
+        label += f" [{', '.join(flags)}]"
+    return label
+
+
+def describe_status(status: int) -> str:
+    return "ok" if status == 0 else STATUS_MESSAGES[status]
+
+
+class LatencyHistogram:
+    def __init__(self) -> None:
+        self.buckets: Counter = Counter()
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def add(self, seconds: float, count: int = 1) -> None:
+        bucket = 0 if seconds <= _BUCKET_BASE else int(math.log(seconds / _BUCKET_BASE) / _BUCKET_LOG) + 1
+        self.buckets[bucket] += count
+        self.count += count
+        self.total += seconds * count
+        self.maximum = max(self.maximum, seconds)
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        self.buckets.update(other.buckets)
+        self.count += other.count
+        self.total += other.total
+        self.maximum = max(self.maximum, other.maximum)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                if bucket == 0:
+                    return _BUCKET_BASE
+                low = _BUCKET_BASE * _BUCKET_GROWTH ** (bucket - 1)
+                return min(low * (1 + _BUCKET_GROWTH) / 2, self.maximum)
+        return self.maximum
+
+    def as_dict(self) -> Dict[str, Optional[float]]:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "p50": self.percentile(0.50),
+            "p99": self.percentile(0.99),
+            "max": self.maximum if self.count else None,
+        }
+
+
+class SolverStats:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.solves = 0
+        self.patterns: Counter = Counter()
+        self.statuses: Counter = Counter()
+        self.rules: Counter = Counter()
+        self.assumptions: Counter = Counter()
+        self.iterations: Counter = Counter()
+        self.phases: Counter = Counter()
+        self.latency = LatencyHistogram()
+        self.batches = 0
+        self.batch_rows = 0
+        self.batch_seconds = 0.0
+        self.batch_latency = LatencyHistogram()
+        self.batch_iterations: Counter = Counter()
+
+    def record(self, trace: SolveTrace) -> None:
+        with self._lock:
+            self.solves += 1
+            self.patterns[trace.pattern] += 1
+            self.statuses[trace.status] += 1
+            self.rules.update(trace.rules)
+            self.assumptions.update(trace.assumptions)
+            self.iterations[trace.iterations] += 1
+            self.phases.update(trace.phases)
+            self.latency.add(trace.elapsed)
+
+    def record_batch(self, trace) -> None:
+        patterns = {pattern: count for pattern, count in enumerate(trace.patterns.tolist()) if count}
+        statuses = {status: count for status, count in enumerate(trace.statuses.tolist()) if count}
+        with self._lock:
+            self.batches += 1
+            self.batch_rows += trace.rows
+            self.batch_seconds += trace.seconds
+            self.batch_latency.add(trace.seconds)
+            self.batch_iterations[trace.iterations] += 1
+            self.patterns.update(patterns)
+            self.statuses.update(statuses)
+
+    def merge(self, other: "SolverStats") -> None:
+        with self._lock:
+            self.solves += other.solves
+            self.patterns.update(other.patterns)
+            self.statuses.update(other.statuses)
+            self.rules.update(other.rules)
+            self.assumptions.update(other.assumptions)
+            self.iterations.update(other.iterations)
+            self.phases.update(other.phases)
+            self.latency.merge(other.latency)
+            self.batches += other.batches
+            self.batch_rows += other.batch_rows
+            self.batch_seconds += other.batch_seconds
+            self.batch_latency.merge(other.batch_latency)
+            self.batch_iterations.update(other.batch_iterations)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "solves": self.solves,
+                "patterns": {describe_pattern(pattern): count for pattern, count in self.patterns.most_common()},
+                "statuses": {describe_status(status): count for status, count in self.statuses.most_common()},
+                "rules": dict(self.rules.most_common()),
+                "assumptions": dict(self.assumptions.most_common()),
+                "iterations": {str(passes): count for passes, count in sorted(self.iterations.items())},
+                "phase_seconds": dict(self.phases),
+                "latency_seconds": self.latency.as_dict(),
+                "batches": {
+                    "count": self.batches,
+                    "rows": self.batch_rows,
+                    "seconds": self.batch_seconds,
+                    "rows_per_second": self.batch_rows / self.batch_seconds if self.batch_seconds else None,
+                    "latency_seconds": self.batch_latency.as_dict(),
+                    "iterations": {str(passes): count for passes, count in sorted(self.batch_iterations.items())},
+                },
+            }
+
+    def to_json(self, path: Optional[str] = None) -> str:
+        text = json.dumps(self.as_dict(), indent=2)
+        if path is not None:
+            with open(path, "w", encoding="utf-8") as handle:
+                handle.write(text + "\n")
+        return text
+
+
+class TraceLog:
+    def __init__(self, maxlen: int = 1000) -> None:
+        self.traces: Deque[SolveTrace] = deque(maxlen=maxlen)
+        self.batches: Deque[object] = deque(maxlen=maxlen)
+
+    def record(self, trace: SolveTrace) -> None:
+        self.traces.append(trace)
+
+    def record_batch(self, trace) -> None:
+        self.batches.append(trace)
+
+    def last(self) -> Optional[SolveTrace]:
+        return self.traces[-1] if self.traces else None
+
+
+class _Fanout:
+    def __init__(self, tracers: List[object]) -> None:
+        self.tracers = tracers
+
+    def record(self, trace: SolveTrace) -> None:
+        for tracer in self.tracers:
+            tracer.record(trace)
+
+    def record_batch(self, trace) -> None:
+        for tracer in self.tracers:
+            tracer.record_batch(trace)
+
+
+@contextmanager
+def tracing(*tracers) -> Iterator[object]:
+    tracer = tracers[0] if len(tracers) == 1 else _Fanout(list(tracers))
+    previous = set_tracer(tracer)
+    try:
+        yield tracer
+    finally:
+        set_tracer(previous)
@@ -0,0 +1,499 @@
+import argparse
+import json
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .batch import BatchResult, calculate_batch
+from .calculations import INPUT_FIELDS, STATUS_MESSAGES, QuoteInput, QuoteResult, set_journal
+
+# Layout, little-endian: a 64-byte header, then 128-byte frames. Every `index_every`
+# entry frames are followed by one index frame for that segment, so entry n sits at
+# frame n + n // index_every and any entry or segment is found by arithmetic alone.
+#   entry frame  kind, user bits, calc bits, status, created, 6 inputs, 7 outputs
+#   index frame  kind, segment number, entries, CRC-32 of the segment's entry frames,
+#                first and last created
+# Missing values are NaN. A torn frame at the end (from a crash mid-write) is cut off
+# when the journal is opened again.
+MAGIC = b"MCJOURN\x00"
+VERSION = 1
+FRAME_SIZE = 128
+DEFAULT_INDEX_EVERY = 4096
+DEFAULT_BUFFER_ENTRIES = 1024
+DEFAULT_FLUSH_SECONDS = 1.0
+
+ENTRY = 1
+INDEX = 2
+OUTPUT_FIELDS = ("cost", "net1", "added_value", "discount", "net2", "m_no", "m_with")
+
+_HEADER = struct.Struct("<8sHHId44x")
+_ENTRY = struct.Struct("<BBBB4xd6d7d8x")
+_INDEX = struct.Struct("<B3xIIIdd96x")
+_NAN = float("nan")
+# Frames packed per step by record_batch; 512 KiB stays in cache.
+_BLOCK_ROWS = 4096
+
+FRAME_DTYPE = np.dtype(
+    {
+        "names": ["kind", "user", "calc", "status", "created", "inputs", "outputs"],
+        "formats": ["u1", "u1", "u1", "u1", "<f8", ("<f8", (len(INPUT_FIELDS),)), ("<f8", (len(OUTPUT_FIELDS),))],
+        "offsets": [0, 1, 2, 3, 8, 16, 64],
+        "itemsize": FRAME_SIZE,
+    }
+)
+INDEX_DTYPE = np.dtype(
+    {
+        "names": ["kind", "segment", "entries", "crc", "first", "last"],
+        "formats": ["u1", "<u4", "<u4", "<u4", "<f8", "<f8"],
+        "offsets": [0, 4, 8, 12, 16, 24],
+        "itemsize": FRAME_SIZE,
+    }
+)
+
+
+def _read_header(path: Path, data: bytes) -> int:
+    if len(data) < _HEADER.size:
+        raise ValueError(f"{path} is not a calculation journal.")
+    magic, version, frame_size, index_every, _created = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a calculation journal.")
+    if version != VERSION or frame_size != FRAME_SIZE:
+        raise ValueError(f"{path} is journal version {version}; expected {VERSION}.")
+    return index_every
+
+
+class CalculationJournal:
+    # Append-only. Entries are packed into an in-memory buffer and written when it holds
+    # `buffer_entries`, when a record arrives `flush_seconds` after the oldest buffered
+    # one, and on flush() and close(). The file is only fsynced on flush when `fsync`
+    # is set. Safe to record from several threads.
+    def __init__(
+        self,
+        path,
+        index_every: int = DEFAULT_INDEX_EVERY,
+        buffer_entries: int = DEFAULT_BUFFER_ENTRIES,
+        flush_seconds: float = DEFAULT_FLUSH_SECONDS,
+        fsync: bool = False,
+    ) -> None:
+        if index_every < 1 or buffer_entries < 1:
+            raise ValueError("Index interval and buffer size must be at least 1.")
+        self.path = Path(path)
+        self.buffer_entries = buffer_entries
+        self.flush_seconds = flush_seconds
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._buffer = bytearray()
+        self._buffer_bytes = buffer_entries * FRAME_SIZE
+        self._buffered_since = 0.0
+        self._block = np.zeros(_BLOCK_ROWS, dtype=FRAME_DTYPE)
+        self._block["kind"] = ENTRY
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        size = self.path.stat().st_size if self.path.exists() else 0
+        if size == 0:
+            with open(self.path, "wb") as handle:
+                handle.write(_HEADER.pack(MAGIC, VERSION, FRAME_SIZE, index_every, time.time()))
+            size = _HEADER.size
+            self.index_every = index_every
+        else:
+            with open(self.path, "rb") as handle:
+                self.index_every = _read_header(self.path, handle.read(_HEADER.size))
+        frames, torn = divmod(size - _HEADER.size, FRAME_SIZE)
+        if torn:
+            os.truncate(self.path, _HEADER.size + frames * FRAME_SIZE)
+
+        # Carry on with the last, unindexed segment.
+        self._segment, self._segment_entries = divmod(frames, self.index_every + 1)
+        self._crc = 0
+        self._first = self._last = _NAN
+        if self._segment_entries:
+            with open(self.path, "rb") as handle:
+                handle.seek(_HEADER.size + (frames - self._segment_entries) * FRAME_SIZE)
+                data = handle.read(self._segment_entries * FRAME_SIZE)
+            created = np.frombuffer(data, dtype=FRAME_DTYPE)["created"]
+            self._crc = zlib.crc32(data)
+            self._first = float(created.min())
+            self._last = float(created.max())
+        self._file = open(self.path, "ab")
+
+    def __enter__(self) -> "CalculationJournal":
+        return self
+
+    def __exit__(self, *_exc) -> None:
+        self.close()
+
+    @property
+    def pending(self) -> int:
+        return len(self._buffer) // FRAME_SIZE
+
+    def record(self, quote: QuoteInput, result: QuoteResult, created: Optional[float] = None) -> None:
+        nan = _NAN
+        frame = _ENTRY.pack(
+            ENTRY,
+            quote.user,
+            result.calc,
+            result.status,
+            time.time() if created is None else created,
+            nan if quote.cost is None else quote.cost,
+            nan if quote.net1 is None else quote.net1,
+            nan if quote.added_value is None else quote.added_value,
+            nan if quote.discount is None else quote.discount,
+            nan if quote.net2 is None else quote.net2,
+            nan if quote.target_margin is None else quote.target_margin,
+            nan if result.cost is None else result.cost,
+            nan if result.net1 is None else result.net1,
+            nan if result.added_value is None else result.added_value,
+            nan if result.discount is None else result.discount,
+            nan if result.net2 is None else result.net2,
+            nan if result.m_no is None else result.m_no,
+            nan if result.m_with is None else result.m_with,
+        )
+        with self._lock:
+            if not self._buffer:
+                self._buffered_since = time.monotonic()
+            self._buffer += frame
+            if len(self._buffer) >= self._buffer_bytes or time.monotonic() - self._buffered_since >= self.flush_seconds:
+                self._write_buffer()
+
+    def record_batch(self, columns: Sequence, user, result: BatchResult, created: Optional[float] = None) -> None:
+        # Input columns as given to calculate_batch; the whole batch shares one timestamp.
+        # Frames are packed a cache-sized block at a time, which is several times faster
+        # than filling one frame array for the whole batch.
+        size = len(result)
+        stamp = time.time() if created is None else created
+        inputs = [np.asarray(column, dtype=np.float64) for column in columns]
+        user_bits = np.zeros(size, dtype=np.uint8) if user is None else np.broadcast_to(np.asarray(user, dtype=np.uint8), (size,))
+        outputs = [getattr(result, name) for name in OUTPUT_FIELDS]
+        with self._lock:
+            self._write_buffer()
+            for start in range(0, size, len(self._block)):
+                stop = min(start + len(self._block), size)
+                block = self._block[: stop - start]
+                block["user"] = user_bits[start:stop]
+                block["calc"] = result.calc[start:stop]
+                block["status"] = result.status[start:stop]
+                block["created"] = stamp
+                for index, column in enumerate(inputs):
+                    block["inputs"][:, index] = column[start:stop]
+                for index, column in enumerate(outputs):
+                    block["outputs"][:, index] = column[start:stop]
+                self._write(block.view(np.uint8), block["created"])
+
+    def _write_buffer(self) -> None:
+        if self._buffer:
+            frames = np.frombuffer(self._buffer, dtype=FRAME_DTYPE)
+            self._write(frames.view(np.uint8), frames["created"])
+            del frames
+            self._buffer = bytearray()
+
+    def _write(self, data: np.ndarray, created: np.ndarray) -> None:
+        # Splits at segment ends, so each full segment is followed by its index frame.
+        written = 0
+        while written < len(created):
+            count = min(self.index_every - self._segment_entries, len(created) - written)
+            piece = data[written * FRAME_SIZE:(written + count) * FRAME_SIZE]
+            self._file.write(piece)
+            self._crc = zlib.crc32(piece, self._crc)
+            times = created[written:written + count]
+            self._first = float(np.fmin(self._first, times.min()))
+            self._last = float(np.fmax(self._last, times.max()))
+            self._segment_entries += count
+            written += count
+            if self._segment_entries == self.index_every:
+                self._file.write(_INDEX.pack(INDEX, self._segment, self._segment_entries, self._crc, self._first, self._last))
+                self._segment += 1
+                self._segment_entries = 0
+                self._crc = 0
+                self._first = self._last = _NAN
+
+    def flush(self) -> None:
+        with self._lock:
+            self._write_buffer()
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+
+def journal_from_environment() -> Optional[CalculationJournal]:
+    # MARGIN_CALCULATOR_JOURNAL names the journal file; unset (or unusable) means none.
+    path = os.environ.get("MARGIN_CALCULATOR_JOURNAL")
+    if not path:
+        return None
+    try:
+        return CalculationJournal(path)
+    except (OSError, ValueError):
+        return None
+
+
+class JournalReader:
+    # Memory-maps the complete frames of a journal, which may still be written to.
+    def __init__(self, path) -> None:
+        self.path = Path(path)
+        with open(self.path, "rb") as handle:
+            self.index_every = _read_header(self.path, handle.read(_HEADER.size))
+        frames = (self.path.stat().st_size - _HEADER.size) // FRAME_SIZE
+        if frames:
+            self.frames = np.memmap(self.path, dtype=FRAME_DTYPE, mode="r", offset=_HEADER.size, shape=(frames,))
+        else:
+            self.frames = np.zeros(0, dtype=FRAME_DTYPE)
+        stride = self.index_every + 1
+        self.segments = frames // stride
+        self.entries = frames - self.segments
+        self.index = self.frames[self.index_every::stride].view(INDEX_DTYPE)[: self.segments]
+
+    def __len__(self) -> int:
+        return self.entries
+
+    def _segment_frames(self, segment: int) -> Tuple[int, int]:
+        start = segment * (self.index_every + 1)
+        return start, min(start + self.index_every, len(self.frames))
+
+    def verify(self, segment: int) -> bool:
+        # The last segment has no index frame yet and always passes.
+        if segment >= self.segments:
+            return True
+        start, stop = self._segment_frames(segment)
+        entry = self.index[segment]
+        return (
+            entry["kind"] == INDEX
+            and entry["segment"] == segment
+            and zlib.crc32(self.frames[start:stop].view(np.uint8)) == entry["crc"]
+        )
+
+    def read(self, start: int, stop: int) -> np.ndarray:
+        # Entries start..stop-1 by entry number.
+        stop = min(stop, self.entries)
+        if start >= stop:
+            return np.zeros(0, FRAME_DTYPE)
+        positions = np.arange(start, stop)
+        return self.frames[positions + positions // self.index_every]
+
+    def chunks(
+        self,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        chunk_entries: int = 1 << 20,
+        corrupt: Optional[List[int]] = None,
+    ) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        # (entry numbers, entry frames) in entry order, about `chunk_entries` at a time.
+        # Segments whose index puts them outside since..until are never read; segments
+        # that fail their CRC check are skipped and appended to `corrupt`.
+        last_segment = self.segments + (1 if self.entries > self.segments * self.index_every else 0)
+        wanted = np.ones(last_segment, dtype=bool)
+        if since is not None:
+            wanted[: self.segments] &= self.index["last"] >= since
+        if until is not None:
+            wanted[: self.segments] &= self.index["first"] < until
+        per_chunk = max(chunk_entries // self.index_every, 1)
+        segments = np.flatnonzero(wanted).tolist()
+        for position in range(0, len(segments), per_chunk):
+            numbers = []
+            frames = []
+            for segment in segments[position:position + per_chunk]:
+                if not self.verify(segment):
+                    if corrupt is not None:
+                        corrupt.append(segment)
+                    continue
+                start, stop = self._segment_frames(segment)
+                frames.append(self.frames[start:stop])
+                numbers.append(np.arange(stop - start) + segment * self.index_every)
+            if not frames:
+                continue
+            numbers = np.concatenate(numbers)
+            frames = np.concatenate(frames)
+            keep = frames["kind"] == ENTRY
+            if since is not None:
+                keep &= frames["created"] >= since
+            if until is not None:
+                keep &= frames["created"] < until
+            yield numbers[keep], frames[keep]
+
+
+@dataclass
+class ReplayDifference:
+    entry: int
+    created: float
+    inputs: Dict[str, Optional[float]]
+    user: int
+    # Field (or status / calc) to (journaled, replayed).
+    changes: Dict[str, Tuple[object, object]]
+
+
+@dataclass
+class ReplayReport:
+    entries: int = 0
+    changed: int = 0
+    seconds: float = 0.0
+    corrupt_segments: List[int] = field(default_factory=list)
+    field_changes: Dict[str, int] = field(default_factory=dict)
+    status_changes: Dict[str, int] = field(default_factory=dict)
+    samples: List[ReplayDifference] = field(default_factory=list)
+
+    def format(self) -> str:
+        rate = self.entries / self.seconds if self.seconds else 0.0
+        lines = [f"Replayed {self.entries:,} entries in {self.seconds:.1f}s ({rate:,.0f}/s): {self.changed:,} would differ"]
+        if self.corrupt_segments:
+            lines.append(f"Skipped {len(self.corrupt_segments)} corrupt segment(s): {self.corrupt_segments[:10]}")
+        for name, count in self.field_changes.items():
+            lines.append(f"  {name:<12}{count:>12,}")
+        for change, count in self.status_changes.items():
+            lines.append(f"  status {change}: {count:,}")
+        for sample in self.samples:
+            stamp = datetime.fromtimestamp(sample.created).isoformat(timespec="seconds")
+            inputs = ", ".join(f"{name}={value!r}" for name, value in sample.inputs.items() if value is not None)
+            changes = ", ".join(f"{name} {old!r} -> {new!r}" for name, (old, new) in sample.changes.items())
+            lines.append(f"  #{sample.entry} {stamp} [{inputs}] {changes}")
+        return "\n".join(lines)
+
+    def to_json(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump(asdict(self), handle, indent=2)
+
+
+def _optional(value: float) -> Optional[float]:
+    return None if value != value else value
+
+
+def _differs(old: np.ndarray, new: np.ndarray) -> np.ndarray:
+    return ~((old == new) | (np.isnan(old) & np.isnan(new)))
+
+
+def replay(
+    path,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    chunk_entries: int = 1 << 20,
+    samples: int = 20,
+) -> ReplayReport:
+    # Re-solves journaled inputs with the current calculate_batch and counts entries
+    # whose outputs, status or calc bits would now differ. The replay itself is not
+    # journaled.
+    report = ReplayReport()
+    reader = JournalReader(path)
+    started = time.perf_counter()
+    previous = set_journal(None)
+    try:
+        for numbers, frames in reader.chunks(since, until, chunk_entries, report.corrupt_segments):
+            inputs = frames["inputs"]
+            outputs = frames["outputs"]
+            result = calculate_batch(*(inputs[:, index] for index in range(len(INPUT_FIELDS))), user=frames["user"])
+            changed = np.zeros(len(frames), dtype=bool)
+            columns = {}
+            for index, name in enumerate(OUTPUT_FIELDS):
+                columns[name] = _differs(outputs[:, index], getattr(result, name))
+            columns["status"] = frames["status"] != result.status
+            columns["calc"] = frames["calc"] != result.calc
+            for name, differs in columns.items():
+                count = int(np.count_nonzero(differs))
+                if count:
+                    report.field_changes[name] = report.field_changes.get(name, 0) + count
+                changed |= differs
+            rows = np.flatnonzero(changed)
+            report.entries += len(frames)
+            report.changed += len(rows)
+
+            moved = rows[columns["status"][rows]]
+            pairs, counts = np.unique(
+                frames["status"][moved].astype(np.int64) * 256 + result.status[moved], return_counts=True
+            )
+            for pair, count in zip(pairs.tolist(), counts.tolist()):
+                old, new = STATUS_MESSAGES[pair // 256] or "OK", STATUS_MESSAGES[pair % 256] or "OK"
+                key = f"{old!r} -> {new!r}"
+                report.status_changes[key] = report.status_changes.get(key, 0) + count
+
+            for row in rows[: max(samples - len(report.samples), 0)].tolist():
+                changes: Dict[str, Tuple[object, object]] = {}
+                for index, name in enumerate(OUTPUT_FIELDS):
+                    if columns[name][row]:
+                        changes[name] = (_optional(float(outputs[row, index])), _optional(float(getattr(result, name)[row])))
+                for name in ("status", "calc"):
+                    if columns[name][row]:
+                        changes[name] = (int(frames[name][row]), int(getattr(result, name)[row]))
+                report.samples.append(
+                    ReplayDifference(
+                        int(numbers[row]),
+                        float(frames["created"][row]),
+                        {name: _optional(float(value)) for name, value in zip(INPUT_FIELDS, inputs[row].tolist())},
+                        int(frames["user"][row]),
+                        changes,
+                    )
+                )
+    finally:
+        set_journal(previous)
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def format_info(reader: JournalReader, verify: bool = False) -> str:
+    lines = [f"{reader.path}: {reader.entries:,} entries, {reader.segments:,} indexed segments of {reader.index_every:,}"]
+    if reader.segments:
+        first = datetime.fromtimestamp(float(reader.index["first"].min())).isoformat(timespec="seconds")
+        last = datetime.fromtimestamp(float(reader.index["last"].max())).isoformat(timespec="seconds")
+        lines.append(f"Indexed entries from {first} to {last}")
+    if verify:
+        corrupt = [segment for segment in range(reader.segments) if not reader.verify(segment)]
+        lines.append(f"{len(corrupt)} corrupt segment(s)" + (f": {corrupt[:10]}" if corrupt else ""))
+    return "\n".join(lines)
+
+
+def _timestamp(text: str) -> float:
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(text).timestamp()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected seconds since the epoch or an ISO date, got {text!r}.") from None
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Inspect and replay a calculation journal.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    info = commands.add_parser("info", help="Show entry count and time range.")
+    info.add_argument("journal")
+    info.add_argument("--verify", action="store_true", help="Check every segment's CRC.")
+
+    replay_parser = commands.add_parser("replay", help="Re-solve journaled inputs and report what would differ.")
+    replay_parser.add_argument("journal")
+    replay_parser.add_argument("--since", type=_timestamp, help="Only entries from this time (epoch seconds or ISO date).")
+    replay_parser.add_argument("--until", type=_timestamp, help="Only entries before this time.")
+    replay_parser.add_argument("--show", type=int, default=20, help="Differing entries to list (default: 20).")
+    replay_parser.add_argument("--report", metavar="FILE", help="Write the replay report as JSON.")
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        if args.command == "info":
+            sys.stdout.write(format_info(JournalReader(args.journal), args.verify) + "\n")
+            return 0
+        report = replay(args.journal, args.since, args.until, samples=args.show)
+    except (OSError, ValueError) as exc:
+        sys.stderr.write(f"Error: {exc}\n")
+        return 1
+    sys.stdout.write(report.format() + "\n")
+    if args.report:
+        report.to_json(args.report)
+    return 1 if report.changed or report.corrupt_segments else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from typing import List, Optional, Sequence, Tuple
+
+from .instrumentation import LatencyHistogram
+from .service import DEFAULT_HOST, DEFAULT_PORT, PricingService
+
+
+def sample_quote(rng: random.Random) -> dict:
+    cost = round(rng.uniform(10.0, 500.0), 2)
+    net1 = round(cost * rng.uniform(1.1, 2.5), 2)
+    values = {"cost": cost, "net1": net1}
+    if rng.random() < 0.5:
+        values["discount"] = round(rng.uniform(0.0, 40.0), 2)
+    else:
+        values["target_margin"] = round(rng.uniform(5.0, 60.0), 2)
+    if rng.random() < 0.3:
+        values["added_value"] = round(rng.uniform(0.0, 50.0), 2)
+    return {"values": values}
+
+
+async def _request(
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+    host: str,
+    path: str,
+    payload: Optional[dict],
+) -> Tuple[int, bytes]:
+    body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+    method = "GET" if payload is None else "POST"
+    writer.write(
+        (
+            f"{method} {path} HTTP/1.1\r\nHost: {host}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+        ).encode("latin-1")
+        + body
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+
+async def _client(
+    host: str,
+    port: int,
+    requests: int,
+    batch_size: int,
+    seed: int,
+    latency: LatencyHistogram,
+    failures: List[int],
+) -> None:
+    # One keep-alive connection sending its requests back to back.
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(requests):
+            if batch_size > 1:
+                path, payload = "/v1/batch", {"quotes": [sample_quote(rng) for _ in range(batch_size)]}
+            else:
+                path, payload = "/v1/quote", sample_quote(rng)
+            started = time.perf_counter()
+            status, _body = await _request(reader, writer, host, path, payload)
+            latency.add(time.perf_counter() - started)
+            if status != 200:
+                failures.append(status)
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+async def run_load(
+    host: str,
+    port: int,
+    connections: int = 16,
+    requests: int = 200,
+    batch_size: int = 1,
+) -> dict:
+    latency = LatencyHistogram()
+    failures: List[int] = []
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(_client(host, port, requests, batch_size, seed, latency, failures) for seed in range(connections))
+    )
+    seconds = time.perf_counter() - started
+    total = connections * requests
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        _status, body = await _request(reader, writer, host, "/metrics", None)
+    finally:
+        writer.close()
+        await writer.wait_closed()
+    return {
+        "connections": connections,
+        "requests": total,
+        "batch_size": batch_size,
+        "seconds": seconds,
+        "requests_per_second": total / seconds,
+        "quotes_per_second": total * batch_size / seconds,
+        "failures": len(failures),
+        "latency_seconds": latency.as_dict(),
+        "server": json.loads(body),
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load-test the pricing service on localhost.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"Service host (default: {DEFAULT_HOST}).")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Service port (default: {DEFAULT_PORT}).")
+    parser.add_argument("--connections", type=int, default=16, help="Concurrent keep-alive connections (default: 16).")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per connection (default: 200).")
+    parser.add_argument("--batch-size", type=int, default=1, help="Quotes per request; above 1 uses /v1/batch.")
+    parser.add_argument("--spawn", action="store_true", help="Start a service in this process on a free port.")
+    args = parser.parse_args(argv)
+
+    async def run() -> dict:
+        if not args.spawn:
+            return await run_load(args.host, args.port, args.connections, args.requests, args.batch_size)
+        service = PricingService(args.host, 0)
+        await service.start()
+        try:
+            return await run_load(args.host, service.port, args.connections, args.requests, args.batch_size)
+        finally:
+            await service.close()
+
+    report = asyncio.run(run())
+    latency = report["latency_seconds"]
+    sys.stdout.write(
+        f"{report['requests']} requests over {report['connections']} connections in {report['seconds']:.2f}s: "
+        f"{report['requests_per_second']:,.0f} req/s, {report['quotes_per_second']:,.0f} quotes/s, "
+        f"p50 {latency['p50'] * 1000:.2f}ms, p99 {latency['p99'] * 1000:.2f}ms, failures {report['failures']}\n"
+    )
+    return 1 if report["failures"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
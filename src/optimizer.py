@@ -0,0 +1,453 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass, fields
+from typing import Dict, List, Optional, Sequence, TextIO, Tuple
+
+import numpy as np
+
+from .batch import BatchResult, calculate_batch
+from .calculations import FIELD_BITS, INPUT_FIELDS, parse_float
+from .reprice import MARGIN_COLUMNS, OUTPUT_FIELDS, format_chunk, open_csv, parse_chunk, parse_mapping, resolve_columns
+from .thresholds import cost_ratio, percent_fraction
+
+# Expected demand at discount d (a fraction) is quantity * (1 + elasticity * d): an
+# elasticity of 1.5 sells 15% more at 10% off. Per line, with base = net1 + added value,
+#   revenue(d) = base * quantity * (1 - d) * (1 + elasticity * d)   expected Net2 revenue
+#   leakage(d) = base * quantity * d * (1 + elasticity * d)         discount given away
+# Revenue is concave and leakage convex in d, and margin on Net2 >= floor is the bound
+# d <= 1 - ratio / (1 - floor) (see thresholds.cost_ratio). Without a leakage cap each
+# line's best discount is the clipped vertex (e - 1) / 2e. With one, lines are solved
+# for revenue - m * leakage, whose maximizer has the closed form (e - 1 - m) / 2e(1 + m),
+# and the multiplier m is bisected until total leakage meets the cap. Every m also gives
+# an upper bound on the best revenue, so the plan reports how far from optimal it is.
+DEFAULT_ELASTICITY = 1.5
+DEFAULT_STEP = 0.01
+DEFAULT_TOLERANCE = 1e-9
+MAX_ITERATIONS = 200
+EXTRA_COLUMNS = ("quantity", "elasticity")
+
+
+@dataclass
+class DiscountPlan:
+    # Per line: discount and ceiling in percent, NaN for lines left out (no cost or
+    # net1, or net1 + added value not above 0). `result` is calculate_batch at the
+    # proposed discounts, so Net2 and margins are the calculator's own.
+    discount: np.ndarray
+    ceiling: np.ndarray
+    quantity: np.ndarray
+    revenue: np.ndarray
+    leakage: np.ndarray
+    result: BatchResult
+    floor: float
+    leakage_cap: Optional[float]
+    step: float
+    multiplier: float
+    bound: float
+    list_revenue: float
+    current_revenue: Optional[float]
+    iterations: int
+    seconds: float
+
+    def __len__(self) -> int:
+        return len(self.discount)
+
+    @property
+    def total_revenue(self) -> float:
+        return float(np.nansum(self.revenue))
+
+    @property
+    def total_leakage(self) -> float:
+        return float(np.nansum(self.leakage))
+
+    @property
+    def gap(self) -> float:
+        # Revenue still possibly left on the table, rounding of discounts included.
+        return max(self.bound - self.total_revenue, 0.0)
+
+    def summary(self) -> Dict[str, object]:
+        proposed = ~np.isnan(self.discount)
+        below = proposed & (self.ceiling < 0)
+        # Lines whose discount is held back by the floor (or maximum), short of it by
+        # no more than the rounding step.
+        with np.errstate(invalid="ignore"):
+            at_ceiling = proposed & ~below & (self.discount + self.step >= self.ceiling - 1e-9)
+        bound = self.bound
+        return {
+            "lines": len(self),
+            "proposed": int(proposed.sum()),
+            "left_out": int((~proposed).sum()),
+            "below_floor_at_list": int(below.sum()),
+            "at_floor": int(at_ceiling.sum()),
+            "mean_discount": round(float(self.discount[proposed].mean()), 4) if proposed.any() else None,
+            "floor": self.floor,
+            "leakage_cap": self.leakage_cap,
+            "revenue": round(self.total_revenue, 2),
+            "list_revenue": round(self.list_revenue, 2),
+            "current_revenue": None if self.current_revenue is None else round(self.current_revenue, 2),
+            "leakage": round(self.total_leakage, 2),
+            "multiplier": self.multiplier,
+            "bound": round(bound, 2),
+            "gap": round(self.gap, 2),
+            "relative_gap": self.gap / bound if bound > 0 else 0.0,
+            "iterations": self.iterations,
+            "seconds": round(self.seconds, 4),
+        }
+
+    def format(self) -> str:
+        info = self.summary()
+        lines = [
+            f"Optimized {info['proposed']:,} of {info['lines']:,} lines in {self.seconds:.3f}s "
+            f"({info['iterations']} multiplier steps)",
+            f"Expected revenue {info['revenue']:,.2f} (list price {info['list_revenue']:,.2f}"
+            + ("" if self.current_revenue is None else f", current discounts {info['current_revenue']:,.2f}")
+            + ")",
+            f"Upper bound {info['bound']:,.2f}: within {info['gap']:,.2f} ({info['relative_gap']:.2e}) of optimal",
+            f"Leakage {info['leakage']:,.2f}"
+            + ("" if self.leakage_cap is None else f" of a {self.leakage_cap:,.2f} cap (multiplier {self.multiplier:.6g})"),
+        ]
+        if info["proposed"]:
+            lines.append(
+                f"Mean discount {info['mean_discount']:.2f}%; {info['at_floor']:,} lines at the {self.floor:g}% floor"
+            )
+        if info["below_floor_at_list"]:
+            lines.append(f"{info['below_floor_at_list']:,} lines are below the floor even at list price; they get 0%")
+        if info["left_out"]:
+            lines.append(f"{info['left_out']:,} lines left out (missing cost or net1)")
+        return "\n".join(lines)
+
+    def to_json(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump(self.summary(), handle, indent=2)
+
+
+def _column(value, size: int, name: str) -> np.ndarray:
+    column = np.broadcast_to(np.asarray(value, dtype=np.float64), (size,))
+    if np.isnan(column).any() or (column < 0).any():
+        raise ValueError(f"{name} must be a number of at least 0 for every line.")
+    return column
+
+
+def _maximizers(elasticity: np.ndarray, ceiling: np.ndarray, multiplier: float) -> np.ndarray:
+    # Discount maximizing revenue - multiplier * leakage per line; elasticity 0 gives
+    # -inf, which clips to 0.
+    with np.errstate(divide="ignore", invalid="ignore"):
+        discount = (elasticity - 1.0 - multiplier) / (2.0 * elasticity * (1.0 + multiplier))
+    return np.clip(discount, 0.0, ceiling)
+
+
+def _totals(weight: np.ndarray, elasticity: np.ndarray, discount: np.ndarray) -> Tuple[float, float]:
+    demand = weight * (1.0 + elasticity * discount)
+    return float(np.dot(demand, 1.0 - discount)), float(np.dot(demand, discount))
+
+
+def _solve(
+    weight: np.ndarray,
+    elasticity: np.ndarray,
+    ceiling: np.ndarray,
+    leakage_cap: Optional[float],
+    tolerance: float,
+) -> Tuple[np.ndarray, float, float, int]:
+    # Returns discounts (fractions), the multiplier, an upper bound on revenue and the
+    # number of bisection steps.
+    discount = _maximizers(elasticity, ceiling, 0.0)
+    revenue, leakage = _totals(weight, elasticity, discount)
+    if leakage_cap is None or leakage <= leakage_cap:
+        return discount, 0.0, revenue, 0
+    # At multiplier max(e) - 1 every line is at 0%, which meets any cap.
+    low, high = 0.0, max(float(elasticity.max()) - 1.0, 0.0)
+    best = np.zeros_like(discount)
+    best_revenue = float(weight.sum())
+    bound = revenue
+    iterations = 0
+    while iterations < MAX_ITERATIONS and bound - best_revenue > tolerance * bound:
+        iterations += 1
+        middle = (low + high) / 2.0
+        if not low < middle < high:
+            break
+        discount = _maximizers(elasticity, ceiling, middle)
+        revenue, leakage = _totals(weight, elasticity, discount)
+        bound = min(bound, revenue - middle * (leakage - leakage_cap))
+        if leakage > leakage_cap:
+            low = middle
+        else:
+            high = middle
+            best, best_revenue = discount, revenue
+    return best, high, bound, iterations
+
+
+def optimize_discounts(
+    cost,
+    net1,
+    added_value=None,
+    *,
+    floor: float = 25.0,
+    elasticity=DEFAULT_ELASTICITY,
+    quantity=1.0,
+    leakage_cap: Optional[float] = None,
+    max_discount=100.0,
+    current=None,
+    step: float = DEFAULT_STEP,
+    tolerance: float = DEFAULT_TOLERANCE,
+) -> DiscountPlan:
+    # Proposes the discount (percent) per line that maximizes total expected Net2 revenue
+    # with every line's margin on Net2 at or above `floor` percent and, if given, total
+    # leakage at most `leakage_cap`. Discounts are rounded down to `step` percent, so the
+    # floor and cap still hold. `current` discounts, if given, are valued for comparison.
+    started = time.perf_counter()
+    cost = np.asarray(cost, dtype=np.float64)
+    size = len(cost)
+    net1 = np.asarray(net1, dtype=np.float64)
+    added_value = np.full(size, np.nan) if added_value is None else np.asarray(added_value, dtype=np.float64)
+    if cost.ndim != 1 or net1.shape != (size,) or added_value.shape != (size,):
+        raise ValueError(f"Cost, net1 and added value must be one-dimensional with {size} rows.")
+    keep = 1.0 - percent_fraction(floor, "Margin floor")
+    elasticity = _column(elasticity, size, "Elasticity")
+    quantity = _column(quantity, size, "Quantity")
+    limit = _column(max_discount, size, "Maximum discount")
+    if leakage_cap is not None and not leakage_cap >= 0:
+        raise ValueError("Leakage cap must be at least 0.")
+    if step < 0:
+        raise ValueError("Discount step must be at least 0.")
+
+    base = net1 + np.nan_to_num(added_value, nan=0.0)
+    ratio = cost_ratio(cost, net1, added_value)
+    included = ~np.isnan(ratio) & (base > 0)
+    ceiling = np.full(size, np.nan)
+    ceiling[included] = np.minimum(1.0 - ratio[included] / keep, np.minimum(limit[included], 100.0) / 100.0)
+    rows = np.flatnonzero(included)
+    weight = base[rows] * quantity[rows]
+    line_elasticity = elasticity[rows]
+    # Lines under the floor even at list price cannot be helped; they stay at 0%.
+    line_ceiling = np.maximum(ceiling[rows], 0.0)
+
+    solved, multiplier, bound, iterations = _solve(weight, line_elasticity, line_ceiling, leakage_cap, tolerance)
+    discount = np.full(size, np.nan)
+    if step > 0:
+        discount[rows] = np.floor(solved * 100.0 / step + 1e-9) * step
+    else:
+        discount[rows] = solved * 100.0
+    result = _check_floor(cost, net1, added_value, discount, rows, ceiling, floor, step)
+
+    fraction = discount / 100.0
+    demand = quantity * (1.0 + elasticity * fraction)
+    current_revenue = None
+    if current is not None:
+        spent = np.nan_to_num(np.broadcast_to(np.asarray(current, dtype=np.float64), (size,)), nan=0.0)[rows] / 100.0
+        current_revenue = float(np.dot(weight * (1.0 + line_elasticity * spent), 1.0 - spent))
+    return DiscountPlan(
+        discount=discount,
+        ceiling=ceiling * 100.0,
+        quantity=demand,
+        revenue=base * demand * (1.0 - fraction),
+        leakage=base * demand * fraction,
+        result=result,
+        floor=floor,
+        leakage_cap=leakage_cap,
+        step=step,
+        multiplier=multiplier,
+        bound=bound,
+        list_revenue=float(weight.sum()),
+        current_revenue=current_revenue,
+        iterations=iterations,
+        seconds=time.perf_counter() - started,
+    )
+
+
+def _solve_lines(cost, net1, added_value, discount) -> BatchResult:
+    user = FIELD_BITS["cost"] | FIELD_BITS["net1"] | FIELD_BITS["discount"]
+    user = np.where(np.isnan(added_value), user, user | FIELD_BITS["added_value"]).astype(np.uint8)
+    missing = np.full(len(cost), np.nan)
+    return calculate_batch(cost, net1, added_value, discount, missing, missing, user=user)
+
+
+def _check_floor(cost, net1, added_value, discount, rows, ceiling, floor, step) -> BatchResult:
+    # Solves the proposals through the calculator. A discount computed right at its
+    # ceiling can come out a rounding error under the floor; those step down once more.
+    result = _solve_lines(cost, net1, added_value, discount)
+    feasible = np.zeros(len(cost), dtype=bool)
+    feasible[rows] = ceiling[rows] >= 0
+    for _ in range(3):
+        with np.errstate(invalid="ignore"):
+            low = np.flatnonzero(feasible & (discount > 0) & ~(result.m_with >= floor))
+        if not len(low):
+            break
+        discount[low] = np.maximum(discount[low] - max(step, 1e-9), 0.0)
+        resolved = _solve_lines(cost[low], net1[low], added_value[low], discount[low])
+        for item in fields(BatchResult):
+            getattr(result, item.name)[low] = getattr(resolved, item.name)
+    return result
+
+
+def _extra_columns(rows: List[List[str]], indexes: Dict[str, Optional[int]], defaults: Dict[str, float]) -> Dict[str, np.ndarray]:
+    # Quantity and elasticity per line; empty or unreadable cells take the default.
+    columns = {}
+    for name, index in indexes.items():
+        column = np.full(len(rows), defaults[name])
+        if index is not None:
+            for row_index, row in enumerate(rows):
+                try:
+                    value = parse_float(row[index]) if index < len(row) else None
+                except ValueError:
+                    continue
+                if value is not None:
+                    column[row_index] = value
+        columns[name] = column
+    return columns
+
+
+def optimize_csv(
+    source: TextIO,
+    target: TextIO,
+    mapping: Dict[str, str],
+    *,
+    delimiter: str = ",",
+    decimal_comma: bool = False,
+    elasticity: float = DEFAULT_ELASTICITY,
+    **options,
+) -> DiscountPlan:
+    # The whole catalog is optimized at once, since the leakage cap couples all lines.
+    # Output is written like reprice.py's: the proposed discount as entered, Net2 and
+    # the margins solved from it; a target margin column is left as it was.
+    reader = csv.reader(source, delimiter=delimiter)
+    header = next(reader, None)
+    if header is None:
+        raise ValueError("Input CSV is empty.")
+    rows = list(reader)
+    columns = resolve_columns(header, mapping)
+    if columns["cost"] is None or columns["net1"] is None:
+        raise ValueError("The catalog needs cost and net1 columns.")
+    chunk = parse_chunk(
+        rows,
+        [columns[name] for name in INPUT_FIELDS],
+        FIELD_BITS["cost"] | FIELD_BITS["net1"] | FIELD_BITS["added_value"],
+    )
+    extras = _extra_columns(
+        rows,
+        resolve_columns(header, {name: name for name in EXTRA_COLUMNS}),
+        {"quantity": 1.0, "elasticity": elasticity},
+    )
+    cost, net1, added_value, current = chunk.columns[:4]
+    plan = optimize_discounts(
+        cost,
+        net1,
+        added_value,
+        elasticity=extras["elasticity"],
+        quantity=extras["quantity"],
+        current=current,
+        **options,
+    )
+
+    chunk.columns[3] = plan.discount
+    chunk.user = chunk.user | np.where(np.isnan(plan.discount), 0, FIELD_BITS["discount"]).astype(np.uint8)
+    columns.update(resolve_columns(header, {name: name for name in MARGIN_COLUMNS}))
+    names = OUTPUT_FIELDS + MARGIN_COLUMNS
+    output_indexes = [columns[name] for name in names]
+    writer = csv.writer(target, delimiter=delimiter, lineterminator="\n")
+    writer.writerow(list(header) + [name for name, index in zip(names, output_indexes) if index is None])
+    writer.writerows(format_chunk(chunk, plan.result, output_indexes, decimal_comma))
+    return plan
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Propose per-line discounts that maximize expected Net2 revenue under a margin floor."
+    )
+    parser.add_argument("input", help="Catalog CSV with cost, net1 and optionally added_value, quantity, elasticity.")
+    parser.add_argument("output", help="CSV with the proposed discounts, Net2 and margins, or - for stdout.")
+    parser.add_argument(
+        "--map",
+        action="append",
+        default=[],
+        metavar="FIELD=COLUMN",
+        help=f"Map a calculator field to a CSV column. Fields: {', '.join(INPUT_FIELDS)}.",
+    )
+    parser.add_argument("--delimiter", default=",", help="CSV delimiter (default: ',').")
+    parser.add_argument("--encoding", default="utf-8-sig", help="File encoding (default: utf-8-sig).")
+    parser.add_argument("--decimal-comma", action="store_true", help="Write decimals with a comma.")
+    parser.add_argument("--floor", type=float, default=25.0, metavar="PCT", help="Minimum margin on Net2 per line (default: 25).")
+    parser.add_argument("--leakage-cap", type=float, metavar="AMOUNT", help="Maximum total discount given away.")
+    parser.add_argument(
+        "--max-discount",
+        type=float,
+        default=100.0,
+        metavar="PCT",
+        help="Never propose more than this discount (default: 100).",
+    )
+    parser.add_argument(
+        "--elasticity",
+        type=float,
+        default=DEFAULT_ELASTICITY,
+        help=f"Demand uplift per unit of discount for lines without an elasticity column (default: {DEFAULT_ELASTICITY}).",
+    )
+    parser.add_argument(
+        "--step",
+        type=float,
+        default=DEFAULT_STEP,
+        metavar="PCT",
+        help=f"Round proposals down to this step (default: {DEFAULT_STEP}; 0 keeps them exact).",
+    )
+    parser.add_argument("--report", metavar="FILE", help="Write the runtime and quality summary as JSON.")
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        mapping = parse_mapping(args.map)
+        percent_fraction(args.floor, "Margin floor")
+    except ValueError as exc:
+        parser.error(str(exc))
+    if not args.max_discount >= 0:
+        parser.error("--max-discount must be at least 0.")
+    if args.leakage_cap is not None and not args.leakage_cap >= 0:
+        parser.error("--leakage-cap must be at least 0.")
+    if not args.elasticity >= 0:
+        parser.error("--elasticity must be at least 0.")
+    if not args.step >= 0:
+        parser.error("--step must be at least 0.")
+
+    # The plan is written next to the output and moved over it once complete, so a
+    # catalog that fails to parse or solve leaves an existing output as it was.
+    scratch = None if args.output == "-" else args.output + ".tmp"
+    source = target = None
+    try:
+        source = open_csv(args.input, "r", args.encoding)
+        target = open_csv(scratch or "-", "w", args.encoding if scratch else "utf-8")
+        plan = optimize_csv(
+            source,
+            target,
+            mapping,
+            delimiter=args.delimiter,
+            decimal_comma=args.decimal_comma,
+            floor=args.floor,
+            elasticity=args.elasticity,
+            leakage_cap=args.leakage_cap,
+            max_discount=args.max_discount,
+            step=args.step,
+        )
+        if scratch is not None:
+            target.close()
+            os.replace(scratch, args.output)
+    except (OSError, ValueError) as exc:
+        sys.stderr.write(f"Error: {exc}\n")
+        return 1
+    finally:
+        if source is not None and source is not sys.stdin:
+            source.close()
+        if target is not None and target is not sys.stdout:
+            target.close()
+        if scratch is not None and os.path.exists(scratch):
+            os.remove(scratch)
+    sys.stderr.write(plan.format() + "\n")
+    if args.report:
+        plan.to_json(args.report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,222 @@
+import argparse
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing.shared_memory import SharedMemory
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from .batch import BatchResult, calculate_batch
+from .calculations import INPUT_FIELDS, detach_hooks, get_journal
+
+# Shared float block rows: the six inputs, then the five solved fields, m_no and m_with.
+# Shared byte block rows: user bits, status, calc bits.
+_FLOAT_ROWS = len(INPUT_FIELDS) + 7
+_BYTE_ROWS = 3
+_MIN_CHUNK = 10_000
+
+
+def _solve_slice(float_name: str, byte_name: str, size: int, start: int, stop: int) -> int:
+    floats_block = SharedMemory(name=float_name)
+    bytes_block = SharedMemory(name=byte_name)
+    try:
+        floats = np.ndarray((_FLOAT_ROWS, size), dtype=np.float64, buffer=floats_block.buf)
+        flags = np.ndarray((_BYTE_ROWS, size), dtype=np.uint8, buffer=bytes_block.buf)
+        result = calculate_batch(*floats[:6, start:stop], user=flags[0, start:stop])
+        floats[6, start:stop] = result.cost
+        floats[7, start:stop] = result.net1
+        floats[8, start:stop] = result.added_value
+        floats[9, start:stop] = result.discount
+        floats[10, start:stop] = result.net2
+        floats[11, start:stop] = result.m_no
+        floats[12, start:stop] = result.m_with
+        flags[1, start:stop] = result.status
+        flags[2, start:stop] = result.calc
+        del floats, flags
+    finally:
+        floats_block.close()
+        bytes_block.close()
+    return stop - start
+
+
+def default_workers() -> int:
+    return os.cpu_count() or 1
+
+
+class ParallelSolver:
+    def __init__(self, workers: Optional[int] = None, chunk_size: Optional[int] = None) -> None:
+        self.workers = workers or default_workers()
+        if self.workers < 1:
+            raise ValueError("Workers must be at least 1.")
+        if chunk_size is not None and chunk_size < 1:
+            raise ValueError("Chunk size must be at least 1.")
+        self.chunk_size = chunk_size
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def __enter__(self) -> "ParallelSolver":
+        return self
+
+    def __exit__(self, *_exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _chunk_size(self, size: int) -> int:
+        if self.chunk_size is not None:
+            return self.chunk_size
+        # A few chunks per worker keeps them busy when chunk cost is uneven.
+        return max(_MIN_CHUNK, math.ceil(size / (self.workers * 4)))
+
+    def solve(self, cost, net1, added_value, discount, net2, target_margin, user=None) -> BatchResult:
+        columns = [np.asarray(column, dtype=np.float64) for column in (cost, net1, added_value, discount, net2, target_margin)]
+        size = len(columns[0])
+        if self.workers == 1 or size <= self._chunk_size(size):
+            return calculate_batch(*columns, user=user)
+
+        floats_block = SharedMemory(create=True, size=max(1, _FLOAT_ROWS * size * 8))
+        bytes_block = SharedMemory(create=True, size=max(1, _BYTE_ROWS * size))
+        try:
+            floats = np.ndarray((_FLOAT_ROWS, size), dtype=np.float64, buffer=floats_block.buf)
+            flags = np.ndarray((_BYTE_ROWS, size), dtype=np.uint8, buffer=bytes_block.buf)
+            for row, column in enumerate(columns):
+                if column.shape != (size,):
+                    raise ValueError(f"Column '{INPUT_FIELDS[row]}' must have shape ({size},).")
+                floats[row] = column
+            flags[0] = 0 if user is None else user
+
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=detach_hooks)
+            step = self._chunk_size(size)
+            futures = [
+                self._executor.submit(_solve_slice, floats_block.name, bytes_block.name, size, start, min(start + step, size))
+                for start in range(0, size, step)
+            ]
+            for future in futures:
+                future.result()
+
+            result = BatchResult(
+                *(floats[row].copy() for row in range(6, 11)),
+                target_margin=columns[5].copy(),
+                m_no=floats[11].copy(),
+                m_with=floats[12].copy(),
+                status=flags[1].copy(),
+                calc=flags[2].copy(),
+            )
+            del floats, flags
+        finally:
+            floats_block.close()
+            floats_block.unlink()
+            bytes_block.close()
+            bytes_block.unlink()
+        # Workers run without the journal (see detach_hooks), so the batch is recorded
+        # once, here in the parent.
+        journal = get_journal()
+        if journal is not None:
+            journal.record_batch(columns, user, result)
+        return result
+
+
+def calculate_batch_parallel(
+    cost,
+    net1,
+    added_value,
+    discount,
+    net2,
+    target_margin,
+    user=None,
+    workers: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+) -> BatchResult:
+    with ParallelSolver(workers, chunk_size) as solver:
+        return solver.solve(cost, net1, added_value, discount, net2, target_margin, user=user)
+
+
+@dataclass
+class ScalingPoint:
+    workers: int
+    seconds: float
+    rows_per_second: float
+    speedup: float
+    efficiency: float
+
+
+def sample_columns(size: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    cost = rng.uniform(10.0, 500.0, size)
+    net1 = cost * rng.uniform(1.1, 2.5, size)
+    added_value = np.where(rng.random(size) < 0.3, rng.uniform(0.0, 50.0, size), np.nan)
+    discount = np.where(rng.random(size) < 0.5, rng.uniform(0.0, 40.0, size), np.nan)
+    net2 = np.full(size, np.nan)
+    target_margin = np.where(np.isnan(discount), rng.uniform(5.0, 60.0, size), np.nan)
+    user = np.full(size, 0b100011, dtype=np.uint8)
+    return (cost, net1, added_value, discount, net2, target_margin), user
+
+
+def _best_time(run, repeats: int) -> float:
+    best = math.inf
+    for _ in range(repeats):
+        started = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def measure_scaling(
+    columns: Sequence[np.ndarray],
+    user: Optional[np.ndarray],
+    worker_counts: Sequence[int],
+    chunk_size: Optional[int] = None,
+    repeats: int = 3,
+) -> List[ScalingPoint]:
+    size = len(columns[0])
+    baseline = _best_time(lambda: calculate_batch(*columns, user=user), repeats)
+    points = [ScalingPoint(0, baseline, size / baseline, 1.0, 1.0)]
+    for workers in worker_counts:
+        with ParallelSolver(workers, chunk_size) as solver:
+            solver.solve(*(column[:_MIN_CHUNK * workers + 1] for column in columns), user=None)
+            seconds = _best_time(lambda: solver.solve(*columns, user=user), repeats)
+        speedup = baseline / seconds
+        points.append(ScalingPoint(workers, seconds, size / seconds, speedup, speedup / workers))
+    return points
+
+
+def format_scaling(points: Sequence[ScalingPoint]) -> str:
+    lines = [f"{'workers':>8} {'seconds':>9} {'rows/s':>14} {'speedup':>8} {'efficiency':>10}"]
+    for point in points:
+        label = "serial" if point.workers == 0 else str(point.workers)
+        lines.append(
+            f"{label:>8} {point.seconds:>9.3f} {point.rows_per_second:>14,.0f} "
+            f"{point.speedup:>8.2f} {point.efficiency:>10.0%}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure multi-core scaling of the batch solver.")
+    parser.add_argument("--rows", type=int, default=2_000_000, help="Synthetic rows per run (default: 2000000).")
+    parser.add_argument("--workers", type=int, nargs="+", help="Worker counts to try (default: 1, 2, 4, ... cpu count).")
+    parser.add_argument("--chunk-size", type=int, help="Rows per task (default: automatic).")
+    parser.add_argument("--repeats", type=int, default=3, help="Best-of repeats per point (default: 3).")
+    args = parser.parse_args(argv)
+
+    worker_counts = args.workers
+    if not worker_counts:
+        worker_counts = [1]
+        while worker_counts[-1] * 2 <= default_workers():
+            worker_counts.append(worker_counts[-1] * 2)
+
+    columns, user = sample_columns(args.rows)
+    points = measure_scaling(columns, user, worker_counts, args.chunk_size, args.repeats)
+    sys.stdout.write(format_scaling(points) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
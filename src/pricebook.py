@@ -0,0 +1,488 @@
+import argparse
+import csv
+import os
+import struct
+import sys
+import tempfile
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Dict, Optional, Sequence, TextIO, Tuple
+
+import numpy as np
+
+from .batch import BatchResult, calculate_batch
+from .cache import CalculationCache
+from .calculations import FIELD_BITS, INPUT_FIELDS, STATUS_OK, parse_float
+from .instrumentation import SolverStats, tracing
+from .reprice import Progress, parse_mapping, read_chunks, resolve_columns
+
+# Layout, little-endian:
+#   header     magic, version, column count, row count
+#   directory  per column: name, dtype, data offset, mask offset (0 when unmasked)
+#   data       one contiguous array per column (and per mask), each on a 64-byte boundary
+# Masked columns hold NaN where a cell is empty, so they go to calculate_batch as they
+# are; the mask keeps one bit per row (set when present, little bit order).
+MAGIC = b"MCPBOOK\x00"
+VERSION = 1
+_HEADER = struct.Struct("<8sHHQ")
+_ENTRY = struct.Struct("<24s4sQQ")
+_ALIGN = 64
+
+BOOK_SCHEMA = tuple((name, "<f8", True) for name in INPUT_FIELDS) + (("user", "|u1", False),)
+RESULT_FIELDS = ("cost", "net1", "added_value", "discount", "net2", "target_margin", "m_no", "m_with")
+RESULT_SCHEMA = tuple((name, "<f8", True) for name in RESULT_FIELDS) + (("status", "|u1", False), ("calc", "|u1", False))
+
+# Rows copied or solved per step; a multiple of 8 so every step starts on a mask byte.
+DEFAULT_CHUNK_ROWS = 1 << 20
+
+_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // _ALIGN) * _ALIGN
+
+
+def sidecar_path(path) -> Path:
+    path = Path(path)
+    return path.with_name(f"{path.stem}.results{path.suffix or '.pricebook'}")
+
+
+class PriceBook:
+    def __init__(self, path, mode: str = "r") -> None:
+        if mode not in ("r", "r+"):
+            raise ValueError("Price books open with mode 'r' or 'r+'.")
+        self.path = Path(path)
+        self._map = np.memmap(self.path, dtype=np.uint8, mode=mode)
+        if len(self._map) < _HEADER.size:
+            raise ValueError(f"{self.path} is not a price book.")
+        magic, version, count, rows = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a price book.")
+        if version != VERSION:
+            raise ValueError(f"{self.path} is price book version {version}; expected {VERSION}.")
+
+        self.rows = rows
+        self._columns: Dict[str, np.ndarray] = {}
+        self._masks: Dict[str, np.ndarray] = {}
+        for index in range(count):
+            raw_name, raw_dtype, data_offset, mask_offset = _ENTRY.unpack_from(
+                self._map, _HEADER.size + index * _ENTRY.size
+            )
+            name = raw_name.rstrip(b"\0").decode("utf-8")
+            dtype = np.dtype(raw_dtype.rstrip(b"\0").decode("ascii"))
+            end = max(data_offset + rows * dtype.itemsize, mask_offset + (rows + 7) // 8)
+            if end > len(self._map):
+                raise ValueError(f"{self.path} is truncated (column '{name}').")
+            self._columns[name] = np.ndarray((rows,), dtype=dtype, buffer=self._map, offset=data_offset)
+            if mask_offset:
+                self._masks[name] = np.ndarray(((rows + 7) // 8,), dtype=np.uint8, buffer=self._map, offset=mask_offset)
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __enter__(self) -> "PriceBook":
+        return self
+
+    def __exit__(self, *_exc) -> None:
+        self.close()
+
+    @property
+    def names(self) -> Tuple[str, ...]:
+        return tuple(self._columns)
+
+    def column(self, name: str) -> np.ndarray:
+        # A view into the mapped file; nothing is read until the rows are touched.
+        try:
+            return self._columns[name]
+        except KeyError:
+            raise ValueError(f"No column '{name}' in {self.path}.") from None
+
+    def present(self, name: str, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        stop = self.rows if stop is None else min(stop, self.rows)
+        mask = self._masks.get(name)
+        if mask is None:
+            self.column(name)
+            return np.ones(max(0, stop - start), dtype=bool)
+        bits = np.unpackbits(mask[start // 8:-(-stop // 8)], bitorder="little")
+        return bits[start % 8:start % 8 + stop - start].astype(bool)
+
+    def null_count(self, name: str) -> int:
+        mask = self._masks.get(name)
+        if mask is None:
+            self.column(name)
+            return 0
+        present = 0
+        for start in range(0, len(mask), DEFAULT_CHUNK_ROWS):
+            present += int(_POPCOUNT[mask[start:start + DEFAULT_CHUNK_ROWS]].sum(dtype=np.int64))
+        return self.rows - present
+
+    def write(self, name: str, start: int, values) -> None:
+        # Masked columns take NaN for empty cells; `start` must be a multiple of 8.
+        if start % 8:
+            raise ValueError("Writes must start on a multiple of 8 rows.")
+        column = self.column(name)
+        values = np.asarray(values, dtype=column.dtype)
+        stop = start + len(values)
+        if stop > self.rows:
+            raise ValueError(f"Write to '{name}' ends at row {stop}, past {self.rows} rows.")
+        column[start:stop] = values
+        mask = self._masks.get(name)
+        if mask is not None:
+            packed = np.packbits(~np.isnan(values), bitorder="little")
+            mask[start // 8:start // 8 + len(packed)] = packed
+
+    def flush(self) -> None:
+        if self._map is not None and self._map.mode == "r+":
+            self._map.flush()
+
+    def close(self) -> None:
+        self.flush()
+        self._columns.clear()
+        self._masks.clear()
+        self._map = None
+
+
+def create_book(path, rows: int, schema=BOOK_SCHEMA) -> PriceBook:
+    # The file is sized up front and left sparse; callers fill every row with write().
+    entries = []
+    offset = _aligned(_HEADER.size + len(schema) * _ENTRY.size)
+    for name, dtype, masked in schema:
+        encoded = name.encode("utf-8")
+        if len(encoded) > _ENTRY.size - 20:
+            raise ValueError(f"Column name '{name}' is too long.")
+        data_offset = offset
+        offset = _aligned(offset + rows * np.dtype(dtype).itemsize)
+        mask_offset = 0
+        if masked:
+            mask_offset = offset
+            offset = _aligned(offset + (rows + 7) // 8)
+        entries.append(_ENTRY.pack(encoded, dtype.encode("ascii"), data_offset, mask_offset))
+
+    with open(path, "wb") as handle:
+        handle.write(_HEADER.pack(MAGIC, VERSION, len(schema), rows))
+        handle.write(b"".join(entries))
+        handle.truncate(offset)
+    return PriceBook(path, "r+")
+
+
+def _partial(target: Path) -> Path:
+    return target.with_name(f"{target.name}.{os.getpid()}.tmp")
+
+
+def _discard(book: PriceBook, partial: Path) -> None:
+    # Closed first: an open mapping keeps Windows from removing the file.
+    book.close()
+    partial.unlink(missing_ok=True)
+
+
+def write_book(path, columns: Dict[str, Sequence[float]], user=None) -> int:
+    # `columns` maps INPUT_FIELDS names to values (NaN for empty); absent fields are empty.
+    unknown = set(columns) - set(INPUT_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown field: {sorted(unknown)[0]}")
+    arrays = {name: np.asarray(values, dtype=np.float64) for name, values in columns.items()}
+    sizes = {len(values) for values in arrays.values()}
+    if len(sizes) > 1:
+        raise ValueError("All columns must have the same number of rows.")
+    rows = sizes.pop() if sizes else 0
+    user_bits = np.zeros(rows, dtype=np.uint8) if user is None else np.asarray(user, dtype=np.uint8)
+    if user_bits.shape != (rows,):
+        raise ValueError(f"User mask must have shape ({rows},).")
+
+    target = Path(path)
+    partial = _partial(target)
+    book = create_book(partial, rows)
+    try:
+        for name in INPUT_FIELDS:
+            book.write(name, 0, arrays.get(name, np.full(rows, np.nan)))
+        book.write("user", 0, user_bits)
+    except BaseException:
+        _discard(book, partial)
+        raise
+    book.close()
+    os.replace(partial, target)
+    return rows
+
+
+def convert_csv(
+    source: TextIO,
+    target,
+    mapping: Dict[str, str],
+    *,
+    delimiter: str = ",",
+    chunk_size: int = 50_000,
+    recalc: Sequence[str] = (),
+    progress: Optional[Progress] = None,
+) -> int:
+    # Columns are spilled to scratch files while the CSV streams in (the row count is
+    # only known at the end), then copied into the book. An unreadable cell stops the
+    # conversion, since the book has no way to tell it from an empty one.
+    reader = csv.reader(source, delimiter=delimiter)
+    header = next(reader, None)
+    if header is None:
+        raise ValueError("Input CSV is empty.")
+    columns = resolve_columns(header, mapping)
+    indexes = [columns[name] for name in INPUT_FIELDS]
+    user_fields = 0
+    for name in INPUT_FIELDS:
+        if name not in recalc:
+            user_fields |= FIELD_BITS[name]
+
+    target = Path(target)
+    names = INPUT_FIELDS + ("user",)
+    rows = 0
+    with tempfile.TemporaryDirectory(dir=target.parent) as scratch:
+        spills = [Path(scratch) / name for name in names]
+        handles = [open(spill, "wb") for spill in spills]
+        try:
+            for chunk in read_chunks(reader, indexes, chunk_size, user_fields):
+                if chunk.errors:
+                    row_index = min(chunk.errors)
+                    column = _bad_column(chunk.rows[row_index], indexes)
+                    where = f"Row {rows + row_index + 1}" + ("" if column is None else f", column {header[column]!r}")
+                    raise ValueError(f"{where}: {chunk.errors[row_index]}")
+                for handle, values in zip(handles, chunk.columns + [chunk.user]):
+                    handle.write(values.tobytes())
+                rows += len(chunk.rows)
+                if progress is not None:
+                    progress.update(len(chunk.rows), 0)
+        finally:
+            for handle in handles:
+                handle.close()
+
+        partial = _partial(target)
+        book = create_book(partial, rows)
+        try:
+            for (name, dtype, _masked), spill in zip(BOOK_SCHEMA, spills):
+                if not rows:
+                    continue
+                spilled = np.memmap(spill, dtype=dtype, mode="r")
+                for start in range(0, rows, DEFAULT_CHUNK_ROWS):
+                    book.write(name, start, spilled[start:start + DEFAULT_CHUNK_ROWS])
+                del spilled
+        except BaseException:
+            _discard(book, partial)
+            raise
+        book.close()
+        os.replace(partial, target)
+    return rows
+
+
+def _bad_column(row: Sequence[str], indexes: Sequence[Optional[int]]) -> Optional[int]:
+    for index in indexes:
+        if index is not None and index < len(row):
+            try:
+                parse_float(row[index])
+            except ValueError:
+                return index
+    return None
+
+
+def _override_columns(overrides: Dict[str, Optional[float]]) -> Tuple[Dict[str, float], int, int]:
+    for name in overrides:
+        if name not in FIELD_BITS:
+            raise ValueError(f"Unknown field: {name}")
+    values = {name: np.nan if value is None else float(value) for name, value in overrides.items()}
+    keep = 0xFF
+    add = 0
+    for name, value in overrides.items():
+        keep &= ~FIELD_BITS[name]
+        if value is not None:
+            add |= FIELD_BITS[name]
+    return values, keep, add
+
+
+def reprice_book(
+    book: PriceBook,
+    target=None,
+    *,
+    overrides: Optional[Dict[str, Optional[float]]] = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    cache: Optional[CalculationCache] = None,
+    progress: Optional[Progress] = None,
+) -> Tuple[int, int]:
+    # Input chunks are slices of the mapped columns, handed to calculate_batch without a
+    # copy. `overrides` replaces a field on every row for this run: a number is entered
+    # as a user value and None empties the field. Results go to a RESULT_SCHEMA sidecar.
+    if chunk_rows < 1:
+        raise ValueError("Chunk rows must be at least 1.")
+    chunk_rows = -(-chunk_rows // 8) * 8
+    values, keep, add = _override_columns(overrides or {})
+    inputs = [book.column(name) for name in INPUT_FIELDS]
+    user = book.column("user")
+
+    target = Path(target) if target is not None else sidecar_path(book.path)
+    partial = _partial(target)
+    results = create_book(partial, book.rows, RESULT_SCHEMA)
+    failed = 0
+    try:
+        for start in range(0, book.rows, chunk_rows):
+            stop = min(start + chunk_rows, book.rows)
+            columns = [
+                np.full(stop - start, values[name]) if name in values else column[start:stop]
+                for name, column in zip(INPUT_FIELDS, inputs)
+            ]
+            user_bits = user[start:stop]
+            if values:
+                user_bits = (user_bits & keep) | add
+            result = calculate_batch(*columns, user=user_bits, cache=cache)
+            for name in RESULT_FIELDS + ("status", "calc"):
+                results.write(name, start, getattr(result, name))
+            chunk_failed = int(np.count_nonzero(result.status != STATUS_OK))
+            failed += chunk_failed
+            if progress is not None:
+                progress.update(stop - start, chunk_failed)
+    except BaseException:
+        _discard(results, partial)
+        raise
+    results.close()
+    os.replace(partial, target)
+    return book.rows, failed
+
+
+def batch_result(results: PriceBook) -> BatchResult:
+    # Views straight into a results sidecar.
+    return BatchResult(**{name: results.column(name) for name in RESULT_FIELDS + ("status", "calc")})
+
+
+def format_info(book: PriceBook) -> str:
+    lines = [f"{book.path}: {book.rows:,} rows, version {VERSION}"]
+    for name in book.names:
+        column = book.column(name)
+        lines.append(f"  {name:<14} {column.dtype.str:<4} {book.null_count(name):>14,} empty")
+    return "\n".join(lines)
+
+
+def _parse_override(item: str) -> Tuple[str, Optional[float]]:
+    field, sep, text = item.partition("=")
+    field = field.strip()
+    if not sep or field not in FIELD_BITS:
+        raise ValueError(f"Invalid override {item!r}; expected FIELD=VALUE with FIELD in {', '.join(INPUT_FIELDS)}.")
+    return field, parse_float(text)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Convert CSV price lists to memory-mapped price books and reprice them.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    convert = commands.add_parser("convert", help="Convert a CSV price list to a price book.")
+    convert.add_argument("input", help="Input CSV file, or - for stdin.")
+    convert.add_argument("output", help="Price book to write.")
+    convert.add_argument(
+        "--map",
+        action="append",
+        default=[],
+        metavar="FIELD=COLUMN",
+        help=f"Map a calculator field to a CSV column. Fields: {', '.join(INPUT_FIELDS)}.",
+    )
+    convert.add_argument("--delimiter", default=",", help="CSV delimiter (default: ',').")
+    convert.add_argument("--encoding", default="utf-8-sig", help="File encoding (default: utf-8-sig).")
+    convert.add_argument("--chunk-size", type=int, default=50_000, help="Rows parsed per step (default: 50000).")
+    convert.add_argument(
+        "--recalc",
+        action="append",
+        default=[],
+        choices=INPUT_FIELDS,
+        help="Treat a column as previously calculated instead of user input (repeatable).",
+    )
+    convert.add_argument("--progress", type=float, default=2.0, metavar="SECONDS", help="Progress interval, 0 disables.")
+
+    reprice = commands.add_parser("reprice", help="Solve a price book and write a results sidecar.")
+    reprice.add_argument("book", help="Price book to solve.")
+    reprice.add_argument("-o", "--output", help="Results file (default: BOOK.results.pricebook next to the book).")
+    reprice.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="FIELD=VALUE",
+        help="Use VALUE for FIELD on every row; an empty VALUE clears the field (repeatable).",
+    )
+    reprice.add_argument(
+        "--chunk-rows",
+        type=int,
+        default=DEFAULT_CHUNK_ROWS,
+        help=f"Rows solved per batch (default: {DEFAULT_CHUNK_ROWS}).",
+    )
+    reprice.add_argument(
+        "--cache",
+        type=int,
+        default=0,
+        metavar="ROWS",
+        help="Remember up to ROWS distinct solved lines across chunks.",
+    )
+    reprice.add_argument("--stats", metavar="FILE", help="Write solver statistics as JSON.")
+    reprice.add_argument("--progress", type=float, default=2.0, metavar="SECONDS", help="Progress interval, 0 disables.")
+
+    info = commands.add_parser("info", help="Show the columns of a price book or results file.")
+    info.add_argument("book", help="Price book or results file.")
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.command == "info":
+        try:
+            with PriceBook(args.book) as book:
+                sys.stdout.write(format_info(book) + "\n")
+        except (OSError, ValueError) as exc:
+            sys.stderr.write(f"Error: {exc}\n")
+            return 1
+        return 0
+
+    progress = Progress(sys.stderr, args.progress)
+    if args.command == "convert":
+        if args.chunk_size < 1:
+            parser.error("--chunk-size must be at least 1.")
+        try:
+            mapping = parse_mapping(args.map)
+        except ValueError as exc:
+            parser.error(str(exc))
+        source = None
+        try:
+            source = sys.stdin if args.input == "-" else open(args.input, "r", encoding=args.encoding, newline="")
+            convert_csv(
+                source,
+                args.output,
+                mapping,
+                delimiter=args.delimiter,
+                chunk_size=args.chunk_size,
+                recalc=args.recalc,
+                progress=progress,
+            )
+        except (OSError, ValueError) as exc:
+            sys.stderr.write(f"Error: {exc}\n")
+            return 1
+        finally:
+            if source is not None and source is not sys.stdin:
+                source.close()
+        progress.finish()
+        return 0
+
+    try:
+        overrides = dict(_parse_override(item) for item in args.set)
+    except ValueError as exc:
+        parser.error(str(exc))
+    stats = SolverStats() if args.stats else None
+    try:
+        with PriceBook(args.book) as book, tracing(stats) if stats is not None else nullcontext():
+            reprice_book(
+                book,
+                args.output,
+                overrides=overrides,
+                chunk_rows=args.chunk_rows,
+                cache=CalculationCache(args.cache) if args.cache > 0 else None,
+                progress=progress,
+            )
+    except (OSError, ValueError) as exc:
+        sys.stderr.write(f"Error: {exc}\n")
+        return 1
+    progress.finish()
+    if stats is not None:
+        stats.to_json(args.stats)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
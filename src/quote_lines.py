@@ -0,0 +1,156 @@
+import math
+from array import array
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional
+
+from .calculations import FIELD_BITS, INPUT_FIELDS, STATUS_OK, QuoteInput, solve
+
+if TYPE_CHECKING:
+    from .schedules import DiscountSchedule
+
+LINE_FIELDS = ("quantity",) + INPUT_FIELDS
+RESULT_FIELDS = ("cost", "net1", "added_value", "discount", "net2", "m_no", "m_with")
+_NAN = math.nan
+
+
+@dataclass
+class QuoteTotals:
+    lines: int
+    priced_lines: int
+    quantity: float
+    cost: float
+    net2: float
+
+    @property
+    def margin(self) -> Optional[float]:
+        return ((self.net2 - self.cost) / self.net2) * 100.0 if self.net2 else None
+
+
+def _optional(value: float) -> Optional[float]:
+    return None if value != value else value
+
+
+class QuoteLines:
+    # One typed array per column, NaN for empty cells. Inputs keep what the user
+    # typed; solved values live in separate result columns. With a discount schedule,
+    # a line's quantity and tier supply its discount when it has none of its own.
+    def __init__(self, schedule: Optional["DiscountSchedule"] = None) -> None:
+        self.schedule = schedule
+        self.inputs: Dict[str, array] = {name: array("d") for name in LINE_FIELDS}
+        self.tiers: List[str] = []
+        self.user = array("B")
+        self.results: Dict[str, array] = {name: array("d") for name in RESULT_FIELDS}
+        self.status = array("B")
+        self.calc = array("B")
+        self._cost_total = 0.0
+        self._net2_total = 0.0
+        self._quantity_total = 0.0
+        self._priced = 0
+
+    def __len__(self) -> int:
+        return len(self.user)
+
+    def append(self, quantity: float = 1.0, tier: str = "", **values: Optional[float]) -> int:
+        unknown = set(values) - set(INPUT_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown line fields: {', '.join(sorted(unknown))}")
+        self.inputs["quantity"].append(quantity)
+        self.tiers.append(tier)
+        user = 0
+        for name in INPUT_FIELDS:
+            value = values.get(name)
+            self.inputs[name].append(_NAN if value is None else value)
+            if value is not None:
+                user |= FIELD_BITS[name]
+        self.user.append(user)
+        for column in self.results.values():
+            column.append(_NAN)
+        self.status.append(STATUS_OK)
+        self.calc.append(0)
+        index = len(self.user) - 1
+        self._solve(index)
+        self._add_totals(index, 1)
+        return index
+
+    def extend(self, lines: Iterable[Dict[str, Optional[float]]]) -> None:
+        for line in lines:
+            self.append(**line)
+
+    def clear(self) -> None:
+        self.__init__(self.schedule)
+
+    def set_schedule(self, schedule: Optional["DiscountSchedule"]) -> None:
+        self.schedule = schedule
+        for index in range(len(self)):
+            self._solve(index)
+        self.recompute_totals()
+
+    def get_input(self, index: int, name: str) -> Optional[float]:
+        return _optional(self.inputs[name][index])
+
+    def get_result(self, index: int, name: str) -> Optional[float]:
+        return _optional(self.results[name][index])
+
+    def is_calculated(self, index: int, name: str) -> bool:
+        bit = FIELD_BITS.get(name, 0)
+        return bool(self.calc[index] & bit)
+
+    def set_value(self, index: int, name: str, value: Optional[float]) -> None:
+        # Only the edited line is re-solved; totals move by the line's old and new contribution.
+        if name not in LINE_FIELDS:
+            raise ValueError(f"Unknown line field: {name}")
+        self._add_totals(index, -1)
+        self.inputs[name][index] = _NAN if value is None else value
+        if name != "quantity":
+            bit = FIELD_BITS[name]
+            self.user[index] = (self.user[index] | bit) if value is not None else (self.user[index] & ~bit)
+        if name != "quantity" or self.schedule is not None:
+            self._solve(index)
+        self._add_totals(index, 1)
+
+    def set_tier(self, index: int, tier: str) -> None:
+        self._add_totals(index, -1)
+        self.tiers[index] = tier
+        if self.schedule is not None:
+            self._solve(index)
+        self._add_totals(index, 1)
+
+    def _scheduled_discount(self, index: int, quote: QuoteInput) -> Optional[float]:
+        if self.schedule is None or quote.discount is not None or quote.net2 is not None or quote.target_margin is not None:
+            return None
+        return self.schedule.discount_for(_optional(self.inputs["quantity"][index]), self.tiers[index])
+
+    def _solve(self, index: int) -> None:
+        quote = QuoteInput(*(_optional(self.inputs[name][index]) for name in INPUT_FIELDS), user=self.user[index])
+        scheduled = self._scheduled_discount(index, quote)
+        if scheduled is not None:
+            quote.discount = scheduled
+            quote.user |= FIELD_BITS["discount"]
+        result = solve(quote)
+        for name in RESULT_FIELDS:
+            value = getattr(result, name)
+            self.results[name][index] = _NAN if value is None else value
+        self.status[index] = result.status
+        # A scheduled discount shows as calculated: the line did not enter it.
+        self.calc[index] = result.calc | (FIELD_BITS["discount"] if scheduled is not None else 0)
+
+    def _add_totals(self, index: int, sign: int) -> None:
+        cost = self.results["cost"][index]
+        net2 = self.results["net2"][index]
+        quantity = self.inputs["quantity"][index]
+        if self.status[index] != STATUS_OK or cost != cost or net2 != net2 or quantity != quantity:
+            return
+        self._priced += sign
+        self._quantity_total += sign * quantity
+        self._cost_total += sign * quantity * cost
+        self._net2_total += sign * quantity * net2
+
+    def recompute_totals(self) -> None:
+        self._cost_total = self._net2_total = self._quantity_total = 0.0
+        self._priced = 0
+        for index in range(len(self)):
+            self._add_totals(index, 1)
+
+    @property
+    def totals(self) -> QuoteTotals:
+        return QuoteTotals(len(self), self._priced, self._quantity_total, self._cost_total, self._net2_total)
@@ -0,0 +1,245 @@
+import tkinter as tk
+from typing import Dict, List, Optional, Tuple
+
+from .calculations import STATUS_MESSAGES, STATUS_OK, fmt_money, fmt_pct, parse_float
+from .quote_lines import QuoteLines
+from .theme import APP_THEME, FONT_BODY_BOLD, FONT_SMALL, SPACING_SM, SPACING_XS
+
+TABLE_COLUMNS = (
+    ("quantity", "Qty", 6),
+    ("tier", "Tier", 6),
+    ("cost", "Cost (€)", 10),
+    ("net1", "Net1 (€)", 10),
+    ("added_value", "Added Value (€)", 10),
+    ("discount", "Discount (%)", 8),
+    ("net2", "Net2 (€)", 10),
+    ("target_margin", "Target (%)", 8),
+    ("m_no", "Margin (%)", 9),
+    ("m_with", "Margin Net2 (%)", 9),
+    ("status", "Status", 30),
+)
+_OUTPUT_COLUMNS = ("m_no", "m_with", "status")
+_PERCENT_COLUMNS = ("discount", "target_margin", "m_no", "m_with")
+
+
+def _format(name: str, value: Optional[float]) -> str:
+    if value is None:
+        return ""
+    if name == "quantity":
+        return f"{value:g}"
+    return fmt_pct(value) if name in _PERCENT_COLUMNS else fmt_money(value)
+
+
+class _PooledRow:
+    def __init__(self) -> None:
+        self.index = -1
+        self.variables: Dict[str, tk.StringVar] = {}
+        self.widgets: Dict[str, tk.Widget] = {}
+        self.shown: Dict[str, Tuple[str, str]] = {}
+
+
+class QuoteTable:
+    # Only `visible_rows` rows of widgets exist; scrolling rebinds them to other lines
+    # and a cell is only touched when its text or colour actually changes.
+    def __init__(self, parent: tk.Widget, model: QuoteLines, *, visible_rows: int = 20) -> None:
+        self.model = model
+        self.visible_rows = visible_rows
+        self.first = 0
+        self._editing: Optional[Tuple[int, str]] = None
+
+        self.container = tk.Frame(parent, bg=APP_THEME.surface)
+        self.body = tk.Frame(self.container, bg=APP_THEME.surface)
+        self.body.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar = tk.Scrollbar(self.container, orient="vertical", command=self._on_scrollbar)
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+        self.container.grid_columnconfigure(0, weight=1)
+
+        for column, (_name, label, width) in enumerate(TABLE_COLUMNS):
+            header = tk.Label(
+                self.body,
+                text=label,
+                width=width,
+                anchor="w",
+                font=FONT_BODY_BOLD,
+                bg=APP_THEME.surface,
+                fg=APP_THEME.text,
+            )
+            header.grid(row=0, column=column, sticky="w", padx=1, pady=(0, SPACING_XS))
+
+        self.rows: List[_PooledRow] = [self._build_row(slot) for slot in range(visible_rows)]
+
+        self.totals_label = tk.Label(
+            self.container,
+            text="",
+            anchor="w",
+            font=FONT_BODY_BOLD,
+            bg=APP_THEME.surface,
+            fg=APP_THEME.text,
+        )
+        self.totals_label.grid(row=1, column=0, columnspan=2, sticky="ew", pady=(SPACING_SM, 0))
+
+        for widget in (self.container, self.body):
+            widget.bind("<MouseWheel>", self._on_wheel)
+            widget.bind("<Button-4>", lambda _event: self.scroll(-3))
+            widget.bind("<Button-5>", lambda _event: self.scroll(3))
+
+        self.render()
+
+    def _build_row(self, slot: int) -> _PooledRow:
+        row = _PooledRow()
+        for column, (name, _label, width) in enumerate(TABLE_COLUMNS):
+            variable = tk.StringVar(value="")
+            if name in _OUTPUT_COLUMNS:
+                widget = tk.Label(
+                    self.body,
+                    textvariable=variable,
+                    width=width,
+                    anchor="w",
+                    font=FONT_SMALL,
+                    bg=APP_THEME.surface,
+                    fg=APP_THEME.muted if name == "status" else APP_THEME.text,
+                )
+            else:
+                widget = tk.Entry(
+                    self.body,
+                    textvariable=variable,
+                    width=width,
+                    font=FONT_SMALL,
+                    relief="flat",
+                    bd=1,
+                    bg=APP_THEME.surface,
+                    fg=APP_THEME.text,
+                    insertbackground=APP_THEME.text,
+                )
+                widget.bind("<FocusIn>", lambda _event, s=slot, n=name: setattr(self, "_editing", (s, n)))
+                widget.bind("<Return>", lambda _event, s=slot, n=name: self._on_edit(s, n))
+                widget.bind("<FocusOut>", lambda _event, s=slot, n=name: self._on_edit(s, n))
+                widget.bind("<Down>", lambda _event, s=slot, n=name: self._move(s, n, 1))
+                widget.bind("<Up>", lambda _event, s=slot, n=name: self._move(s, n, -1))
+            widget.grid(row=slot + 1, column=column, sticky="ew", padx=1, pady=1)
+            widget.bind("<MouseWheel>", self._on_wheel)
+            widget.bind("<Button-4>", lambda _event: self.scroll(-3))
+            widget.bind("<Button-5>", lambda _event: self.scroll(3))
+            row.variables[name] = variable
+            row.widgets[name] = widget
+            row.shown[name] = ("", "input")
+        return row
+
+    def grid(self, **kwargs) -> None:
+        self.container.grid(**kwargs)
+
+    def pack(self, **kwargs) -> None:
+        self.container.pack(**kwargs)
+
+    def _cell(self, index: int, name: str) -> Tuple[str, str]:
+        model = self.model
+        if name == "status":
+            status = model.status[index]
+            return ("" if status == STATUS_OK else STATUS_MESSAGES[status]), "output"
+        if name in ("m_no", "m_with"):
+            return _format(name, model.get_result(index, name)), "output"
+        if name == "tier":
+            return model.tiers[index], "input"
+        if name in ("quantity", "target_margin"):
+            return _format(name, model.get_input(index, name)), "input"
+        if model.is_calculated(index, name):
+            return _format(name, model.get_result(index, name)), "calc"
+        return _format(name, model.get_input(index, name)), "input"
+
+    def _bind_row(self, row: _PooledRow, index: int) -> None:
+        row.index = index
+        for name, variable in row.variables.items():
+            cell = ("", "input") if index < 0 else self._cell(index, name)
+            shown = row.shown[name]
+            if cell == shown:
+                continue
+            if cell[0] != shown[0]:
+                variable.set(cell[0])
+            if cell[1] != shown[1] and name not in _OUTPUT_COLUMNS:
+                row.widgets[name].configure(bg=APP_THEME.primary_soft if cell[1] == "calc" else APP_THEME.surface)
+            row.shown[name] = cell
+
+    def render(self) -> None:
+        # A cell being edited is committed to its line before its row is rebound.
+        if self._editing is not None:
+            self._on_edit(*self._editing)
+        size = len(self.model)
+        self.first = max(0, min(self.first, size - self.visible_rows))
+        for slot, row in enumerate(self.rows):
+            index = self.first + slot
+            self._bind_row(row, index if index < size else -1)
+        if size:
+            self.scrollbar.set(self.first / size, min(1.0, (self.first + self.visible_rows) / size))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+        self.render_totals()
+
+    def render_totals(self) -> None:
+        totals = self.model.totals
+        margin = "—" if totals.margin is None else f"{fmt_pct(totals.margin)}%"
+        self.totals_label.configure(
+            text=(
+                f"{totals.lines} lines ({totals.priced_lines} priced)   "
+                f"Cost €{fmt_money(totals.cost)}   Net2 €{fmt_money(totals.net2)}   Margin {margin}"
+            )
+        )
+
+    def scroll(self, lines: int) -> None:
+        first = max(0, min(self.first + lines, len(self.model) - self.visible_rows))
+        if first != self.first:
+            self.first = first
+            self.render()
+
+    def scroll_to(self, index: int) -> None:
+        if index < self.first:
+            self.first = index
+        elif index >= self.first + self.visible_rows:
+            self.first = index - self.visible_rows + 1
+        else:
+            return
+        self.render()
+
+    def _on_scrollbar(self, action: str, amount: str, unit: Optional[str] = None) -> None:
+        if action == "moveto":
+            self.first = int(float(amount) * len(self.model))
+            self.render()
+        elif action == "scroll":
+            step = self.visible_rows if unit == "pages" else 1
+            self.scroll(int(amount) * step)
+
+    def _on_wheel(self, event) -> str:
+        self.scroll(-3 if event.delta > 0 else 3)
+        return "break"
+
+    def _on_edit(self, slot: int, name: str) -> None:
+        row = self.rows[slot]
+        if row.index < 0:
+            return
+        text = row.variables[name].get()
+        if text == row.shown[name][0]:
+            return
+        if name == "tier":
+            self.model.set_tier(row.index, text.strip())
+            self._bind_row(row, row.index)
+            self.render_totals()
+            return
+        try:
+            value = parse_float(text)
+        except ValueError as exc:
+            row.shown[name] = (text, row.shown[name][1])
+            row.variables["status"].set(str(exc))
+            row.shown["status"] = (str(exc), "output")
+            return
+        self.model.set_value(row.index, name, value)
+        row.shown[name] = (text, row.shown[name][1])
+        self._bind_row(row, row.index)
+        self.render_totals()
+
+    def _move(self, slot: int, name: str, step: int) -> str:
+        self._on_edit(slot, name)
+        index = self.rows[slot].index + step
+        if not 0 <= index < len(self.model):
+            return "break"
+        self.scroll_to(index)
+        self.rows[index - self.first].widgets[name].focus_set()
+        return "break"
@@ -0,0 +1,495 @@
+import argparse
+import csv
+import sys
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+import numpy as np
+
+from .analytics import MarginRollup, parse_group_by
+from .batch import BatchResult, calculate_batch
+from .cache import CalculationCache
+from .history import HISTORY_ERRORS, QuoteHistory
+from .journal import CalculationJournal
+from .schedules import DiscountSchedule, load_schedule, schedule_discounts
+from .instrumentation import SolverStats, tracing
+from .calculations import (
+    FIELD_BITS,
+    INPUT_FIELDS,
+    STATUS_INVALID_NUMBER,
+    STATUS_MESSAGES,
+    STATUS_OK,
+    fmt_money,
+    fmt_pct,
+    parse_float,
+    set_journal,
+)
+
+OUTPUT_FIELDS = INPUT_FIELDS[:5]
+MARGIN_COLUMNS = ("m_no", "m_with", "status")
+TAG_COLUMNS = ("customer", "product")
+SCHEDULE_COLUMNS = ("quantity", "tier")
+
+
+@dataclass
+class Chunk:
+    rows: List[List[str]]
+    columns: List[np.ndarray]
+    user: np.ndarray
+    errors: Dict[int, str]
+
+
+@dataclass
+class Layout:
+    # Where the calculator fields sit in a CSV header, and the header written out.
+    indexes: List[Optional[int]]
+    output_indexes: List[Optional[int]]
+    tag_indexes: List[Optional[int]]
+    schedule_indexes: List[Optional[int]]
+    user_fields: int
+    out_header: List[str]
+
+
+def parse_mapping(items: Sequence[str]) -> Dict[str, str]:
+    mapping = {name: name for name in INPUT_FIELDS}
+    for item in items:
+        field, sep, column = item.partition("=")
+        field = field.strip()
+        if not sep or field not in FIELD_BITS or not column.strip():
+            raise ValueError(f"Invalid column mapping {item!r}; expected FIELD=COLUMN with FIELD in {', '.join(INPUT_FIELDS)}.")
+        mapping[field] = column.strip()
+    return mapping
+
+
+def resolve_columns(header: Sequence[str], mapping: Dict[str, str]) -> Dict[str, Optional[int]]:
+    lookup = {name.strip().lower(): index for index, name in enumerate(header)}
+    return {field: lookup.get(column.lower()) for field, column in mapping.items()}
+
+
+def plan_layout(
+    header: Sequence[str],
+    mapping: Dict[str, str],
+    recalc: Sequence[str] = (),
+    schedule: Optional[DiscountSchedule] = None,
+) -> Layout:
+    columns = resolve_columns(header, mapping)
+    columns.update(resolve_columns(header, {name: name for name in MARGIN_COLUMNS}))
+    output_indexes = [columns[name] for name in OUTPUT_FIELDS + MARGIN_COLUMNS]
+    schedule_indexes = list(resolve_columns(header, {name: name for name in SCHEDULE_COLUMNS}).values())
+    if schedule is not None and schedule_indexes[0] is None:
+        raise ValueError("A discount schedule needs a 'quantity' column.")
+
+    user_fields = 0
+    for name in INPUT_FIELDS:
+        if name not in recalc:
+            user_fields |= FIELD_BITS[name]
+
+    out_header = list(header)
+    out_header.extend(name for name, index in zip(OUTPUT_FIELDS + MARGIN_COLUMNS, output_indexes) if index is None)
+    return Layout(
+        indexes=[columns[name] for name in INPUT_FIELDS],
+        output_indexes=output_indexes,
+        tag_indexes=list(resolve_columns(header, {name: name for name in TAG_COLUMNS}).values()),
+        schedule_indexes=schedule_indexes,
+        user_fields=user_fields,
+        out_header=out_header,
+    )
+
+
+def parse_chunk(rows: List[List[str]], indexes: Sequence[Optional[int]], user_fields: int) -> Chunk:
+    size = len(rows)
+    columns = [np.full(size, np.nan) for _ in INPUT_FIELDS]
+    user = np.zeros(size, dtype=np.uint8)
+    errors: Dict[int, str] = {}
+
+    for field_index, (column, index) in enumerate(zip(columns, indexes)):
+        if index is None:
+            continue
+        bit = 1 << field_index
+        present = np.zeros(size, dtype=bool)
+        for row_index, row in enumerate(rows):
+            cell = row[index] if index < len(row) else ""
+            try:
+                value = parse_float(cell)
+            except ValueError as exc:
+                errors.setdefault(row_index, str(exc))
+                continue
+            if value is not None:
+                column[row_index] = value
+                present[row_index] = True
+        if user_fields & bit:
+            user[present] |= bit
+
+    return Chunk(rows, columns, user, errors)
+
+
+def read_chunks(
+    reader: Iterable[List[str]],
+    indexes: Sequence[Optional[int]],
+    chunk_size: int,
+    user_fields: int,
+) -> Iterator[Chunk]:
+    rows: List[List[str]] = []
+    for row in reader:
+        rows.append(row)
+        if len(rows) >= chunk_size:
+            yield parse_chunk(rows, indexes, user_fields)
+            rows = []
+    if rows:
+        yield parse_chunk(rows, indexes, user_fields)
+
+
+def _formatters(decimal_comma: bool) -> List[Callable[[float], str]]:
+    formatters = [fmt_pct if name == "discount" else fmt_money for name in OUTPUT_FIELDS] + [fmt_pct]
+    if decimal_comma:
+        return [lambda value, fmt=fmt: fmt(value).replace(".", ",") for fmt in formatters]
+    return formatters
+
+
+def failed_rows(chunk: Chunk, result: BatchResult) -> np.ndarray:
+    failed = result.status != STATUS_OK
+    if chunk.errors:
+        failed[list(chunk.errors)] = True
+    return failed
+
+
+def format_chunk(
+    chunk: Chunk,
+    result: BatchResult,
+    indexes: Sequence[Optional[int]],
+    decimal_comma: bool = False,
+) -> Iterator[List[str]]:
+    # `indexes` locates OUTPUT_FIELDS then MARGIN_COLUMNS in the input row; None appends
+    # a column. Like calculate_all, only solved and user fields are rewritten.
+    formatters = _formatters(decimal_comma)
+    fmt_margin = formatters[-1]
+    failed = failed_rows(chunk, result)
+    written = result.calc | chunk.user
+
+    columns: List[List[Optional[str]]] = []
+    for field_index, name in enumerate(OUTPUT_FIELDS):
+        fmt = formatters[field_index]
+        mask = (~failed & ((written & (1 << field_index)) != 0)).tolist()
+        values = getattr(result, name).tolist()
+        columns.append([fmt(value) if keep else None for value, keep in zip(values, mask)])
+    failed_list = failed.tolist()
+    for margins in (result.m_no, result.m_with):
+        columns.append(
+            ["" if bad or value != value else fmt_margin(value) for value, bad in zip(margins.tolist(), failed_list)]
+        )
+    errors = chunk.errors
+    columns.append(
+        [
+            errors.get(row_index) or STATUS_MESSAGES[code]
+            for row_index, code in enumerate(np.where(failed, result.status, STATUS_OK).tolist())
+        ]
+    )
+
+    replaced = [(index, texts) for index, texts in zip(indexes, columns) if index is not None]
+    appended = [texts for index, texts in zip(indexes, columns) if index is None]
+    for row_index, row in enumerate(chunk.rows):
+        row = list(row)
+        for index, texts in replaced:
+            text = texts[row_index]
+            if text is not None:
+                if index >= len(row):
+                    row.extend([""] * (index + 1 - len(row)))
+                row[index] = text
+        row.extend(texts[row_index] or "" for texts in appended)
+        yield row
+
+
+class Progress:
+    def __init__(self, stream: TextIO, interval: float) -> None:
+        self.stream = stream
+        self.interval = interval
+        self.started = time.perf_counter()
+        self.last_report = self.started
+        self.rows = 0
+        self.failed = 0
+
+    def update(self, rows: int, failed: int) -> None:
+        self.rows += rows
+        self.failed += failed
+        now = time.perf_counter()
+        if self.interval > 0 and now - self.last_report >= self.interval:
+            self.last_report = now
+            self._report(now, final=False)
+
+    def finish(self) -> None:
+        self._report(time.perf_counter(), final=True)
+
+    def _report(self, now: float, final: bool) -> None:
+        elapsed = max(now - self.started, 1e-9)
+        label = "Done" if final else "Progress"
+        self.stream.write(
+            f"{label}: {self.rows:,} rows, {self.failed:,} with status, "
+            f"{elapsed:.1f}s, {self.rows / elapsed:,.0f} rows/s\n"
+        )
+        self.stream.flush()
+
+
+def reprice_stream(
+    source: TextIO,
+    target: TextIO,
+    mapping: Dict[str, str],
+    *,
+    delimiter: str = ",",
+    chunk_size: int = 50_000,
+    recalc: Sequence[str] = (),
+    decimal_comma: bool = False,
+    progress: Optional[Progress] = None,
+    cache: Optional[CalculationCache] = None,
+    history: Optional[QuoteHistory] = None,
+    schedule: Optional[DiscountSchedule] = None,
+    rollup: Optional[MarginRollup] = None,
+) -> Tuple[int, int]:
+    reader = csv.reader(source, delimiter=delimiter)
+    writer = csv.writer(target, delimiter=delimiter, lineterminator="\n")
+
+    header = next(reader, None)
+    if header is None:
+        raise ValueError("Input CSV is empty.")
+    layout = plan_layout(header, mapping, recalc, schedule)
+    writer.writerow(layout.out_header)
+    group_indexes = _group_indexes(header, rollup.columns) if rollup is not None else {}
+
+    total = failed = 0
+    for chunk in read_chunks(reader, layout.indexes, chunk_size, layout.user_fields):
+        result = solve_chunk(chunk, layout, schedule, cache)
+        writer.writerows(format_chunk(chunk, result, layout.output_indexes, decimal_comma))
+        if history is not None:
+            _record_chunk(history, chunk, result, layout.tag_indexes)
+        if rollup is not None:
+            _summarize_chunk(rollup, chunk, result, group_indexes)
+        chunk_failed = int(np.count_nonzero(failed_rows(chunk, result)))
+        total += len(chunk.rows)
+        failed += chunk_failed
+        if progress is not None:
+            progress.update(len(chunk.rows), chunk_failed)
+
+    return total, failed
+
+
+def solve_chunk(
+    chunk: Chunk,
+    layout: Layout,
+    schedule: Optional[DiscountSchedule] = None,
+    cache: Optional[CalculationCache] = None,
+) -> BatchResult:
+    if schedule is not None:
+        _apply_schedule(schedule, chunk, layout.schedule_indexes)
+    return calculate_batch(*chunk.columns, user=chunk.user, cache=cache)
+
+
+def _apply_schedule(schedule: DiscountSchedule, chunk: Chunk, indexes: Sequence[Optional[int]]) -> None:
+    # Scheduled discounts count as entered, so format_chunk writes them to the output.
+    quantity_index, tier_index = indexes
+    quantity = np.full(len(chunk.rows), np.nan)
+    for row_index, row in enumerate(chunk.rows):
+        try:
+            value = parse_float(row[quantity_index] if quantity_index < len(row) else "")
+        except ValueError as exc:
+            chunk.errors.setdefault(row_index, str(exc))
+            continue
+        if value is not None:
+            quantity[row_index] = value
+    if tier_index is None:
+        tiers = [""] * len(chunk.rows)
+    else:
+        tiers = [row[tier_index].strip() if tier_index < len(row) else "" for row in chunk.rows]
+    discount, chunk.user, _scheduled = schedule_discounts(schedule, quantity, tiers, *chunk.columns[3:], chunk.user)
+    chunk.columns[3] = discount
+
+
+def _record_chunk(history: QuoteHistory, chunk: Chunk, result: BatchResult, tag_indexes: Sequence[Optional[int]]) -> None:
+    # Rows with unreadable cells are kept with the invalid-number status.
+    if chunk.errors:
+        result.status[list(chunk.errors)] = STATUS_INVALID_NUMBER
+    tags = [
+        None if index is None else [(row[index].strip() or None) if index < len(row) else None for row in chunk.rows]
+        for index in tag_indexes
+    ]
+    history.record_batch(result, chunk.user, *tags)
+
+
+def _group_indexes(header: Sequence[str], names: Sequence[str]) -> Dict[str, int]:
+    indexes = resolve_columns(header, {name: name for name in names})
+    missing = [name for name, index in indexes.items() if index is None]
+    if missing:
+        raise ValueError(f"Group column not found: {', '.join(missing)}.")
+    return indexes
+
+
+def _summarize_chunk(rollup: MarginRollup, chunk: Chunk, result: BatchResult, indexes: Dict[str, int]) -> None:
+    # Rows with unreadable cells count as quotes but not as priced ones.
+    if chunk.errors:
+        result.status[list(chunk.errors)] = STATUS_INVALID_NUMBER
+    keys = {
+        name: [row[index].strip() if index < len(row) else "" for row in chunk.rows]
+        for name, index in indexes.items()
+    }
+    rollup.add(result, keys)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Reprice a CSV price list with the margin calculator.")
+    parser.add_argument("input", help="Input CSV file, or - for stdin.")
+    parser.add_argument("output", help="Output CSV file, or - for stdout.")
+    parser.add_argument(
+        "--map",
+        action="append",
+        default=[],
+        metavar="FIELD=COLUMN",
+        help=f"Map a calculator field to a CSV column. Fields: {', '.join(INPUT_FIELDS)}.",
+    )
+    parser.add_argument("--delimiter", default=",", help="CSV delimiter (default: ',').")
+    parser.add_argument("--encoding", default="utf-8-sig", help="File encoding (default: utf-8-sig).")
+    parser.add_argument("--chunk-size", type=int, default=50_000, help="Rows solved per batch (default: 50000).")
+    parser.add_argument(
+        "--recalc",
+        action="append",
+        default=[],
+        choices=INPUT_FIELDS,
+        help="Treat a column as previously calculated instead of user input (repeatable).",
+    )
+    parser.add_argument("--decimal-comma", action="store_true", help="Write decimals with a comma.")
+    parser.add_argument(
+        "--cache",
+        type=int,
+        default=0,
+        metavar="ROWS",
+        help="Remember up to ROWS distinct solved lines across chunks; helps feeds with many repeated lines.",
+    )
+    parser.add_argument(
+        "--schedule",
+        metavar="FILE",
+        help="Discount schedule CSV (tier, min_quantity, discount); fills empty discounts from quantity/tier columns.",
+    )
+    parser.add_argument(
+        "--history",
+        metavar="FILE",
+        help="Also record every row in this quote history database, tagged from customer/product columns.",
+    )
+    parser.add_argument(
+        "--journal",
+        metavar="FILE",
+        help="Append every solved row to this calculation journal (see python -m src.journal).",
+    )
+    parser.add_argument(
+        "--group-by",
+        action="append",
+        default=[],
+        metavar="COLUMNS",
+        help="Summarize margins per value of these columns, e.g. family or rep,customer (repeatable; needs --summary).",
+    )
+    parser.add_argument(
+        "--summary",
+        metavar="FILE",
+        help="Write the --group-by margin summary here, as JSON for a .json file and CSV otherwise.",
+    )
+    parser.add_argument(
+        "--summary-target",
+        type=float,
+        metavar="PCT",
+        help="Target margin for rows without one when counting quotes below target.",
+    )
+    parser.add_argument("--stats", metavar="FILE", help="Write solver statistics (patterns, statuses, timings) as JSON.")
+    parser.add_argument("--progress", type=float, default=2.0, metavar="SECONDS", help="Progress interval, 0 disables.")
+    return parser
+
+
+def open_csv(path: str, mode: str, encoding: str) -> TextIO:
+    if path == "-":
+        return sys.stdin if "r" in mode else sys.stdout
+    return open(path, mode, encoding=encoding, newline="")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be at least 1.")
+    try:
+        mapping = parse_mapping(args.map)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    try:
+        schedule = load_schedule(args.schedule) if args.schedule else None
+    except (OSError, ValueError) as exc:
+        parser.error(str(exc))
+    if bool(args.group_by) != bool(args.summary):
+        parser.error("--group-by and --summary go together.")
+    try:
+        rollup = MarginRollup(parse_group_by(args.group_by), args.summary_target) if args.summary else None
+    except ValueError as exc:
+        parser.error(str(exc))
+    try:
+        journal = CalculationJournal(args.journal) if args.journal else None
+    except (OSError, ValueError) as exc:
+        parser.error(str(exc))
+    try:
+        history = QuoteHistory(args.history) if args.history else None
+    except HISTORY_ERRORS + (ValueError,) as exc:
+        if journal is not None:
+            journal.close()
+        parser.error(f"--history: {exc}")
+
+    progress = Progress(sys.stderr, args.progress)
+    source = None
+    try:
+        source = open_csv(args.input, "r", args.encoding)
+        target = open_csv(args.output, "w", args.encoding if args.output != "-" else "utf-8")
+    except OSError as exc:
+        if source is not None and source is not sys.stdin:
+            source.close()
+        if history is not None:
+            history.close()
+        if journal is not None:
+            journal.close()
+        sys.stderr.write(f"Error: {exc}\n")
+        return 1
+    stats = SolverStats() if args.stats else None
+    set_journal(journal)
+    try:
+        with tracing(stats) if stats is not None else nullcontext():
+            reprice_stream(
+                source,
+                target,
+                mapping,
+                delimiter=args.delimiter,
+                chunk_size=args.chunk_size,
+                recalc=args.recalc,
+                decimal_comma=args.decimal_comma,
+                progress=progress,
+                cache=CalculationCache(args.cache) if args.cache > 0 else None,
+                history=history,
+                schedule=schedule,
+                rollup=rollup,
+            )
+    except ValueError as exc:
+        sys.stderr.write(f"Error: {exc}\n")
+        return 1
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+        if history is not None:
+            history.close()
+        if journal is not None:
+            set_journal(None)
+            journal.close()
+    progress.finish()
+    if stats is not None:
+        stats.to_json(args.stats)
+    if rollup is not None:
+        rollup.write(args.summary)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
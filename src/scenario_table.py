@@ -0,0 +1,179 @@
+import tkinter as tk
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .calculations import INPUT_FIELDS, CalculationResult
+from .scenarios import Scenario
+from .theme import APP_THEME, FONT_BODY_BOLD, FONT_SMALL, SPACING_XS
+
+SCENARIO_ROWS = (
+    ("cost", "Cost (€)"),
+    ("net1", "Net1 (€)"),
+    ("added_value", "Added Value (€)"),
+    ("discount", "Discount (%)"),
+    ("net2", "Net2 (€)"),
+    ("target_margin", "Target (%)"),
+    ("m_no", "Margin (%)"),
+    ("m_with", "Margin Net2 (%)"),
+    ("status", "Status"),
+)
+_CELL_WIDTH = 14
+
+
+class _Column:
+    def __init__(self, scenario: Scenario) -> None:
+        self.scenario = scenario
+        self.variables: Dict[str, tk.StringVar] = {}
+        self.widgets: Dict[str, tk.Widget] = {}
+        self.shown: Dict[str, Tuple[str, str]] = {}
+
+
+class ScenarioTable:
+    # One column per scenario, the first being the calculator's own quote. Input cells
+    # of the other columns are overrides: typing a value pins it for that scenario and
+    # clearing the cell takes the calculator's value again. Results arrive through
+    # show() and only cells whose text or style changed are touched.
+    def __init__(self, parent: tk.Widget, on_change: Callable[[], None]) -> None:
+        self.on_change = on_change
+        self.columns: List[_Column] = []
+        self._editing: Optional[Tuple[_Column, str]] = None
+
+        self.container = tk.Frame(parent, bg=APP_THEME.surface)
+        for row, (_name, label) in enumerate(SCENARIO_ROWS, start=1):
+            tk.Label(
+                self.container,
+                text=label,
+                anchor="w",
+                font=FONT_BODY_BOLD,
+                bg=APP_THEME.surface,
+                fg=APP_THEME.text,
+            ).grid(row=row, column=0, sticky="w", padx=(0, SPACING_XS), pady=1)
+        self._add_column(Scenario("Calculator"), editable=False)
+
+    @property
+    def scenarios(self) -> List[Scenario]:
+        return [column.scenario for column in self.columns]
+
+    def pack(self, **kwargs) -> None:
+        self.container.pack(**kwargs)
+
+    def add(self, scenario: Scenario) -> None:
+        self._add_column(scenario, editable=True)
+        self.on_change()
+
+    def _add_column(self, scenario: Scenario, editable: bool) -> None:
+        column = _Column(scenario)
+        header = tk.Frame(self.container, bg=APP_THEME.surface)
+        name = tk.StringVar(value=scenario.name)
+        if editable:
+            entry = tk.Entry(header, textvariable=name, width=_CELL_WIDTH - 3, font=FONT_BODY_BOLD, relief="flat", bd=1)
+            entry.bind("<Return>", lambda _event, c=column: self._on_rename(c))
+            entry.bind("<FocusOut>", lambda _event, c=column: self._on_rename(c))
+            entry.pack(side="left")
+            tk.Button(
+                header,
+                text="✕",
+                command=lambda c=column: self.remove(c),
+                font=FONT_SMALL,
+                bg=APP_THEME.surface,
+                fg=APP_THEME.muted,
+                relief="flat",
+                bd=0,
+            ).pack(side="left")
+        else:
+            tk.Label(header, textvariable=name, anchor="w", font=FONT_BODY_BOLD, bg=APP_THEME.surface).pack(side="left")
+        column.variables["name"] = name
+        column.widgets["name"] = header
+
+        for row_name, _label in SCENARIO_ROWS:
+            variable = tk.StringVar(value="")
+            if editable and row_name in INPUT_FIELDS:
+                widget = tk.Entry(
+                    self.container,
+                    textvariable=variable,
+                    width=_CELL_WIDTH,
+                    font=FONT_SMALL,
+                    relief="flat",
+                    bd=1,
+                    bg=APP_THEME.surface,
+                    fg=APP_THEME.muted,
+                    insertbackground=APP_THEME.text,
+                )
+                widget.bind("<FocusIn>", lambda _event, c=column, n=row_name: setattr(self, "_editing", (c, n)))
+                widget.bind("<Return>", lambda _event, c=column, n=row_name: self._on_edit(c, n))
+                widget.bind("<FocusOut>", lambda _event, c=column, n=row_name: self._on_edit(c, n))
+            else:
+                widget = tk.Label(
+                    self.container,
+                    textvariable=variable,
+                    width=_CELL_WIDTH,
+                    anchor="w",
+                    font=FONT_SMALL,
+                    wraplength=_CELL_WIDTH * 8,
+                    justify="left",
+                    bg=APP_THEME.surface,
+                    fg=APP_THEME.muted if row_name == "status" else APP_THEME.text,
+                )
+            column.variables[row_name] = variable
+            column.widgets[row_name] = widget
+            column.shown[row_name] = ("", "")
+        self.columns.append(column)
+        self._grid_column(len(self.columns), column)
+
+    def _grid_column(self, position: int, column: _Column) -> None:
+        column.widgets["name"].grid(row=0, column=position, sticky="w", padx=1, pady=(0, SPACING_XS))
+        for row, (row_name, _label) in enumerate(SCENARIO_ROWS, start=1):
+            column.widgets[row_name].grid(row=row, column=position, sticky="ew", padx=1, pady=1)
+
+    def remove(self, column: _Column) -> None:
+        if self._editing is not None and self._editing[0] is column:
+            self._editing = None
+        position = self.columns.index(column)
+        for widget in column.widgets.values():
+            widget.destroy()
+        del self.columns[position]
+        for moved, later in enumerate(self.columns[position:], start=position + 1):
+            self._grid_column(moved, later)
+        self.on_change()
+
+    def _on_rename(self, column: _Column) -> None:
+        column.scenario.name = column.variables["name"].get().strip() or column.scenario.name
+
+    def _style(self, column: _Column, name: str, result: CalculationResult) -> str:
+        if name in column.scenario.overrides:
+            return "override"
+        return "calc" if result.sources.get(name) == "calc" else ""
+
+    def show(self, index: int, result: CalculationResult) -> None:
+        column = self.columns[index]
+        editing = self._editing
+        for name, _label in SCENARIO_ROWS:
+            if editing is not None and editing == (column, name):
+                continue
+            cell = (result.values.get(name, ""), self._style(column, name, result))
+            shown = column.shown[name]
+            if cell == shown:
+                continue
+            if cell[0] != shown[0]:
+                column.variables[name].set(cell[0])
+            if cell[1] != shown[1] and name in INPUT_FIELDS:
+                column.widgets[name].configure(
+                    bg=APP_THEME.primary_soft if cell[1] == "calc" else APP_THEME.surface,
+                    fg=APP_THEME.text if cell[1] == "override" or index == 0 else APP_THEME.muted,
+                )
+            column.shown[name] = cell
+
+    def _on_edit(self, column: _Column, name: str) -> None:
+        if self._editing == (column, name):
+            self._editing = None
+        if column not in self.columns:
+            return
+        text = column.variables[name].get().strip()
+        if text == column.shown[name][0].strip():
+            return
+        overrides = column.scenario.overrides
+        if text:
+            overrides[name] = text
+        else:
+            overrides.pop(name, None)
+        column.shown[name] = (text, column.shown[name][1])
+        self.on_change()
@@ -0,0 +1,97 @@
+import time
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from .calculations import INPUT_FIELDS, CalculationResult, calculate_all
+
+# Budget for handing finished results to Tk in one poll, so a burst of results never
+# holds the main loop longer than a frame at 60 Hz.
+FRAME_SECONDS = 0.016
+
+
+@dataclass
+class Scenario:
+    # A what-if variant of the calculator's quote: each override replaces that input;
+    # every other field is taken from what the user typed in the calculator.
+    name: str
+    overrides: Dict[str, str] = field(default_factory=dict)
+
+
+def scenario_inputs(values: Dict[str, str], sources: Dict[str, str], overrides: Dict[str, str]) -> Tuple[Dict[str, str], Dict[str, str]]:
+    # Only user-entered calculator fields carry over, as in live mode, so solved values
+    # of the base quote never pin a scenario's own solve.
+    user = {name for name in INPUT_FIELDS if sources.get(name) == "user" and values.get(name, "").strip()}
+    scenario_values = {name: (values.get(name, "") if name in user else "") for name in INPUT_FIELDS}
+    scenario_sources = {name: "user" for name in user}
+    for name, text in overrides.items():
+        if name not in scenario_values:
+            raise ValueError(f"Unknown field: {name}")
+        scenario_values[name] = text
+        if text.strip():
+            scenario_sources[name] = "user"
+        else:
+            scenario_sources.pop(name, None)
+    return scenario_values, scenario_sources
+
+
+def solve_scenario(values: Dict[str, str], sources: Dict[str, str]) -> CalculationResult:
+    # Module level, so process pools can run it too.
+    return calculate_all(values, sources)
+
+
+class ScenarioRunner:
+    # Solves scenarios off the Tk thread. Every submit starts a new generation: futures
+    # of the previous one that have not started are cancelled, and results of any that
+    # already ran are dropped when polled. poll() is meant to be called from the Tk
+    # thread via root.after; it only hands over finished results.
+    def __init__(self, executor: Optional[Executor] = None) -> None:
+        self._owned = executor is None
+        self._executor = executor if executor is not None else ThreadPoolExecutor(max_workers=1, thread_name_prefix="scenarios")
+        self.generation = 0
+        self._pending: List[Tuple[int, Future]] = []
+
+    def __enter__(self) -> "ScenarioRunner":
+        return self
+
+    def __exit__(self, *_exc) -> None:
+        self.close()
+
+    @property
+    def busy(self) -> bool:
+        return bool(self._pending)
+
+    def cancel(self) -> int:
+        self.generation += 1
+        cancelled = sum(1 for _index, future in self._pending if future.cancel())
+        self._pending = []
+        return cancelled
+
+    def submit(self, values: Dict[str, str], sources: Dict[str, str], scenarios: List[Scenario]) -> int:
+        self.cancel()
+        for index, scenario in enumerate(scenarios):
+            inputs = scenario_inputs(values, sources, scenario.overrides)
+            self._pending.append((index, self._executor.submit(solve_scenario, *inputs)))
+        return self.generation
+
+    def poll(self, budget: float = FRAME_SECONDS) -> List[Tuple[int, CalculationResult]]:
+        # Finished results in submit order, stopping early once `budget` seconds are
+        # spent; the rest are picked up by the next poll.
+        started = time.perf_counter()
+        finished = []
+        waiting = []
+        for position, (index, future) in enumerate(self._pending):
+            if not future.done():
+                waiting.append((index, future))
+                continue
+            finished.append((index, future.result()))
+            if time.perf_counter() - started > budget:
+                waiting.extend(self._pending[position + 1:])
+                break
+        self._pending = waiting
+        return finished
+
+    def close(self) -> None:
+        self.cancel()
+        if self._owned:
+            self._executor.shutdown(wait=False)
@@ -0,0 +1,165 @@
+import csv
+from bisect import bisect_right
+from collections import defaultdict
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .batch import BatchResult, calculate_batch
+from .calculations import FIELD_BITS, parse_float
+
+# Tier used for lines whose tier is empty or not in the schedule, when present.
+DEFAULT_TIER = "*"
+SCHEDULE_COLUMNS = ("tier", "min_quantity", "discount")
+
+
+class DiscountSchedule:
+    # Quantity breaks per customer tier. Every tier shares one ascending list of break
+    # quantities; a tier without its own entry at a break keeps its previous discount.
+    # `_table` has a leading NaN column (below the first break) and a trailing NaN row
+    # (no tier), so resolving a whole batch is one searchsorted and one gather.
+    def __init__(self, entries: Iterable[Tuple[str, float, float]]) -> None:
+        cells: Dict[Tuple[str, float], float] = {}
+        for tier, min_quantity, discount in entries:
+            tier = tier.strip()
+            if min_quantity < 0:
+                raise ValueError(f"Minimum quantity for tier '{tier}' cannot be negative.")
+            if not 0.0 <= discount <= 100.0:
+                raise ValueError(f"Discount for tier '{tier}' must be between 0% and 100%.")
+            if (tier, min_quantity) in cells:
+                raise ValueError(f"Tier '{tier}' has two discounts from quantity {min_quantity:g}.")
+            cells[(tier, min_quantity)] = discount
+        if not cells:
+            raise ValueError("Discount schedule is empty.")
+
+        self.tiers = tuple(sorted({tier for tier, _quantity in cells}))
+        self.breaks = np.array(sorted({quantity for _tier, quantity in cells}), dtype=np.float64)
+        self.codes = {tier: code for code, tier in enumerate(self.tiers)}
+        self._unknown = self.codes.get(DEFAULT_TIER, len(self.tiers))
+
+        table = np.full((len(self.tiers) + 1, len(self.breaks) + 1), np.nan)
+        for (tier, quantity), discount in cells.items():
+            table[self.codes[tier], int(np.searchsorted(self.breaks, quantity)) + 1] = discount
+        for column in range(2, table.shape[1]):
+            empty = np.isnan(table[:, column])
+            table[empty, column] = table[empty, column - 1]
+        self._table = table
+        self._break_list = self.breaks.tolist()
+
+    def __len__(self) -> int:
+        return len(self.tiers)
+
+    def tier_code(self, tier: Optional[str]) -> int:
+        return self.codes.get((tier or "").strip(), self._unknown)
+
+    def tier_codes(self, tiers: Sequence[Optional[str]]) -> np.ndarray:
+        # Integer arrays are taken as codes already; string arrays are binary-searched
+        # in the sorted tier names, and lists go through one dict lookup per line.
+        if isinstance(tiers, np.ndarray) and tiers.dtype.kind in "iu":
+            return tiers.astype(np.intp, copy=False)
+        if isinstance(tiers, np.ndarray) and tiers.dtype.kind == "U":
+            names = np.array(self.tiers)
+            codes = np.minimum(np.searchsorted(names, tiers), len(names) - 1)
+            return np.where(names[codes] == tiers, codes, self._unknown)
+        lookup = defaultdict(lambda: self._unknown, self.codes)
+        return np.fromiter(map(lookup.__getitem__, tiers), dtype=np.intp, count=len(tiers))
+
+    def discount_for(self, quantity: Optional[float], tier: Optional[str]) -> Optional[float]:
+        if quantity is None or quantity != quantity:
+            return None
+        value = self._table[self.tier_code(tier), bisect_right(self._break_list, quantity)]
+        return None if value != value else float(value)
+
+    def resolve(self, quantity, tiers) -> np.ndarray:
+        # Scheduled discount per line, NaN where the schedule has none (no quantity,
+        # below the tier's first break, or an unknown tier without a "*" row).
+        quantity = np.asarray(quantity, dtype=np.float64)
+        codes = self.tier_codes(tiers)
+        if codes.shape != quantity.shape:
+            raise ValueError(f"Tiers must have shape {quantity.shape}.")
+        columns = np.searchsorted(self.breaks, quantity, side="right")
+        columns[np.isnan(quantity)] = 0
+        return self._table[codes, columns]
+
+
+def _read_entries(path: Path, delimiter: Optional[str]) -> Iterable[Tuple[str, float, float]]:
+    with open(path, "r", encoding="utf-8-sig", newline="") as handle:
+        if delimiter is None:
+            first = handle.readline()
+            delimiter = next((candidate for candidate in ";\t" if candidate in first), ",")
+            handle.seek(0)
+        reader = csv.reader(handle, delimiter=delimiter)
+        header = [name.strip().lower() for name in next(reader, [])]
+        # Without a tier column every break applies to all customers.
+        missing = [name for name in SCHEDULE_COLUMNS[1:] if name not in header]
+        if missing:
+            raise ValueError(f"Discount schedule {path} is missing columns: {', '.join(missing)}.")
+        indexes = [header.index(name) if name in header else None for name in SCHEDULE_COLUMNS]
+        entries = []
+        for line, row in enumerate(reader, start=2):
+            if not any(cell.strip() for cell in row):
+                continue
+            try:
+                tier, quantity, discount = (
+                    DEFAULT_TIER if index is None else (row[index] if index < len(row) else "") for index in indexes
+                )
+                quantity = parse_float(quantity)
+                discount = parse_float(discount)
+            except ValueError as exc:
+                raise ValueError(f"{path}, line {line}: {exc}") from None
+            if quantity is None or discount is None:
+                raise ValueError(f"{path}, line {line}: min_quantity and discount are required.")
+            entries.append((tier, quantity, discount))
+        return entries
+
+
+@lru_cache(maxsize=16)
+def _load_schedule(path: str, mtime_ns: int, size: int, delimiter: Optional[str]) -> DiscountSchedule:
+    return DiscountSchedule(_read_entries(Path(path), delimiter))
+
+
+def load_schedule(path, delimiter: Optional[str] = None) -> DiscountSchedule:
+    # Parsed once per file version: the cache key includes the file's mtime and size,
+    # so an edited schedule is picked up and an unchanged one costs a stat(). Without a
+    # delimiter, ';' or a tab in the header line wins over ','.
+    path = Path(path).resolve()
+    stat = path.stat()
+    return _load_schedule(str(path), stat.st_mtime_ns, stat.st_size, delimiter)
+
+
+def schedule_discounts(schedule: DiscountSchedule, quantity, tiers, discount, net2, target_margin, user=None):
+    # Fills the discount column from the schedule where the line has no discount of its
+    # own and nothing (Net2 or a target margin) that the discount would be solved from.
+    # Returns the new discount column, the user bits with those discounts entered, and
+    # the mask of scheduled lines.
+    discount = np.asarray(discount, dtype=np.float64)
+    resolved = schedule.resolve(quantity, tiers)
+    scheduled = (
+        np.isnan(discount)
+        & np.isnan(np.asarray(net2, dtype=np.float64))
+        & np.isnan(np.asarray(target_margin, dtype=np.float64))
+        & ~np.isnan(resolved)
+    )
+    user_bits = np.zeros(len(discount), dtype=np.uint8) if user is None else np.array(user, dtype=np.uint8)
+    user_bits[scheduled] |= FIELD_BITS["discount"]
+    return np.where(scheduled, resolved, discount), user_bits, scheduled
+
+
+def calculate_batch_scheduled(
+    schedule: DiscountSchedule,
+    quantity,
+    tiers,
+    cost,
+    net1,
+    added_value,
+    discount,
+    net2,
+    target_margin,
+    user=None,
+    cache=None,
+) -> Tuple[BatchResult, np.ndarray]:
+    discount, user_bits, scheduled = schedule_discounts(schedule, quantity, tiers, discount, net2, target_margin, user)
+    result = calculate_batch(cost, net1, added_value, discount, net2, target_margin, user=user_bits, cache=cache)
+    return result, scheduled
@@ -0,0 +1,114 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional, Tuple
+
+import numpy as np
+
+from .theme import APP_THEME
+
+DEFAULT_STEPS = 200
+DEFAULT_DISCOUNT_RANGE = (0.0, 40.0)
+DEFAULT_AV_RANGE = (0.0, 100.0)
+
+
+@dataclass
+class SensitivityGrid:
+    # Rows follow added_values, columns follow discounts; m_with is NaN where net2 is 0.
+    cost: float
+    net1: float
+    discounts: np.ndarray
+    added_values: np.ndarray
+    net2: np.ndarray
+    m_with: np.ndarray
+
+    def lookup(self, row: int, column: int) -> Tuple[float, float, float, float]:
+        return (
+            float(self.discounts[column]),
+            float(self.added_values[row]),
+            float(self.net2[row, column]),
+            float(self.m_with[row, column]),
+        )
+
+
+def _check_range(values: Tuple[float, float], name: str, upper: Optional[float]) -> None:
+    low, high = values
+    if low < 0 or (upper is not None and high > upper):
+        limit = f"0 and {upper:g}" if upper is not None else "0 and up"
+        raise ValueError(f"{name} range must lie between {limit}.")
+    if low >= high:
+        raise ValueError(f"{name} range must go from low to high.")
+
+
+def sensitivity_grid(
+    cost: float,
+    net1: float,
+    discount_range: Tuple[float, float] = DEFAULT_DISCOUNT_RANGE,
+    av_range: Tuple[float, float] = DEFAULT_AV_RANGE,
+    steps: int = DEFAULT_STEPS,
+) -> SensitivityGrid:
+    _check_range(discount_range, "Discount", 100.0)
+    _check_range(av_range, "Added value", None)
+    if steps < 2:
+        raise ValueError("Steps must be at least 2.")
+
+    discounts = np.linspace(discount_range[0], discount_range[1], steps)
+    added_values = np.linspace(av_range[0], av_range[1], steps)
+    net2 = (net1 + added_values[:, None]) * (1.0 - discounts[None, :] / 100.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        m_with = ((net2 - cost) / net2) * 100.0
+    m_with[net2 == 0] = np.nan
+    return SensitivityGrid(cost, net1, discounts, added_values, net2, m_with)
+
+
+def _rgb(color: str) -> np.ndarray:
+    return np.array([int(color[index:index + 2], 16) for index in (1, 3, 5)], dtype=np.float64)
+
+
+_BELOW = _rgb(APP_THEME.danger)
+_ABOVE = _rgb(APP_THEME.primary)
+_NEUTRAL = _rgb(APP_THEME.surface)
+_MISSING = _rgb(APP_THEME.border)
+_CONTOUR = _rgb(APP_THEME.text)
+
+
+def heatmap_rgb(grid: SensitivityGrid, target_margin: Optional[float] = None, span: float = 25.0) -> np.ndarray:
+    # Colors run from danger (below the target) through white to primary (above it);
+    # the target-margin contour is drawn where neighbouring cells cross the target.
+    center = 0.0 if target_margin is None else target_margin
+    margin = grid.m_with
+    missing = np.isnan(margin)
+    weight = np.clip(np.nan_to_num(margin - center) / span, -1.0, 1.0)[..., None]
+    rgb = np.where(weight < 0, _NEUTRAL + (_BELOW - _NEUTRAL) * -weight, _NEUTRAL + (_ABOVE - _NEUTRAL) * weight)
+    rgb[missing] = _MISSING
+
+    if target_margin is not None:
+        above = margin >= target_margin
+        edge = np.zeros(above.shape, dtype=bool)
+        edge[:, 1:] |= above[:, 1:] != above[:, :-1]
+        edge[1:, :] |= above[1:, :] != above[:-1, :]
+        rgb[edge & ~missing] = _CONTOUR
+
+    # Highest added value on top.
+    return rgb[::-1].astype(np.uint8)
+
+
+def to_ppm(rgb: np.ndarray, scale: int = 1) -> bytes:
+    if scale > 1:
+        rgb = np.repeat(np.repeat(rgb, scale, axis=0), scale, axis=1)
+    height, width = rgb.shape[:2]
+    return b"P6 %d %d 255\n" % (width, height) + np.ascontiguousarray(rgb).tobytes()
+
+
+@lru_cache(maxsize=32)
+def render_heatmap(
+    cost: float,
+    net1: float,
+    discount_range: Tuple[float, float] = DEFAULT_DISCOUNT_RANGE,
+    av_range: Tuple[float, float] = DEFAULT_AV_RANGE,
+    target_margin: Optional[float] = None,
+    steps: int = DEFAULT_STEPS,
+    scale: int = 2,
+) -> Tuple[SensitivityGrid, bytes]:
+    # Cached per base quote; the returned grid and image are shared and must not be modified.
+    grid = sensitivity_grid(cost, net1, discount_range, av_range, steps)
+    return grid, to_ppm(heatmap_rgb(grid, target_margin), scale)
@@ -0,0 +1,182 @@
+import time
+import tkinter as tk
+from typing import Dict, Optional, Tuple
+
+from .calculations import fmt_money, fmt_pct, parse_float
+from .sensitivity import DEFAULT_AV_RANGE, DEFAULT_DISCOUNT_RANGE, DEFAULT_STEPS, SensitivityGrid, render_heatmap
+from .theme import APP_THEME, FONT_BODY, FONT_SECTION, FONT_SMALL, SPACING_SM, SPACING_XS
+
+_AXIS = 44
+
+
+class SensitivityPanel:
+    def __init__(
+        self,
+        parent: tk.Frame,
+        *,
+        background: str = APP_THEME.surface,
+        steps: int = DEFAULT_STEPS,
+        scale: int = 2,
+    ) -> None:
+        self.steps = steps
+        self.scale = scale
+        self.size = steps * scale
+        self.grid_data: Optional[SensitivityGrid] = None
+        self.last_render_seconds = 0.0
+        self._key: Optional[Tuple] = None
+        self._values: Dict[str, str] = {}
+
+        self.container = tk.Frame(parent, bg=background)
+        title = tk.Label(self.container, text="Sensitivity", font=FONT_SECTION, bg=background, fg=APP_THEME.text)
+        title.pack(anchor="w", pady=(0, SPACING_SM))
+
+        ranges = tk.Frame(self.container, bg=background)
+        ranges.pack(anchor="w", pady=(0, SPACING_SM))
+        self.range_vars = {
+            "discount_from": tk.StringVar(value=f"{DEFAULT_DISCOUNT_RANGE[0]:g}"),
+            "discount_to": tk.StringVar(value=f"{DEFAULT_DISCOUNT_RANGE[1]:g}"),
+            "av_from": tk.StringVar(value=f"{DEFAULT_AV_RANGE[0]:g}"),
+            "av_to": tk.StringVar(value=f"{DEFAULT_AV_RANGE[1]:g}"),
+        }
+        for row, (label, low, high) in enumerate(
+            (("Discount (%)", "discount_from", "discount_to"), ("Added Value (€)", "av_from", "av_to"))
+        ):
+            tk.Label(ranges, text=label, font=FONT_SMALL, bg=background, fg=APP_THEME.muted).grid(
+                row=row, column=0, sticky="w"
+            )
+            for column, key in ((1, low), (2, high)):
+                entry = tk.Entry(ranges, textvariable=self.range_vars[key], width=7, font=FONT_BODY, relief="solid", bd=1)
+                entry.grid(row=row, column=column, padx=(SPACING_XS, 0), pady=2)
+                entry.bind("<Return>", lambda _event: self.refresh())
+                entry.bind("<FocusOut>", lambda _event: self.refresh())
+
+        self.canvas = tk.Canvas(
+            self.container,
+            width=self.size + _AXIS,
+            height=self.size + _AXIS // 2,
+            bg=background,
+            highlightthickness=0,
+        )
+        self.canvas.pack(anchor="w")
+        self.image = None
+        try:
+            self.image = tk.PhotoImage(width=self.size, height=self.size)
+            self.canvas.create_image(_AXIS, 0, image=self.image, anchor="nw")
+        except tk.TclError:
+            pass
+        self.marker_h = self.canvas.create_line(0, 0, 0, 0, fill=APP_THEME.text, state="hidden")
+        self.marker_v = self.canvas.create_line(0, 0, 0, 0, fill=APP_THEME.text, state="hidden")
+        bottom = self.size + 2
+        self.axis_labels = {
+            "discount_from": self.canvas.create_text(_AXIS, bottom, anchor="nw", font=FONT_SMALL, fill=APP_THEME.muted),
+            "discount_to": self.canvas.create_text(
+                _AXIS + self.size, bottom, anchor="ne", font=FONT_SMALL, fill=APP_THEME.muted
+            ),
+            "av_to": self.canvas.create_text(_AXIS - 4, 0, anchor="ne", font=FONT_SMALL, fill=APP_THEME.muted),
+            "av_from": self.canvas.create_text(_AXIS - 4, self.size, anchor="se", font=FONT_SMALL, fill=APP_THEME.muted),
+        }
+        self.canvas.bind("<Motion>", self._on_motion)
+
+        self.info = tk.Label(
+            self.container,
+            text="",
+            font=FONT_SMALL,
+            bg=background,
+            fg=APP_THEME.muted,
+            justify="left",
+            anchor="w",
+            width=60,
+        )
+        self.info.pack(anchor="w", pady=(SPACING_XS, 0))
+
+    def pack(self, **kwargs) -> None:
+        self.container.pack(**kwargs)
+
+    def pack_forget(self) -> None:
+        self.container.pack_forget()
+
+    def _ranges(self) -> Tuple[Tuple[float, float], Tuple[float, float]]:
+        numbers = {key: parse_float(variable.get()) for key, variable in self.range_vars.items()}
+        if any(value is None for value in numbers.values()):
+            raise ValueError("Enter all four range limits.")
+        return (numbers["discount_from"], numbers["discount_to"]), (numbers["av_from"], numbers["av_to"])
+
+    def update(self, values: Dict[str, str]) -> None:
+        # Called with the solved field values after every calculation.
+        self._values = dict(values)
+        self.refresh()
+
+    def refresh(self) -> None:
+        started = time.perf_counter()
+        try:
+            cost = parse_float(self._values.get("cost", ""))
+            net1 = parse_float(self._values.get("net1", ""))
+            target = parse_float(self._values.get("target_margin", ""))
+            discount_range, av_range = self._ranges()
+            if cost is None or net1 is None:
+                raise ValueError("Calculate a quote with cost and net1 to see the margin surface.")
+            key = (cost, net1, discount_range, av_range, target)
+            if key != self._key:
+                self.grid_data, ppm = render_heatmap(
+                    cost, net1, discount_range, av_range, target, self.steps, self.scale
+                )
+                if self.image is not None:
+                    self.image.configure(data=ppm)
+                self._key = key
+                self._draw_axes(discount_range, av_range)
+        except ValueError as exc:
+            self._key = None
+            self.grid_data = None
+            self.canvas.itemconfigure(self.marker_h, state="hidden")
+            self.canvas.itemconfigure(self.marker_v, state="hidden")
+            if self.image is not None:
+                self.image.blank()
+            self.info.configure(text=str(exc))
+            return
+
+        self._place_marker(discount_range, av_range)
+        self.last_render_seconds = time.perf_counter() - started
+        legend = "Blue: above target margin, red: below; black line marks the target." if target is not None else (
+            "Blue: positive margin, red: negative margin."
+        )
+        self.info.configure(text=legend)
+
+    def _draw_axes(self, discount_range: Tuple[float, float], av_range: Tuple[float, float]) -> None:
+        texts = {
+            "discount_from": f"{discount_range[0]:g}%",
+            "discount_to": f"{discount_range[1]:g}%",
+            "av_from": f"€{av_range[0]:g}",
+            "av_to": f"€{av_range[1]:g}",
+        }
+        for key, text in texts.items():
+            self.canvas.itemconfigure(self.axis_labels[key], text=text)
+
+    def _place_marker(self, discount_range: Tuple[float, float], av_range: Tuple[float, float]) -> None:
+        discount = parse_float(self._values.get("discount", "")) or 0.0
+        added_value = parse_float(self._values.get("added_value", "")) or 0.0
+        x = _AXIS + (discount - discount_range[0]) / (discount_range[1] - discount_range[0]) * self.size
+        y = self.size - (added_value - av_range[0]) / (av_range[1] - av_range[0]) * self.size
+        if _AXIS <= x <= _AXIS + self.size and 0 <= y <= self.size:
+            self.canvas.coords(self.marker_h, x - 6, y, x + 7, y)
+            self.canvas.coords(self.marker_v, x, y - 6, x, y + 7)
+            state = "normal"
+        else:
+            state = "hidden"
+        self.canvas.itemconfigure(self.marker_h, state=state)
+        self.canvas.itemconfigure(self.marker_v, state=state)
+
+    def _on_motion(self, event) -> None:
+        if self.grid_data is None:
+            return
+        column = int((event.x - _AXIS) // self.scale)
+        row = self.steps - 1 - int(event.y // self.scale)
+        if not (0 <= column < self.steps and 0 <= row < self.steps):
+            return
+        discount, added_value, net2, m_with = self.grid_data.lookup(row, column)
+        margin = "—" if m_with != m_with else f"{fmt_pct(m_with)}%"
+        self.info.configure(
+            text=(
+                f"Discount {fmt_pct(discount)}%, Added Value €{fmt_money(added_value)}: "
+                f"Net2 €{fmt_money(net2)}, margin {margin}"
+            )
+        )
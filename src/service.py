@@ -0,0 +1,341 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .calculations import FIELD_NAMES, calculate_all, detach_hooks
+from .instrumentation import LatencyHistogram
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+DEFAULT_MAX_CONCURRENCY = 64
+DEFAULT_MAX_QUEUE = 1024
+DEFAULT_OFFLOAD_THRESHOLD = 256
+DEFAULT_MAX_BODY = 16 * 1024 * 1024
+DEFAULT_IDLE_TIMEOUT = 30.0
+
+ROUTES = ("/health", "/metrics", "/v1/quote", "/v1/batch")
+
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    411: "Length Required",
+    413: "Payload Too Large",
+    503: "Service Unavailable",
+}
+
+
+class RequestError(ValueError):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+def _parse_quote(item) -> Tuple[Dict[str, str], Dict[str, str]]:
+    # {"values": {"cost": "80", ...}, "sources": {"cost": "user", ...}}; numbers are
+    # accepted for values, and sources default to "user" for every value given.
+    if not isinstance(item, dict) or not isinstance(item.get("values"), dict):
+        raise RequestError(400, "Each quote needs a 'values' object.")
+    values = {name: "" for name in FIELD_NAMES}
+    for name, value in item["values"].items():
+        if name not in FIELD_NAMES:
+            raise RequestError(400, f"Unknown field: {name}")
+        values[name] = "" if value is None else str(value)
+    sources = item.get("sources")
+    if sources is None:
+        sources = {name: "user" for name, value in values.items() if value.strip()}
+    elif not isinstance(sources, dict):
+        raise RequestError(400, "'sources' must be an object.")
+    return values, {name: str(source) for name, source in sources.items()}
+
+
+def _solve(item) -> dict:
+    values, sources = _parse_quote(item)
+    result = calculate_all(values, sources)
+    return {"values": result.values, "sources": result.sources, "status": result.status}
+
+
+def _solve_many(items: List[dict]) -> List[dict]:
+    results = []
+    for item in items:
+        try:
+            results.append(_solve(item))
+        except RequestError as exc:
+            results.append({"error": str(exc)})
+    return results
+
+
+class ServiceMetrics:
+    def __init__(self) -> None:
+        self.started = time.time()
+        self.requests: Counter = Counter()
+        self.responses: Counter = Counter()
+        self.latency: Dict[str, LatencyHistogram] = {}
+        self.quotes = 0
+        self.offloaded_batches = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self.connections = 0
+
+    def record(self, route: str, status: int, seconds: float, quotes: int = 0) -> None:
+        self.requests[route] += 1
+        self.responses[status] += 1
+        self.latency.setdefault(route, LatencyHistogram()).add(seconds)
+        self.quotes += quotes
+
+    def as_dict(self) -> dict:
+        uptime = time.time() - self.started
+        total = sum(self.requests.values())
+        return {
+            "uptime_seconds": uptime,
+            "requests": dict(self.requests),
+            "responses": {str(status): count for status, count in sorted(self.responses.items())},
+            "requests_per_second": total / uptime if uptime else None,
+            "quotes": self.quotes,
+            "quotes_per_second": self.quotes / uptime if uptime else None,
+            "offloaded_batches": self.offloaded_batches,
+            "rejected": self.rejected,
+            "in_flight": self.in_flight,
+            "open_connections": self.connections,
+            "latency_seconds": {route: histogram.as_dict() for route, histogram in sorted(self.latency.items())},
+        }
+
+
+class PricingService:
+    def __init__(
+        self,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        workers: Optional[int] = None,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        offload_threshold: int = DEFAULT_OFFLOAD_THRESHOLD,
+        max_body: int = DEFAULT_MAX_BODY,
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+    ) -> None:
+        if max_concurrency < 1:
+            raise ValueError("Max concurrency must be at least 1.")
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.offload_threshold = offload_threshold
+        self.max_body = max_body
+        self.idle_timeout = idle_timeout
+        self.metrics = ServiceMetrics()
+        self._limit: Optional[asyncio.Semaphore] = None
+        self._waiting = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: Dict[asyncio.Task, asyncio.StreamWriter] = {}
+
+    async def start(self) -> None:
+        self._limit = asyncio.Semaphore(self.max_concurrency)
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            # Open keep-alive connections are closed so their handlers finish normally.
+            for writer in list(self._connections.values()):
+                writer.close()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.metrics.connections += 1
+        task = asyncio.current_task()
+        self._connections[task] = writer
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), self.idle_timeout)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line:
+                    break
+                started = time.perf_counter()
+                keep_alive, route, status, payload, quotes = await self._handle_request(request_line, reader)
+                body = json.dumps(payload).encode("utf-8")
+                writer.write(
+                    (
+                        f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                        "Content-Type: application/json\r\n"
+                        f"Content-Length: {len(body)}\r\n"
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                    ).encode("latin-1")
+                    + body
+                )
+                await writer.drain()
+                self.metrics.record(route, status, time.perf_counter() - started, quotes)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.metrics.connections -= 1
+            del self._connections[task]
+            writer.close()
+
+    async def _handle_request(self, request_line: bytes, reader: asyncio.StreamReader):
+        # Returns (keep_alive, route, status, payload, quotes solved).
+        try:
+            method, target, version = request_line.decode("latin-1").split()
+        except ValueError:
+            return False, "other", 400, {"error": "Malformed request line."}, 0
+
+        headers: Dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+        route = target.split("?", 1)[0]
+        if route not in ROUTES:
+            route = "other"
+
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            return False, route, 411, {"error": "Chunked bodies are not supported; send Content-Length."}, 0
+        try:
+            length = int(headers.get("content-length", "0") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            return False, route, 400, {"error": "Invalid Content-Length."}, 0
+        if length > self.max_body:
+            return False, route, 413, {"error": f"Body larger than {self.max_body} bytes."}, 0
+        body = await reader.readexactly(length) if length else b""
+
+        try:
+            status, payload, quotes = await self._dispatch(method, route, body)
+        except RequestError as exc:
+            status, payload, quotes = exc.status, {"error": str(exc)}, 0
+        return keep_alive, route, status, payload, quotes
+
+    async def _dispatch(self, method: str, route: str, body: bytes) -> Tuple[int, dict, int]:
+        if route == "/health":
+            return 200, {"status": "ok"}, 0
+        if route == "/metrics":
+            return 200, self.metrics.as_dict(), 0
+        if route == "other":
+            raise RequestError(404, "No such endpoint.")
+        if method != "POST":
+            raise RequestError(405, "Use POST.")
+        try:
+            document = json.loads(body or b"null")
+        except ValueError:
+            raise RequestError(400, "Body is not valid JSON.") from None
+
+        if self._waiting >= self.max_queue:
+            self.metrics.rejected += 1
+            raise RequestError(503, "Too many requests in progress.")
+        self._waiting += 1
+        try:
+            async with self._limit:
+                self.metrics.in_flight += 1
+                try:
+                    if route == "/v1/quote":
+                        return 200, _solve(document), 1
+                    if not isinstance(document, dict) or not isinstance(document.get("quotes"), list):
+                        raise RequestError(400, "Batch body needs a 'quotes' list.")
+                    results = await self._solve_batch(document["quotes"])
+                    return 200, {"results": results}, len(results)
+                finally:
+                    self.metrics.in_flight -= 1
+        finally:
+            self._waiting -= 1
+
+    async def _solve_batch(self, items: List[dict]) -> List[dict]:
+        # Small batches are solved inline; large ones are split across the process pool
+        # so the event loop keeps serving other connections. Pool workers run without
+        # the tracer and journal, so offloaded quotes are not journaled.
+        if len(items) < self.offload_threshold:
+            return _solve_many(items)
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=detach_hooks)
+        loop = asyncio.get_running_loop()
+        step = max(self.offload_threshold, -(-len(items) // self.workers))
+        chunks = await asyncio.gather(
+            *(
+                loop.run_in_executor(self._executor, _solve_many, items[start:start + step])
+                for start in range(0, len(items), step)
+            )
+        )
+        self.metrics.offloaded_batches += 1
+        return [result for chunk in chunks for result in chunk]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve margin calculations over HTTP/JSON.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"Bind address (default: {DEFAULT_HOST}).")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port (default: {DEFAULT_PORT}).")
+    parser.add_argument("--workers", type=int, help="Processes for large batches (default: cpu count).")
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=DEFAULT_MAX_CONCURRENCY,
+        help=f"Requests solved at once (default: {DEFAULT_MAX_CONCURRENCY}).",
+    )
+    parser.add_argument(
+        "--max-queue",
+        type=int,
+        default=DEFAULT_MAX_QUEUE,
+        help=f"Requests allowed to wait before answering 503 (default: {DEFAULT_MAX_QUEUE}).",
+    )
+    parser.add_argument(
+        "--offload-threshold",
+        type=int,
+        default=DEFAULT_OFFLOAD_THRESHOLD,
+        help=f"Batch size that moves to the process pool (default: {DEFAULT_OFFLOAD_THRESHOLD}).",
+    )
+    args = parser.parse_args(argv)
+
+    service = PricingService(
+        args.host,
+        args.port,
+        workers=args.workers,
+        max_concurrency=args.max_concurrency,
+        max_queue=args.max_queue,
+        offload_threshold=args.offload_threshold,
+    )
+
+    async def run() -> None:
+        await service.start()
+        sys.stderr.write(f"Serving on http://{service.host}:{service.port}\n")
+        try:
+            await service.serve_forever()
+        finally:
+            await service.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
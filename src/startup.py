@@ -0,0 +1,115 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Sequence
+
+from .assets import ASSET_ROOT
+
+PHASES = ("interpreter", "import", "construct", "first_paint")
+_CHILD = "from src.startup import _measure_child; _measure_child()"
+
+
+def _measure_child() -> None:
+    # Runs in a fresh interpreter, so the import phase is a real cold import.
+    started = time.perf_counter()
+    from . import app
+
+    imported = time.perf_counter()
+    timings: Dict[str, Optional[float]] = {"import": imported - started}
+    try:
+        root = app.tk.Tk()
+    except app.tk.TclError:
+        root = None
+
+    if root is None:
+        from .benchmark import fake_tk
+
+        with fake_tk() as fake:
+            constructing = time.perf_counter()
+            app.MarginCalculatorApp(fake.Tk())
+            timings["construct"] = time.perf_counter() - constructing
+        timings["first_paint"] = None
+        backend = "mock"
+    else:
+        app.MarginCalculatorApp(root)
+        constructed = time.perf_counter()
+        timings["construct"] = constructed - imported
+        deadline = constructed + 10.0
+        root.update()
+        while not root.winfo_ismapped() and time.perf_counter() < deadline:
+            root.update()
+        root.update_idletasks()
+        timings["first_paint"] = time.perf_counter() - constructed
+        root.destroy()
+        backend = "tk"
+    sys.stdout.write(json.dumps({"backend": backend, **timings}) + "\n")
+
+
+def measure_startup(runs: int = 5, cold_logo: bool = False) -> dict:
+    # Each run is a new process; the interpreter phase is whatever the parent saw
+    # beyond the child's own import, construct and paint time.
+    samples: Dict[str, List[float]] = {phase: [] for phase in PHASES}
+    backend = None
+    environment = dict(os.environ)
+    environment["PYTHONPATH"] = os.pathsep.join(filter(None, (str(ASSET_ROOT), environment.get("PYTHONPATH"))))
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as scratch:
+            if cold_logo:
+                environment["MARGIN_CALCULATOR_CACHE"] = scratch
+            started = time.perf_counter()
+            output = subprocess.run(
+                [sys.executable, "-c", _CHILD],
+                cwd=scratch,
+                env=environment,
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            wall = time.perf_counter() - started
+        child = json.loads(output.strip().splitlines()[-1])
+        backend = child.pop("backend")
+        measured = sum(value for value in child.values() if value is not None)
+        samples["interpreter"].append(wall - measured)
+        for phase, value in child.items():
+            if value is not None:
+                samples[phase].append(value)
+    return {
+        "backend": backend,
+        "runs": runs,
+        "cold_logo": cold_logo,
+        "median_seconds": {phase: statistics.median(values) if values else None for phase, values in samples.items()},
+    }
+
+
+def format_startup(report: dict) -> str:
+    lines = [f"backend: {report['backend']}, runs: {report['runs']}, cold logo cache: {report['cold_logo']}"]
+    total = 0.0
+    for phase, seconds in report["median_seconds"].items():
+        if seconds is None:
+            lines.append(f"{phase:<12} {'n/a':>10}")
+            continue
+        total += seconds
+        lines.append(f"{phase:<12} {seconds * 1000:>8.1f}ms")
+    lines.append(f"{'total':<12} {total * 1000:>8.1f}ms")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure calculator cold-start time per phase.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes to start (default: 5).")
+    parser.add_argument("--cold-logo", action="store_true", help="Start every run with an empty logo cache.")
+    parser.add_argument("--json", action="store_true", help="Print JSON instead of a table.")
+    args = parser.parse_args(argv)
+
+    report = measure_startup(args.runs, args.cold_logo)
+    sys.stdout.write((json.dumps(report, indent=2) if args.json else format_startup(report)) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
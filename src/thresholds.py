@@ -0,0 +1,170 @@
+import math
+from bisect import bisect_right, insort
+from typing import Dict, List, Optional
+
+import numpy as np
+
+DEFAULT_MERGE_THRESHOLD = 4096
+
+
+def percent_fraction(value: float, name: str) -> float:
+    if not 0.0 <= value < 100.0:
+        raise ValueError(f"{name} must be at least 0% and below 100%.")
+    return value / 100.0
+
+
+def cost_ratio(cost, net1, added_value) -> np.ndarray:
+    # With cost, net1 and added value fixed, margin on Net2 at discount d is
+    # 1 - r / (1 - d) for r = cost / (net1 + added value), so one sorted r answers
+    # every floor and discount. Missing added value counts as 0, as in the solve;
+    # SKUs without cost or net1 get NaN and are left out, and net1 + added value of
+    # 0 gets +inf (Net2 is 0, so there is no margin to reach a floor with).
+    cost = np.asarray(cost, dtype=np.float64)
+    base = np.asarray(net1, dtype=np.float64) + np.nan_to_num(np.asarray(added_value, dtype=np.float64), nan=0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = cost / base
+    return np.where(base != 0, ratio, np.where(np.isnan(cost), np.nan, np.inf))
+
+
+def _row_ratio(cost: float, net1: float, added_value: float) -> float:
+    # cost_ratio for one row, without numpy's per-call overhead.
+    base = net1 + (0.0 if added_value != added_value else added_value)
+    if cost != cost or base != base:
+        return math.nan
+    return cost / base if base != 0 else math.inf
+
+
+class DiscountThresholdIndex:
+    # Rows are catalog positions 0..n-1. The bulk of the index is one sorted array of
+    # ratios; changed rows are tombstoned there and kept in a small sorted delta until
+    # it outgrows `merge_threshold`, so an update never shifts the large array.
+    def __init__(self, cost, net1, added_value=None, *, merge_threshold: int = DEFAULT_MERGE_THRESHOLD) -> None:
+        self.cost = np.array(cost, dtype=np.float64)
+        size = len(self.cost)
+        self.net1 = np.array(net1, dtype=np.float64)
+        self.added_value = np.full(size, np.nan) if added_value is None else np.array(added_value, dtype=np.float64)
+        if self.cost.ndim != 1 or self.net1.shape != (size,) or self.added_value.shape != (size,):
+            raise ValueError(f"Cost, net1 and added value must be one-dimensional with {size} rows.")
+        if merge_threshold < 1:
+            raise ValueError("Merge threshold must be at least 1.")
+        self.merge_threshold = merge_threshold
+        self.ratio = cost_ratio(self.cost, self.net1, self.added_value)
+        self._build()
+
+    def __len__(self) -> int:
+        return len(self.ratio)
+
+    def _build(self) -> None:
+        indexed = np.flatnonzero(~np.isnan(self.ratio))
+        order = np.argsort(self.ratio[indexed], kind="stable")
+        self._reset(indexed[order])
+
+    def _merge(self) -> None:
+        # Both sides are already sorted, so this is a linear merge rather than a sort.
+        live = ~self._stale
+        rows = self._rows[live]
+        ratios = self._sorted[live]
+        if self._delta_sorted:
+            extra_ratios = np.array([ratio for ratio, _row in self._delta_sorted])
+            extra_rows = np.array([row for _ratio, row in self._delta_sorted], dtype=rows.dtype)
+            rows = np.insert(rows, np.searchsorted(ratios, extra_ratios, side="right"), extra_rows)
+        self._reset(rows)
+
+    def _reset(self, rows: np.ndarray) -> None:
+        self._rows = rows
+        self._sorted = self.ratio[rows]
+        self._position = np.full(len(self.ratio), -1, dtype=np.int64)
+        self._position[self._rows] = np.arange(len(self._rows))
+        self._stale = np.zeros(len(self._rows), dtype=bool)
+        self._stale_positions: List[int] = []
+        self._delta: Dict[int, float] = {}
+        self._delta_sorted: List[tuple] = []
+
+    @property
+    def indexed(self) -> int:
+        return len(self._rows) - len(self._stale_positions) + len(self._delta_sorted)
+
+    def update(
+        self,
+        row: int,
+        cost: Optional[float] = None,
+        net1: Optional[float] = None,
+        added_value: Optional[float] = None,
+    ) -> None:
+        # Only the given fields change; pass NaN to clear one.
+        if not 0 <= row < len(self.ratio):
+            raise ValueError(f"Row {row} is outside the catalog.")
+        for column, value in ((self.cost, cost), (self.net1, net1), (self.added_value, added_value)):
+            if value is not None:
+                column[row] = value
+        ratio = _row_ratio(float(self.cost[row]), float(self.net1[row]), float(self.added_value[row]))
+        self.ratio[row] = ratio
+
+        position = int(self._position[row])
+        if position >= 0 and not self._stale[position]:
+            self._stale[position] = True
+            insort(self._stale_positions, position)
+        previous = self._delta.pop(row, None)
+        if previous is not None:
+            self._delta_sorted.remove((previous, row))
+        if ratio == ratio:
+            self._delta[row] = ratio
+            insort(self._delta_sorted, (ratio, row))
+        if len(self._delta) + len(self._stale_positions) > self.merge_threshold:
+            self._merge()
+
+    def _cut(self, floor: float, discount: float) -> float:
+        # Margin < floor exactly when ratio > (1 - floor) * (1 - discount).
+        return (1.0 - percent_fraction(floor, "Margin floor")) * (1.0 - percent_fraction(discount, "Discount"))
+
+    def below_floor(self, discount: float, floor: float = 25.0) -> np.ndarray:
+        # Rows whose margin on Net2 at `discount` percent is under `floor` percent.
+        cut = self._cut(floor, discount)
+        start = int(np.searchsorted(self._sorted, cut, side="right"))
+        rows = self._rows[start:]
+        if self._stale_positions and self._stale_positions[-1] >= start:
+            rows = rows[~self._stale[start:]]
+        if self._delta_sorted:
+            first = bisect_right(self._delta_sorted, (cut, np.iinfo(np.int64).max))
+            extra = [row for _ratio, row in self._delta_sorted[first:]]
+            rows = np.concatenate([rows, np.array(extra, dtype=rows.dtype)])
+        return rows
+
+    def count_below(self, discount: float, floor: float = 25.0) -> int:
+        cut = self._cut(floor, discount)
+        start = int(np.searchsorted(self._sorted, cut, side="right"))
+        stale = len(self._stale_positions) - bisect_right(self._stale_positions, start - 1)
+        delta = len(self._delta_sorted) - bisect_right(self._delta_sorted, (cut, np.iinfo(np.int64).max))
+        return len(self._rows) - start - stale + delta
+
+    def _largest(self, count: int) -> List[float]:
+        # The `count` largest live ratios, largest first.
+        found: List[float] = []
+        position = len(self._rows) - 1
+        while len(found) < count and position >= 0:
+            if not self._stale[position]:
+                found.append(float(self._sorted[position]))
+            position -= 1
+        found.extend(ratio for ratio, _row in self._delta_sorted[-count:])
+        return sorted(found, reverse=True)[:count]
+
+    def max_discount(self, floor: float = 25.0, allowed_below: int = 0) -> Optional[float]:
+        # The largest discount (percent) at which at most `allowed_below` SKUs miss the
+        # floor. None when even 0% leaves more than that below it.
+        keep = 1.0 - percent_fraction(floor, "Margin floor")
+        largest = self._largest(allowed_below + 1)
+        if len(largest) <= allowed_below:
+            return 100.0
+        discount = 1.0 - largest[allowed_below] / keep
+        if discount < 0:
+            return None
+        return min(discount, 1.0) * 100.0
+
+    def break_even(self, floor: float = 25.0, rows=None) -> np.ndarray:
+        # Per SKU, the highest discount keeping margin >= floor; NaN when none does
+        # (or the SKU is not indexed), capped at 100.
+        keep = 1.0 - percent_fraction(floor, "Margin floor")
+        ratio = self.ratio if rows is None else self.ratio[rows]
+        with np.errstate(invalid="ignore"):
+            discount = (1.0 - ratio / keep) * 100.0
+            return np.where(discount >= 0, np.minimum(discount, 100.0), np.nan)
@@ -0,0 +1,622 @@
+import argparse
+import codecs
+import csv
+import io
+import json
+import mmap
+import os
+import sys
+import time
+from dataclasses import dataclass
+from hashlib import blake2b
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .calculations import INPUT_FIELDS
+from .reprice import Layout, failed_rows, format_chunk, parse_chunk, parse_mapping, plan_layout, solve_chunk
+from .schedules import DiscountSchedule, load_schedule
+
+INDEX_VERSION = 2
+DEFAULT_POLL_SECONDS = 5.0
+DEFAULT_CHUNK_SIZE = 50_000
+_BLOCK_BYTES = 1 << 23
+
+# XXH64 constants; row_digests runs its round and avalanche over whole blocks.
+_PRIME1 = np.uint64(0x9E3779B185EBCA87)
+_PRIME2 = np.uint64(0xC2B2AE3D27D4EB4F)
+_PRIME3 = np.uint64(0x165667B19E3779F9)
+_TAIL_MASKS = np.array([(1 << (8 * size)) - 1 for size in range(8)], dtype=np.uint64)
+
+
+@dataclass
+class IncrementalSummary:
+    rows: int
+    changed: int
+    removed: int
+    failed: int
+    full: bool
+    seconds: float
+
+    def describe(self) -> str:
+        mode = "full" if self.full else "incremental"
+        return (
+            f"{self.rows:,} rows ({mode}): {self.changed:,} new or changed, {self.removed:,} removed, "
+            f"{self.failed:,} with status, {self.seconds:.1f}s"
+        )
+
+
+def index_path(output) -> Path:
+    return Path(str(output) + ".digests.npz")
+
+
+def row_digests(data: bytes, starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    # 64-bit digest of each raw row (line ending included) of a block, eight bytes at a
+    # time for all rows at once. The block is viewed as overlapping unaligned words,
+    # so word j of every row is one gather; rows are ordered by length so each step
+    # only touches rows that still have bytes left.
+    padded = np.frombuffer(data + bytes(8), dtype=np.uint8)
+    words = np.ndarray(shape=(len(data) + 1,), dtype="<u8", buffer=padded, strides=(1,))
+    # Lengths as uint32 sort by radix.
+    order = np.argsort(lengths.astype(np.uint32), kind="stable")
+    sizes = lengths[order].astype(np.int64)
+    positions = starts[order].astype(np.int64)
+    state = sizes.astype(np.uint64) * _PRIME3
+    longest = int(sizes[-1]) if len(sizes) else 0
+    for offset in range(0, longest, 8):
+        first = int(np.searchsorted(sizes, offset, side="right"))
+        word = words[positions[first:] + offset]
+        left = sizes[first:] - offset
+        tail = left < 8
+        if tail.any():
+            word[tail] &= _TAIL_MASKS[left[tail]]
+        lane = state[first:] + word * _PRIME2
+        state[first:] = ((lane << np.uint64(31)) | (lane >> np.uint64(33))) * _PRIME1
+    state ^= state >> np.uint64(33)
+    state *= _PRIME2
+    state ^= state >> np.uint64(29)
+    state *= _PRIME3
+    state ^= state >> np.uint64(32)
+    digests = np.empty(len(state), dtype="<u8")
+    digests[order] = state
+    return digests
+
+
+class DigestIndex:
+    # Digests of the input rows of the last run, sorted, with the byte range of each
+    # row's line in that run's output and whether that line has a status. `settings` fingerprints everything besides
+    # the row that shapes the output (header, mapping, options, schedule); the output
+    # file's size and mtime tie the index to the exact file it describes.
+    def __init__(
+        self,
+        digests: np.ndarray,
+        offsets: np.ndarray,
+        lengths: np.ndarray,
+        failed: np.ndarray,
+        settings: str,
+        output_size: int = -1,
+        output_mtime_ns: int = -1,
+        source_mtime_ns: int = -1,
+    ) -> None:
+        self.digests = digests
+        self.offsets = offsets
+        self.lengths = lengths
+        self.failed = failed
+        self.settings = settings
+        self.output_size = output_size
+        self.output_mtime_ns = output_mtime_ns
+        self.source_mtime_ns = source_mtime_ns
+        self._buckets: Optional[np.ndarray] = None
+        self._shift = np.uint64(63)
+
+    def __len__(self) -> int:
+        return len(self.digests)
+
+    @classmethod
+    def empty(cls, settings: str = "") -> "DigestIndex":
+        return cls(
+            np.empty(0, dtype="<u8"),
+            np.empty(0, dtype=np.int64),
+            np.empty(0, dtype=np.uint32),
+            np.empty(0, dtype=bool),
+            settings,
+        )
+
+    @classmethod
+    def load(cls, path) -> Optional["DigestIndex"]:
+        # None when missing or unreadable; the caller then does a full run.
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                meta = json.loads(bytes(data["meta"]).decode("utf-8"))
+                if meta.get("version") != INDEX_VERSION:
+                    return None
+                return cls(
+                    data["digests"],
+                    data["offsets"],
+                    data["lengths"],
+                    data["failed"],
+                    meta["settings"],
+                    meta["output_size"],
+                    meta["output_mtime_ns"],
+                    meta["source_mtime_ns"],
+                )
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def save(self, path) -> None:
+        meta = {
+            "version": INDEX_VERSION,
+            "settings": self.settings,
+            "output_size": self.output_size,
+            "output_mtime_ns": self.output_mtime_ns,
+            "source_mtime_ns": self.source_mtime_ns,
+        }
+        path = Path(path)
+        scratch = path.with_name(path.name + ".tmp")
+        with open(scratch, "wb") as handle:
+            np.savez(
+                handle,
+                digests=self.digests,
+                offsets=self.offsets,
+                lengths=self.lengths,
+                failed=self.failed,
+                meta=np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8),
+            )
+        os.replace(scratch, path)
+
+    def matches(self, settings: str, output: Path) -> bool:
+        try:
+            stat = output.stat()
+        except OSError:
+            return False
+        return settings == self.settings and (stat.st_size, stat.st_mtime_ns) == (self.output_size, self.output_mtime_ns)
+
+    def _bucket_table(self) -> np.ndarray:
+        # Digests are uniform, so their top bits split the index into buckets of
+        # about one entry each; the table holds where each bucket starts.
+        if self._buckets is None:
+            bits = max(1, min(26, (len(self.digests) - 1).bit_length()))
+            self._shift = np.uint64(64 - bits)
+            counts = np.bincount((self.digests >> self._shift).astype(np.intp), minlength=1 << bits)
+            self._buckets = np.concatenate(([0], np.cumsum(counts)))
+        return self._buckets
+
+    def lookup(self, digests: np.ndarray) -> np.ndarray:
+        # Position of each digest in the index, -1 where it is not there: a binary
+        # search within each digest's bucket, all digests at once.
+        size = len(self.digests)
+        if not size:
+            return np.full(len(digests), -1, dtype=np.intp)
+        table = self._bucket_table()
+        buckets = (digests >> self._shift).astype(np.intp)
+        low = table[buckets]
+        high = table[buckets + 1]
+        searching = low < high
+        while searching.any():
+            middle = (low + high) >> 1
+            below = self.digests[np.minimum(middle, size - 1)] < digests
+            low = np.where(searching & below, middle + 1, low)
+            high = np.where(searching & ~below, middle, high)
+            searching = low < high
+        low = np.minimum(low, size - 1)
+        return np.where(self.digests[low] == digests, low, -1)
+
+    def merged(
+        self,
+        reused: np.ndarray,
+        digests: np.ndarray,
+        offsets: np.ndarray,
+        lengths: np.ndarray,
+        failed: np.ndarray,
+    ) -> "DigestIndex":
+        # The index of the next run: entries reused at their new `reused` offsets (-1
+        # where the row is gone) plus new rows, merged in digest order without a
+        # full sort. Of duplicate new rows the first one is kept.
+        keep = np.flatnonzero(reused >= 0)
+        digests, first = np.unique(digests, return_index=True)
+        at = np.searchsorted(self.digests[keep], digests)
+        return DigestIndex(
+            np.insert(self.digests[keep], at, digests),
+            np.insert(reused[keep], at, offsets[first]),
+            np.insert(self.lengths[keep], at, lengths[first]),
+            np.insert(self.failed[keep], at, failed[first]),
+            self.settings,
+        )
+
+
+def read_blocks(handle, size: int = _BLOCK_BYTES) -> Iterator[Tuple[bytes, np.ndarray]]:
+    # Raw CSV records in blocks of about `size` bytes, as the block and the end offset
+    # of each record in it. A quoted field may span lines, so a record ends at a
+    # newline preceded by an even number of quote characters in the block.
+    carry = b""
+    while True:
+        more = handle.read(size)
+        data = carry + more
+        if not data:
+            return
+        buffer = np.frombuffer(data, dtype=np.uint8)
+        ends = np.flatnonzero(buffer == 10) + 1
+        quotes = np.flatnonzero(buffer == 34)
+        if len(quotes):
+            ends = ends[np.searchsorted(quotes, ends) % 2 == 0]
+        if not more:
+            if not len(ends) or ends[-1] != len(data):
+                ends = np.append(ends, len(data))
+            yield data, ends
+            return
+        if len(ends):
+            yield data[:ends[-1]], ends
+            carry = data[ends[-1]:]
+        else:
+            carry = data
+
+
+def _runs(rows: np.ndarray, offsets: np.ndarray, lengths: np.ndarray) -> Iterator[Tuple[int, int, int]]:
+    # (first row, byte start, byte end) of stretches of adjacent rows whose old output
+    # lines also lie back to back, so each stretch is copied with one slice.
+    if not len(offsets):
+        return
+    breaks = np.flatnonzero((offsets[1:] != offsets[:-1] + lengths[:-1]) | (rows[1:] != rows[:-1] + 1)) + 1
+    starts = np.concatenate(([0], breaks))
+    ends = np.concatenate((breaks, [len(offsets)]))
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        yield int(rows[start]), int(offsets[start]), int(offsets[end - 1] + lengths[end - 1])
+
+
+def _body_encoding(encoding: str) -> str:
+    # A byte-order mark belongs to the start of the file only.
+    return "utf-8" if codecs.lookup(encoding).name == "utf-8-sig" else encoding
+
+
+def settings_key(
+    header: bytes,
+    mapping: Dict[str, str],
+    delimiter: str,
+    encoding: str,
+    recalc: Sequence[str],
+    decimal_comma: bool,
+    schedule_path=None,
+) -> str:
+    schedule_digest = ""
+    if schedule_path is not None:
+        schedule_digest = blake2b(Path(schedule_path).read_bytes(), digest_size=16).hexdigest()
+    return json.dumps(
+        {
+            "header": blake2b(header, digest_size=16).hexdigest(),
+            "mapping": sorted(mapping.items()),
+            "delimiter": delimiter,
+            "encoding": codecs.lookup(encoding).name,
+            "recalc": sorted(recalc),
+            "decimal_comma": decimal_comma,
+            "schedule": schedule_digest,
+        },
+        sort_keys=True,
+    )
+
+
+class _RowWriter:
+    # Formats solved rows exactly as reprice_stream writes them, one line at a time.
+    def __init__(self, delimiter: str, encoding: str) -> None:
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer, delimiter=delimiter, lineterminator="\n")
+        self.encoding = encoding
+
+    def line(self, row: List[str]) -> bytes:
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        self.writer.writerow(row)
+        return self.buffer.getvalue().encode(self.encoding)
+
+
+class _Merge:
+    # One incremental run: writes each chunk of the new dump to `target`, copying the
+    # old output lines of rows the index knows and solving the rest.
+    def __init__(
+        self,
+        previous: DigestIndex,
+        old_output,
+        layout: Layout,
+        target,
+        changes,
+        position: int,
+        *,
+        schedule: Optional[DiscountSchedule],
+        decimal_comma: bool,
+        delimiter: str,
+        encoding: str,
+    ) -> None:
+        self.previous = previous
+        self.old_output = old_output
+        self.layout = layout
+        self.target = target
+        self.changes = changes
+        self.position = position
+        self.schedule = schedule
+        self.decimal_comma = decimal_comma
+        self.delimiter = delimiter
+        self.encoding = encoding
+        self.row_writer = _RowWriter(delimiter, encoding)
+        # New output offset of each reused index entry, -1 while unused.
+        self.reused = np.full(len(previous), -1, dtype=np.int64)
+        self.new_digests: List[np.ndarray] = []
+        self.new_offsets: List[np.ndarray] = []
+        self.new_lengths: List[np.ndarray] = []
+        self.new_failed: List[np.ndarray] = []
+        self.rows = self.changed = self.failed = 0
+
+    def chunk(self, data: bytes, starts: np.ndarray, ends: np.ndarray) -> None:
+        previous = self.previous
+        digests = row_digests(data, starts, ends - starts)
+        found = previous.lookup(digests)
+        hit = found >= 0
+        hit_rows = np.flatnonzero(hit)
+        missing = np.flatnonzero(~hit)
+        lengths = np.zeros(len(digests), dtype=np.uint32)
+        lengths[hit_rows] = previous.lengths[found[hit_rows]]
+        failed = np.zeros(len(digests), dtype=bool)
+        failed[hit_rows] = previous.failed[found[hit_rows]]
+
+        lines: List[bytes] = []
+        if len(missing):
+            texts = (data[start:end].decode(self.encoding) for start, end in zip(starts[missing].tolist(), ends[missing].tolist()))
+            rows = list(csv.reader(texts, delimiter=self.delimiter))
+            if len(rows) != len(missing):
+                raise ValueError("Could not split the input into CSV rows; check the delimiter and quoting.")
+            chunk = parse_chunk(rows, self.layout.indexes, self.layout.user_fields)
+            result = solve_chunk(chunk, self.layout, self.schedule)
+            formatted = format_chunk(chunk, result, self.layout.output_indexes, self.decimal_comma)
+            lines = [self.row_writer.line(row) for row in formatted]
+            lengths[missing] = [len(line) for line in lines]
+            failed[missing] = failed_rows(chunk, result)
+            if self.changes is not None:
+                self.changes.writelines(lines)
+
+        # Copied stretches of old lines and solved lines, in input order.
+        pieces: List[Tuple[int, bytes]] = [
+            (row, self.old_output[byte_start:byte_end])
+            for row, byte_start, byte_end in _runs(hit_rows, previous.offsets[found[hit_rows]], lengths[hit_rows].astype(np.int64))
+        ]
+        if len(missing):
+            pieces.extend(zip(missing.tolist(), lines))
+            pieces.sort(key=lambda piece: piece[0])
+        self.target.write(b"".join(piece for _row, piece in pieces))
+
+        offsets = self.position + np.concatenate(([0], np.cumsum(lengths[:-1], dtype=np.int64)))
+        # A row repeated in the dump keeps the line of its first occurrence.
+        entries, first = np.unique(found[hit_rows], return_index=True)
+        fresh = self.reused[entries] < 0
+        self.reused[entries[fresh]] = offsets[hit_rows[first[fresh]]]
+        self.new_digests.append(digests[missing])
+        self.new_offsets.append(offsets[missing])
+        self.new_lengths.append(lengths[missing])
+        self.new_failed.append(failed[missing])
+        self.position += int(lengths.sum(dtype=np.int64))
+        self.rows += len(digests)
+        self.changed += len(missing)
+        self.failed += int(np.count_nonzero(failed))
+
+    def index(self) -> DigestIndex:
+        return self.previous.merged(
+            self.reused,
+            np.concatenate(self.new_digests) if self.new_digests else np.empty(0, dtype="<u8"),
+            np.concatenate(self.new_offsets) if self.new_offsets else np.empty(0, dtype=np.int64),
+            np.concatenate(self.new_lengths) if self.new_lengths else np.empty(0, dtype=np.uint32),
+            np.concatenate(self.new_failed) if self.new_failed else np.empty(0, dtype=bool),
+        )
+
+
+def reprice_incremental(
+    source_path,
+    output_path,
+    mapping: Optional[Dict[str, str]] = None,
+    *,
+    delimiter: str = ",",
+    encoding: str = "utf-8-sig",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    recalc: Sequence[str] = (),
+    decimal_comma: bool = False,
+    schedule_path=None,
+    changes_path=None,
+) -> IncrementalSummary:
+    # Reprices `source_path` into `output_path`, solving only rows whose digest is not
+    # in the index of the previous run; every other row's output line is copied from
+    # the previous output. Without a matching index this is a full run that builds
+    # one. `changes_path` receives just the new or changed output rows.
+    started = time.perf_counter()
+    source_path = Path(source_path)
+    output_path = Path(output_path)
+    mapping = mapping if mapping is not None else {name: name for name in INPUT_FIELDS}
+    schedule: Optional[DiscountSchedule] = load_schedule(schedule_path) if schedule_path is not None else None
+
+    with open(source_path, "rb") as source:
+        header_record = source.readline()
+        if not header_record.strip():
+            raise ValueError(f"{source_path} is empty.")
+        header = next(csv.reader([header_record.decode(encoding)], delimiter=delimiter))
+        layout = plan_layout(header, mapping, recalc, schedule)
+        settings = settings_key(header_record, mapping, delimiter, encoding, recalc, decimal_comma, schedule_path)
+
+        stored = DigestIndex.load(index_path(output_path))
+        full = stored is None or not stored.matches(settings, output_path)
+        previous = DigestIndex.empty(settings) if full else stored
+
+        scratch = output_path.with_name(output_path.name + ".tmp")
+        old_output = None
+        old_handle = None
+        if not full and previous.output_size > 0:
+            old_handle = open(output_path, "rb")
+            old_output = mmap.mmap(old_handle.fileno(), 0, access=mmap.ACCESS_READ)
+        changes = open(changes_path, "wb") if changes_path is not None else None
+        try:
+            with open(scratch, "wb") as target:
+                body_encoding = _body_encoding(encoding)
+                head = _RowWriter(delimiter, body_encoding).line(layout.out_header)
+                if codecs.lookup(encoding).name == "utf-8-sig":
+                    head = codecs.BOM_UTF8 + head
+                target.write(head)
+                if changes is not None:
+                    changes.write(head)
+                merge = _Merge(
+                    previous,
+                    old_output,
+                    layout,
+                    target,
+                    changes,
+                    len(head),
+                    schedule=schedule,
+                    decimal_comma=decimal_comma,
+                    delimiter=delimiter,
+                    encoding=body_encoding,
+                )
+                for data, ends in read_blocks(source):
+                    starts = np.concatenate(([0], ends[:-1]))
+                    for start in range(0, len(ends), chunk_size):
+                        merge.chunk(data, starts[start:start + chunk_size], ends[start:start + chunk_size])
+        finally:
+            if old_output is not None:
+                old_output.close()
+                old_handle.close()
+            if changes is not None:
+                changes.close()
+        os.replace(scratch, output_path)
+
+    index = merge.index()
+    stat = output_path.stat()
+    index.output_size = stat.st_size
+    index.output_mtime_ns = stat.st_mtime_ns
+    index.source_mtime_ns = source_path.stat().st_mtime_ns
+    index.save(index_path(output_path))
+    return IncrementalSummary(
+        rows=merge.rows,
+        changed=merge.changed,
+        removed=int(np.count_nonzero(merge.reused < 0)),
+        failed=merge.failed,
+        full=full,
+        seconds=time.perf_counter() - started,
+    )
+
+
+def _pending(folder: Path, pattern: str, seen: Dict[str, Tuple[int, int]]) -> List[Path]:
+    # Files whose size and mtime held still since the previous poll, oldest first, so
+    # a dump that is still being copied in is left for a later poll.
+    ready = []
+    for path in folder.glob(pattern):
+        if not path.is_file():
+            continue
+        stat = path.stat()
+        state = (stat.st_size, stat.st_mtime_ns)
+        previous = seen.get(path.name)
+        seen[path.name] = state
+        if previous == state:
+            ready.append((stat.st_mtime_ns, path))
+    return [path for _mtime, path in sorted(ready)]
+
+
+def watch(
+    folder,
+    output_path,
+    *,
+    pattern: str = "*.csv",
+    poll: float = DEFAULT_POLL_SECONDS,
+    once: bool = False,
+    changes_dir=None,
+    log=sys.stderr,
+    **options,
+) -> int:
+    # Reprices every new dump dropped into `folder` into the one output. Dumps not
+    # newer than the last one processed (per the digest index) are skipped, so a
+    # restart does not replay the folder. Returns the number of dumps processed.
+    folder = Path(folder)
+    output_path = Path(output_path)
+    stored = DigestIndex.load(index_path(output_path))
+    done_mtime = stored.source_mtime_ns if stored is not None else -1
+    seen: Dict[str, Tuple[int, int]] = {}
+    processed = 0
+    settled = False
+    while True:
+        for path in _pending(folder, pattern, seen):
+            mtime = seen[path.name][1]
+            if mtime <= done_mtime:
+                continue
+            changes_path = None
+            if changes_dir is not None:
+                changes_path = Path(changes_dir) / f"{path.stem}.changes.csv"
+            summary = reprice_incremental(path, output_path, changes_path=changes_path, **options)
+            done_mtime = mtime
+            processed += 1
+            log.write(f"{path.name}: {summary.describe()}\n")
+            log.flush()
+        # With --once, the first poll only records sizes; the second settles them.
+        if once and settled:
+            return processed
+        settled = True
+        time.sleep(poll if not once else min(poll, 1.0))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Reprice supplier price-list dumps incrementally: only new or changed rows are solved again."
+    )
+    parser.add_argument("source", help="A dump CSV file, or a folder to watch for new dumps.")
+    parser.add_argument("output", help="Repriced CSV, merged in place; its digest index is kept next to it.")
+    parser.add_argument(
+        "--map",
+        action="append",
+        default=[],
+        metavar="FIELD=COLUMN",
+        help=f"Map a calculator field to a CSV column. Fields: {', '.join(INPUT_FIELDS)}.",
+    )
+    parser.add_argument("--delimiter", default=",", help="CSV delimiter (default: ',').")
+    parser.add_argument("--encoding", default="utf-8-sig", help="File encoding (default: utf-8-sig).")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per batch (default: 50000).")
+    parser.add_argument(
+        "--recalc",
+        action="append",
+        default=[],
+        choices=INPUT_FIELDS,
+        help="Treat a column as previously calculated instead of user input (repeatable).",
+    )
+    parser.add_argument("--decimal-comma", action="store_true", help="Write decimals with a comma.")
+    parser.add_argument("--schedule", metavar="FILE", help="Discount schedule CSV, as for reprice.py.")
+    parser.add_argument("--changes", metavar="PATH", help="Also write the new or changed rows (a folder when watching).")
+    parser.add_argument("--pattern", default="*.csv", help="Dump file pattern when watching (default: *.csv).")
+    parser.add_argument("--poll", type=float, default=DEFAULT_POLL_SECONDS, help="Seconds between folder scans.")
+    parser.add_argument("--once", action="store_true", help="Process the dumps already in the folder, then exit.")
+    return parser
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be at least 1.")
+    try:
+        mapping = parse_mapping(args.map)
+    except ValueError as exc:
+        parser.error(str(exc))
+    options = dict(
+        mapping=mapping,
+        delimiter=args.delimiter,
+        encoding=args.encoding,
+        chunk_size=args.chunk_size,
+        recalc=args.recalc,
+        decimal_comma=args.decimal_comma,
+        schedule_path=args.schedule,
+    )
+    try:
+        if Path(args.source).is_dir():
+            watch(args.source, args.output, pattern=args.pattern, poll=args.poll, once=args.once, changes_dir=args.changes, **options)
+        else:
+            summary = reprice_incremental(args.source, args.output, changes_path=args.changes, **options)
+            sys.stderr.write(f"{summary.describe()}\n")
+    except (OSError, ValueError) as exc:
+        sys.stderr.write(f"Error: {exc}\n")
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())